@@ -0,0 +1,55 @@
+from django.http import StreamingHttpResponse
+
+from animals.async_views import async_api_view, render_response
+from animals.models import Animal
+from animals.renderers import EventStreamRenderer
+from animals.thoughts import ThoughtWriter, aiter_generated_thoughts
+from .authentication import aget_tutor
+from .serializers import TutorSerializer
+from .views import GenerateThoughtsStreamView, ProfileView, _sse
+
+
+@async_api_view(ProfileView.as_view())
+async def profile(request):
+    return render_response(request, TutorSerializer(await aget_tutor(request.user)).data)
+
+
+async def _athought_events(animals):
+    generated = 0
+    writer = ThoughtWriter()
+    try:
+        async for animal, thought, error in aiter_generated_thoughts(animals):
+            if error is not None:
+                yield _sse("error", {"animal_id": str(animal.id), "name": animal.name, "error": str(error)})
+                continue
+
+            await writer.aadd(animal.id, thought)
+            generated += 1
+            yield _sse("thought", {"animal_id": str(animal.id), "name": animal.name, "thought": thought})
+    finally:
+        await writer.aflush()
+
+    yield _sse("done", {"generated": generated})
+
+
+def _wants_tokens(request):
+    return request.query_params.get('tokens') in ('1', 'true')
+
+
+@async_api_view(
+    GenerateThoughtsStreamView.as_view(),
+    renderer_classes=GenerateThoughtsStreamView.renderer_classes,
+    delegate=_wants_tokens,
+)
+async def generate_thoughts_stream(request):
+    """
+    Async GenerateThoughtsStreamView: the Gemini calls run on the server's
+    event loop instead of a worker thread's. Token streaming (``?tokens=1``)
+    stays on the sync view.
+    """
+
+    animals = Animal.objects.filter(tutor_id=request.user.id).only('id', 'name', 'species', 'breed', 'age')
+    response = StreamingHttpResponse(_athought_events(animals), content_type=EventStreamRenderer.media_type)
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,114 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+# What the views read from a cached tutor. The password hash and permissions
+# never reach the shared cache.
+CACHED_TUTOR_FIELDS = ('id', 'username', 'name', 'email', 'is_active')
+
+
+def _tutor_cache_key(tutor_id) -> str:
+    return f"tutor:{tutor_id}"
+
+
+def _cached_tutor(fields):
+    # Same messages as simplejwt's JWTAuthentication.get_user.
+    if fields is None:
+        raise AuthenticationFailed(_("User not found"), code="user_not_found")
+    if not fields['is_active']:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    return User(**fields)
+
+
+def get_cached_tutor(tutor_id):
+    """
+    Loads the CACHED_TUTOR_FIELDS of a Tutor through a short-lived cache entry
+    and returns them as an unsaved Tutor. Entries are dropped when the tutor
+    is saved or deleted, so the TTL only bounds other staleness. Tokens of
+    deleted or deactivated tutors raise AuthenticationFailed.
+    """
+
+    key = _tutor_cache_key(tutor_id)
+    fields = cache.get(key)
+    if fields is None:
+        fields = User.objects.filter(pk=tutor_id).values(*CACHED_TUTOR_FIELDS).first()
+        if fields is not None:
+            cache.set(key, fields, timeout=settings.TUTOR_CACHE_TTL_SECONDS)
+    return _cached_tutor(fields)
+
+
+async def aget_cached_tutor(tutor_id):
+    key = _tutor_cache_key(tutor_id)
+    fields = await cache.aget(key)
+    if fields is None:
+        fields = await User.objects.filter(pk=tutor_id).values(*CACHED_TUTOR_FIELDS).afirst()
+        if fields is not None:
+            await cache.aset(key, fields, timeout=settings.TUTOR_CACHE_TTL_SECONDS)
+    return _cached_tutor(fields)
+
+
+def forget_cached_tutor(tutor_id):
+    cache.delete(_tutor_cache_key(tutor_id))
+
+
+class TutorTokenUser(TokenUser):
+    """
+    User built from the access token's claims by JWTStatelessUserAuthentication,
+    so authenticating costs no query. ``id`` has the Tutor primary key's type;
+    views that need the tutor's profile use ``tutor``, a read-only Tutor with
+    the CACHED_TUTOR_FIELDS.
+    """
+
+    @cached_property
+    def id(self):
+        return User._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def tutor(self):
+        return get_cached_tutor(self.id)
+
+
+class TutorStatelessAuthentication(JWTStatelessUserAuthentication):
+    """
+    Stateless JWT authentication that also checks the tutor, through the tutor
+    cache, on unsafe methods. Reads still cost no query, while a deleted or
+    deactivated tutor cannot write with a token issued before.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None and request.method not in SAFE_METHODS:
+            get_tutor(result[0])
+        return result
+
+
+def get_tutor(user):
+    """
+    The Tutor behind ``request.user``, whichever authentication produced it.
+    """
+
+    if isinstance(user, TutorTokenUser):
+        return user.tutor
+    return user
+
+
+
+async def aget_tutor(user):
+    if isinstance(user, TutorTokenUser):
+        if 'tutor' not in user.__dict__:
+            user.tutor = await aget_cached_tutor(user.id)
+        return user.tutor
+    return user
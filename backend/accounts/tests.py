@@ -1,8 +1,20 @@
+from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test import AsyncRequestFactory, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from accounts import async_views
+from animals import llm
+from animals.models import Animal, ThoughtJob
+from animals.tasks import run_thought_job
+from datetime import timedelta
 from faker import Faker
+import json
+from unittest.mock import AsyncMock, patch
 
 User = get_user_model()
 
@@ -109,3 +121,256 @@ class AccountsTests(APITestCase):
         url = reverse('profile')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    # Test access tokens authenticate without loading the tutor
+    def test_token_authentication_is_stateless(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        animal = Animal.objects.create(tutor=user, name='Rex', species='dog', age=3)
+        caches['default'].clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('animal-detail', args=[animal.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['tutor'], user.id)
+
+        response = self.client.post(reverse('animal-list'), {'name': 'Mimi', 'species': 'cat'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['tutor'], user.id)
+
+    # Test the profile is served from the tutor cache and refreshed on save
+    def test_profile_with_stateless_token(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        caches['default'].clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        url = reverse('profile')
+
+        self.assertEqual(self.client.get(url).data['username'], user.username)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['email'], user.email)
+
+        user.name = 'Renamed'
+        user.save()
+        self.assertEqual(self.client.get(url).data['name'], 'Renamed')
+
+    # Test the tutor cache keeps only the profile fields, never the password hash
+    def test_tutor_cache_holds_no_password(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        caches['default'].clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+
+        self.client.get(reverse('profile'))
+        cached = caches['default'].get(f"tutor:{user.id}")
+        self.assertEqual(cached['username'], user.username)
+        self.assertNotIn('password', cached)
+
+    # Test tokens of deleted or deactivated tutors are rejected where the tutor is loaded
+    def test_profile_of_deleted_or_inactive_tutor(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        url = reverse('profile')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        user.is_active = False
+        user.save()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['detail'].code, 'user_inactive')
+
+        user.delete()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['detail'].code, 'user_not_found')
+
+        view = async_to_sync(async_views.profile)
+        response = view(AsyncRequestFactory().get(url, headers={'Authorization': f"Bearer {token}"}))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    # Test deleted or deactivated tutors cannot write with a token issued before
+    def test_writes_of_deleted_or_inactive_tutor(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        url = reverse('animal-list')
+        self.assertEqual(self.client.post(url, {'name': 'Rex', 'species': 'dog'}, format='json').status_code, status.HTTP_201_CREATED)
+
+        user.is_active = False
+        user.save()
+        response = self.client.post(url, {'name': 'Mimi', 'species': 'cat'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['detail'].code, 'user_inactive')
+        self.assertEqual(self.client.post(reverse('generate-thoughts')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        user.delete()
+        response = self.client.post(url, {'name': 'Mimi', 'species': 'cat'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['detail'].code, 'user_not_found')
+
+    # Test thought generation runs as a background job for the authenticated tutor's animals
+    @override_settings(THOUGHT_PROMPT_BATCH_SIZE=1)
+    def test_generate_thoughts(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        other = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        caches['thoughts'].clear()
+        mine = Animal.objects.create(tutor=user, name='Rex', species='dog', age=3)
+        theirs = Animal.objects.create(tutor=other, name='Mimi', species='cat', age=2)
+        self.client.force_authenticate(user=user)
+
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value='Woof!')), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('generate-thoughts'))
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'pending')
+
+        response = self.client.get(reverse('generate-thoughts-status', args=[response.data['job_id']]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(response.data['completed'], 1)
+        self.assertEqual(response.data['results'], [{"animal_id": str(mine.id), "name": 'Rex', "thought": 'Woof!'}])
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual(mine.thought_of_the_day, 'Woof!')
+        self.assertIsNone(theirs.thought_of_the_day)
+
+    # Test animals Gemini throttled are retried instead of failing the job
+    @override_settings(THOUGHT_PROMPT_BATCH_SIZE=1)
+    def test_generate_thoughts_retries_throttled_animals(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        caches['thoughts'].clear()
+        Animal.objects.create(tutor=user, name='Rex', species='dog', age=3)
+        Animal.objects.create(tutor=user, name='Mimi', species='cat', age=2)
+        job = ThoughtJob.objects.create(tutor=user)
+        throttled_once = []
+
+        async def fake_generate(prompt, client=None, max_tokens=60):
+            if 'Rex' in prompt and not throttled_once:
+                throttled_once.append(prompt)
+                raise llm.GeminiUnavailable('Gemini returned 429', retry_after=1)
+            return 'Hello!'
+
+        with patch('animals.llm.agenerate_text_for_animal', fake_generate), \
+                patch('animals.tasks.backoff_delay', return_value=0) as backoff:
+            run_thought_job.apply(args=[str(job.id)], throw=False)
+
+        backoff.assert_called_once()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ThoughtJob.STATUS_DONE)
+        self.assertEqual(job.completed, 2)
+        self.assertEqual(sorted(result['name'] for result in job.results), ['Mimi', 'Rex'])
+        self.assertTrue(all(result.get('thought') == 'Hello!' for result in job.results))
+
+    # Test jobs that stopped saving progress are reported as failed
+    @override_settings(THOUGHT_JOB_TIMEOUT_SECONDS=60)
+    def test_stale_thought_job_times_out(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        job = ThoughtJob.objects.create(tutor=user, status=ThoughtJob.STATUS_RUNNING)
+        self.client.force_authenticate(user=user)
+        url = reverse('generate-thoughts-status', args=[job.id])
+
+        self.assertEqual(self.client.get(url).data['status'], 'running')
+
+        ThoughtJob.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(minutes=2))
+        response = self.client.get(url)
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertIsNotNone(response.data['finished_at'])
+
+    # Test a tutor cannot see another tutor's thought job
+    def test_thought_job_status_of_another_tutor(self):
+        owner = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        other = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        job = ThoughtJob.objects.create(tutor=owner)
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get(reverse('generate-thoughts-status', args=[job.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def _read_events(self, response):
+        body = b''.join(response.streaming_content).decode()
+        events = []
+        for block in body.strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return events
+
+    # Test thoughts are streamed as Server-Sent Events
+    @override_settings(THOUGHT_PROMPT_BATCH_SIZE=1)
+    def test_generate_thoughts_stream(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        caches['thoughts'].clear()
+        rex = Animal.objects.create(tutor=user, name='Rex', species='dog', age=3)
+        self.client.force_authenticate(user=user)
+
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value='Woof!')):
+            response = self.client.get(reverse('generate-thoughts-stream'), HTTP_ACCEPT='text/event-stream')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            events = self._read_events(response)
+
+        self.assertEqual(events, [
+            ("thought", {"animal_id": str(rex.id), "name": 'Rex', "thought": 'Woof!'}),
+            ("done", {"generated": 1}),
+        ])
+        rex.refresh_from_db()
+        self.assertEqual(rex.thought_of_the_day, 'Woof!')
+
+    # Test token-level streaming forwards every fragment before the full thought
+    def test_generate_thoughts_stream_tokens(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        caches['thoughts'].clear()
+        rex = Animal.objects.create(tutor=user, name='Rex', species='dog', age=3)
+        self.client.force_authenticate(user=user)
+
+        with patch('animals.llm.stream_text_for_animal', return_value=iter(['Wo', 'of!'])):
+            response = self.client.get(reverse('generate-thoughts-stream'), {'tokens': '1'})
+            events = self._read_events(response)
+
+        self.assertEqual(events, [
+            ("token", {"animal_id": str(rex.id), "text": 'Wo'}),
+            ("token", {"animal_id": str(rex.id), "text": 'of!'}),
+            ("thought", {"animal_id": str(rex.id), "name": 'Rex', "thought": 'Woof!'}),
+            ("done", {"generated": 1}),
+        ])
+
+    # Test the async profile view reads the tutor through the cache
+    def test_async_profile(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        caches['default'].clear()
+        headers = {'Authorization': f"Bearer {RefreshToken.for_user(user).access_token}"}
+        view = async_to_sync(async_views.profile)
+
+        response = view(AsyncRequestFactory().get(reverse('profile'), headers=headers))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['username'], user.username)
+        with self.assertNumQueries(0):
+            view(AsyncRequestFactory().get(reverse('profile'), headers=headers))
+
+        response = view(AsyncRequestFactory().get(reverse('profile')))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    # Test the async stream generates thoughts on the event loop
+    @override_settings(THOUGHT_PROMPT_BATCH_SIZE=1)
+    def test_async_generate_thoughts_stream(self):
+        user = User.objects.create_user(username=self.faker.user_name(), email=self.faker.unique.email(), password='12345')
+        caches['thoughts'].clear()
+        rex = Animal.objects.create(tutor=user, name='Rex', species='dog', age=3)
+        request = AsyncRequestFactory().get(
+            reverse('generate-thoughts-stream'),
+            headers={'Authorization': f"Bearer {RefreshToken.for_user(user).access_token}"},
+        )
+
+        async def read(request):
+            response = await async_views.generate_thoughts_stream(request)
+            return response, b''.join([chunk async for chunk in response.streaming_content])
+
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value='Woof!')):
+            response, body = async_to_sync(read)(request)
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(body.decode(), (
+            f'event: thought\ndata: {json.dumps({"animal_id": str(rex.id), "name": "Rex", "thought": "Woof!"})}\n\n'
+            'event: done\ndata: {"generated": 1}\n\n'
+        ))
+        rex.refresh_from_db()
+        self.assertEqual(rex.thought_of_the_day, 'Woof!')
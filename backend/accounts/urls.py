@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from .views import GenerateThoughtsView, RegisterView, ProfileView
+from .views import GenerateThoughtsStreamView, GenerateThoughtsView, RegisterView, ProfileView, ThoughtJobStatusView
 
 
 urlpatterns = [
@@ -9,5 +10,15 @@ urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('me/', ProfileView.as_view(), name='profile'),
     path('generate-thoughts/', GenerateThoughtsView.as_view(), name='generate-thoughts'),
+    path('generate-thoughts/stream/', GenerateThoughtsStreamView.as_view(), name='generate-thoughts-stream'),
+    path('generate-thoughts/<uuid:job_id>/', ThoughtJobStatusView.as_view(), name='generate-thoughts-status'),
 
-]
\ No newline at end of file
+]
+
+if settings.ASYNC_VIEWS:
+    from . import async_views
+
+    urlpatterns = [
+        path('me/', async_views.profile, name='profile'),
+        path('generate-thoughts/stream/', async_views.generate_thoughts_stream, name='generate-thoughts-stream'),
+    ] + urlpatterns
@@ -1,16 +1,26 @@
-from django.utils import timezone
+import json
+from django.db import transaction
 from django.shortcuts import render
 from rest_framework import generics, permissions
 from django.contrib.auth import get_user_model
-from animals.llm import generate_text_for_animal
-from animals.models import Animal
+from animals import llm
+from animals.cache import cache_thoughts, get_cached_thoughts
+from animals.models import Animal, ThoughtJob
+from animals.renderers import EventStreamRenderer
+from animals.serializers import ThoughtJobSerializer
+from animals.streaming import streaming_response
+from animals.tasks import run_thought_job
+from animals.thoughts import ThoughtWriter, build_thought_prompt, iter_generated_thoughts
+from .authentication import get_tutor
 from .serializers import TutorSerializer, RegisterSerializer
 from rest_framework import status
 from rest_framework.views import APIView
 from drf_spectacular.utils import extend_schema
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
 User = get_user_model()
 
@@ -26,40 +36,107 @@ class ProfileView(generics.RetrieveAPIView):
     serializer_class = TutorSerializer
     
     def get_object(self):
-        return self.request.user
+        return get_tutor(self.request.user)
     
 
 @extend_schema(tags=['Accounts'])
 @method_decorator(csrf_exempt, name='dispatch')
 class GenerateThoughtsView(APIView):
-    permission_classes = [permissions.IsAuthenticated]  
+    permission_classes = [permissions.IsAuthenticated]
 
 
     def post(self, request):
-        user = request.user
-        animals = Animal.objects.filter(tutor=user)
-        generated_count = 0
-        details = []
+        job = ThoughtJob.objects.create(tutor_id=request.user.id)
+        transaction.on_commit(lambda: run_thought_job.delay(str(job.id)))
 
+        return Response({
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": reverse('generate-thoughts-status', args=[job.id], request=request),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+@extend_schema(tags=['Accounts'])
+class ThoughtJobStatusView(generics.RetrieveAPIView):
+    serializer_class = ThoughtJobSerializer
+    lookup_url_kwarg = 'job_id'
+
+    def get_queryset(self):
+        return ThoughtJob.objects.filter(tutor_id=self.request.user.id)
+
+    def get_object(self):
+        job = super().get_object()
+        job.fail_if_stale()
+        return job
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _thought_events(animals):
+    generated = 0
+    with ThoughtWriter() as writer:
+        for animal, thought, error in iter_generated_thoughts(animals):
+            if error is not None:
+                yield _sse("error", {"animal_id": str(animal.id), "name": animal.name, "error": str(error)})
+                continue
+
+            writer.add(animal.id, thought)
+            generated += 1
+            yield _sse("thought", {"animal_id": str(animal.id), "name": animal.name, "thought": thought})
+
+    yield _sse("done", {"generated": generated})
+
+
+def _token_events(animals):
+    generated = 0
+    with ThoughtWriter() as writer:
         for animal in animals:
-            prompt = (
-            f"Imagine you are a {animal.species} named {animal.name}. "
-            f"You are {animal.age} years old, which is a very important detail for your personality and view of the world. "
-            f"Your species, {animal.species}, influences how you think and feel. "
-            f"Your breed is {animal.breed}. "
-            f"Generate a short, cute, and unique thought (max 180 characters) that reflects your age and species."
-        )
+            prompt = build_thought_prompt(animal)
+            key = str(animal.id)
+            thought = get_cached_thoughts({key: prompt}).get(key)
+
             try:
-                thought = generate_text_for_animal(prompt)
-                animal.thought_of_the_day = thought
-                animal.thought_generated_at = timezone.now()
-                animal.save()
-                generated_count += 1
-                details.append({"animal_id": animal.id, "name": animal.name, "thought": thought})
+                if thought is None:
+                    parts = []
+                    for text in llm.stream_text_for_animal(prompt):
+                        parts.append(text)
+                        yield _sse("token", {"animal_id": key, "text": text})
+                    thought = "".join(parts).strip()
+                    cache_thoughts({key: prompt}, {key: thought})
             except Exception as e:
-                details.append({"animal_id": animal.id, "name": animal.name, "error": str(e)})
+                yield _sse("error", {"animal_id": key, "name": animal.name, "error": str(e)})
+                continue
+
+            writer.add(animal.id, thought)
+            generated += 1
+            yield _sse("thought", {"animal_id": key, "name": animal.name, "thought": thought})
+
+    yield _sse("done", {"generated": generated})
+
+
+@extend_schema(tags=['Accounts'])
+class GenerateThoughtsStreamView(APIView):
+    """
+    Generates thoughts for the tutor's animals and pushes each one to the
+    client as a Server-Sent Event as soon as it is ready. With ``?tokens=1``
+    animals are handled one at a time and every text fragment is streamed as
+    Gemini produces it.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    def get(self, request):
+        animals = Animal.objects.filter(tutor_id=request.user.id).only('id', 'name', 'species', 'breed', 'age')
+        if request.query_params.get('tokens') in ('1', 'true'):
+            events = _token_events(animals)
+        else:
+            events = _thought_events(animals)
+
+        response = streaming_response(request, events, 'text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
-        return Response({
-            "message": f"Pensamentos gerados para {generated_count} animais.",
-            "details": details
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
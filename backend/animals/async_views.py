@@ -0,0 +1,187 @@
+"""
+Async versions of the hot read endpoints, routed in front of the DRF views
+when ASYNC_VIEWS is on (the default under ``petcare.asgi``). They run on the
+server's event loop with the async ORM, so a slow query or Gemini call holds
+a coroutine instead of a worker thread. Writes, the browsable API and the
+less common query modes are handed to the sync DRF views.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from .cache import animal_list_cache_key, cache_animal_list, get_cached_animal_list
+from .models import Animal
+from .pagination import AsyncPageNumberPagination
+from .renderers import ORJSONRenderer
+from .serializers import ANIMAL_READ_FIELDS, serialize_animal_rows
+from .views import AnimalViewSet, _conditional_response, _set_validators, detail_validators, list_validators
+
+
+async def _authenticate(request):
+    # Stateless JWT authentication only decodes the token; the other classes
+    # may load the user from the database, which needs a worker thread.
+    if settings.JWT_STATELESS_AUTH:
+        user = request.user
+    else:
+        user = await sync_to_async(lambda: request.user)()
+    if not (user and user.is_authenticated):
+        raise exceptions.NotAuthenticated()
+
+
+def render_response(request, data, status=200):
+    renderer = request.accepted_renderer
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f"{content_type}; charset={renderer.charset}"
+    response = HttpResponse(
+        renderer.render(data, request.accepted_media_type, {'request': request}),
+        status=status,
+        content_type=content_type,
+    )
+    patch_vary_headers(response, ('Accept',))
+    return response
+
+
+def _error_response(request, exc):
+    # Same status codes and bodies as APIView.handle_exception.
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        authenticators = request.authenticators
+        auth_header = authenticators[0].authenticate_header(request) if authenticators else None
+        if auth_header:
+            exc.auth_header = auth_header
+        else:
+            exc.status_code = 403
+
+    drf_response = exception_handler(exc, {'request': request})
+    response = render_response(request, drf_response.data, status=drf_response.status_code)
+    for header in ('WWW-Authenticate', 'Retry-After'):
+        if header in drf_response:
+            response[header] = drf_response[header]
+    return response
+
+
+def async_api_view(sync_view, renderer_classes=(ORJSONRenderer,), delegate=None):
+    """
+    Turns ``handler(request, *args, **kwargs)``, a coroutine receiving an
+    authenticated DRF Request, into a csrf-exempt async view that negotiates,
+    authenticates and reports errors the way the DRF views do.
+
+    Requests other than GET, requests negotiated to the browsable API and
+    those for which ``delegate(request)`` is true are served by ``sync_view``
+    in a worker thread instead.
+    """
+
+    sync_view = sync_to_async(sync_view)
+    negotiator = DefaultContentNegotiation()
+
+    def decorator(handler):
+        @csrf_exempt
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            drf_request = Request(
+                request,
+                authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+            )
+            try:
+                renderer, media_type = negotiator.select_renderer(
+                    drf_request, [renderer() for renderer in renderer_classes],
+                )
+            except exceptions.NotAcceptable:
+                renderer = None
+
+            if (
+                request.method != 'GET'
+                or renderer is None
+                or isinstance(renderer, BrowsableAPIRenderer)
+                or (delegate is not None and delegate(drf_request))
+            ):
+                return await sync_view(request, *args, **kwargs)
+
+            drf_request.accepted_renderer, drf_request.accepted_media_type = renderer, media_type
+            try:
+                await _authenticate(drf_request)
+                return await handler(drf_request, *args, **kwargs)
+            except (exceptions.APIException, Http404) as exc:
+                return _error_response(drf_request, exc)
+
+        return view
+
+    return decorator
+
+
+def _wants_cursor_pagination(request):
+    params = request.query_params
+    return params.get('pagination') == 'cursor' or 'cursor' in params
+
+
+def _cached_list_page(tutor_id, url):
+    cache_key = animal_list_cache_key(tutor_id, url)
+    return cache_key, get_cached_animal_list(cache_key)
+
+
+@async_api_view(
+    AnimalViewSet.as_view({'get': 'list', 'post': 'create'}),
+    renderer_classes=AnimalViewSet.renderer_classes,
+    delegate=_wants_cursor_pagination,
+)
+async def animal_list(request):
+    """
+    Async AnimalViewSet.list: same page cache, ETag and payload, with page
+    number pagination on the async ORM. Cursor pagination stays on the sync view.
+    """
+
+    cache_key, entry = await sync_to_async(_cached_list_page)(request.user.pk, request.build_absolute_uri())
+    if entry is not None:
+        response = _conditional_response(request, entry['etag'], None) or render_response(request, entry['data'])
+        response['X-Cache'] = 'HIT'
+        return _set_validators(response, entry['etag'], entry['last_modified'])
+
+    queryset = Animal.objects.filter(tutor_id=request.user.id).order_by('created_at', 'id').values(*ANIMAL_READ_FIELDS, 'updated_at')
+    paginator = AsyncPageNumberPagination()
+    rows = await paginator.apaginate_queryset(queryset, request)
+
+    etag, last_modified = list_validators(request, paginator.get_paginated_response([]).data, rows)
+    response = _conditional_response(request, etag, None)
+    if response is None:
+        data = paginator.get_paginated_response(serialize_animal_rows(rows, request)).data
+        await sync_to_async(cache_animal_list)(cache_key, {'data': data, 'etag': etag, 'last_modified': last_modified})
+        response = render_response(request, data)
+    response['X-Cache'] = 'MISS'
+    return _set_validators(response, etag, last_modified)
+
+
+@async_api_view(
+    AnimalViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}),
+    renderer_classes=AnimalViewSet.renderer_classes,
+)
+async def animal_detail(request, pk):
+    """
+    Async AnimalViewSet.retrieve. The queryset is already limited to the
+    tutor's animals, which is all IsTutorOrReadOnly checks on a read.
+    """
+
+    queryset = Animal.objects.filter(tutor_id=request.user.id).values(*ANIMAL_READ_FIELDS, 'updated_at')
+    try:
+        row = await queryset.filter(pk=pk).afirst()
+    except (TypeError, ValueError, ValidationError):
+        row = None
+    if row is None:
+        raise Http404(f"No {Animal._meta.object_name} matches the given query.")
+
+    etag, last_modified = detail_validators(row)
+    response = _conditional_response(request, etag, last_modified)
+    if response is None:
+        response = render_response(request, serialize_animal_rows([row], request)[0])
+    return _set_validators(response, etag, last_modified)
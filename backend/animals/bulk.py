@@ -0,0 +1,139 @@
+import codecs
+import csv
+import io
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .cache import bump_animal_list_versions
+from .models import Animal
+from .renderers import ORJSONRenderer
+from .serializers import ANIMAL_READ_FIELDS, AnimalImportSerializer, serialize_animal_rows
+
+CSV_EXPORT_FIELDS = tuple(field for field in ANIMAL_READ_FIELDS if field != 'photo_variants')
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def iter_ndjson_rows(stream, encoding='utf-8'):
+    """
+    Yields ``(line_number, row, error)`` for each non-blank line of ``stream``,
+    with ``error`` set instead of ``row`` when the line is not a JSON object.
+    """
+
+    for line_number, line in enumerate(codecs.iterdecode(stream, encoding), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Expected a JSON object."
+            continue
+        yield line_number, row, None
+
+
+def iter_csv_rows(stream, encoding='utf-8'):
+    """
+    Yields ``(line_number, row, error)`` for each record of a CSV with a header
+    line. Empty cells are left out, so they fall back to the field defaults.
+    """
+
+    reader = csv.DictReader(codecs.iterdecode(stream, encoding))
+    try:
+        for record in reader:
+            if None in record:
+                yield reader.line_num, None, "Too many values."
+                continue
+            yield reader.line_num, {key: value for key, value in record.items() if value not in ('', None)}, None
+    except (csv.Error, UnicodeDecodeError) as e:
+        yield reader.line_num, None, f"Invalid CSV: {e}"
+
+
+def import_animals(rows, tutor_id, batch_size=None, max_errors=None) -> dict:
+    """
+    Validates the ``(line_number, row, error)`` triples of ``rows`` with the
+    AnimalSerializer rules and inserts the valid ones for ``tutor_id``, one
+    ``bulk_create`` and transaction per ``batch_size`` rows, so a large import
+    commits as it goes and never holds every row in memory.
+
+    Returns ``{"created", "failed", "errors"}``, where ``errors`` lists the
+    first ``max_errors`` rejected lines with their validation errors.
+    """
+
+    batch_size = batch_size or settings.ANIMAL_IMPORT_BATCH_SIZE
+    max_errors = max_errors or settings.ANIMAL_IMPORT_MAX_ERRORS
+    # One serializer validates every row, so its fields are only built once.
+    serializer = AnimalImportSerializer()
+    report = {"created": 0, "failed": 0, "errors": []}
+
+    def reject(line_number, errors):
+        report["failed"] += 1
+        if len(report["errors"]) < max_errors:
+            report["errors"].append({"line": line_number, "errors": errors})
+
+    for batch in _chunked(rows, batch_size):
+        animals = []
+        for line_number, row, error in batch:
+            if error is not None:
+                reject(line_number, {"non_field_errors": [error]})
+                continue
+            try:
+                validated = serializer.run_validation(row)
+            except ValidationError as e:
+                reject(line_number, e.detail)
+                continue
+            animals.append(Animal(tutor_id=tutor_id, **validated))
+
+        if animals:
+            with transaction.atomic():
+                Animal.objects.bulk_create(animals)
+            report["created"] += len(animals)
+            bump_animal_list_versions([tutor_id])
+
+    return report
+
+
+def _export_rows(queryset, chunk_size, request):
+    rows = queryset.values(*ANIMAL_READ_FIELDS).order_by('created_at', 'id').iterator(chunk_size=chunk_size)
+    for chunk in _chunked(rows, chunk_size):
+        yield serialize_animal_rows(chunk, request)
+
+
+def iter_ndjson_export(queryset, request=None, chunk_size=None):
+    """
+    Streams ``queryset`` as NDJSON, one AnimalSerializer object per line.
+    Rows are read through a server-side cursor ``chunk_size`` at a time, so
+    memory stays flat whatever the number of animals.
+    """
+
+    renderer = ORJSONRenderer()
+    for data in _export_rows(queryset, chunk_size or settings.ANIMAL_EXPORT_CHUNK_SIZE, request):
+        yield b"".join(renderer.render(animal) + b"\n" for animal in data)
+
+
+def iter_csv_export(queryset, request=None, chunk_size=None):
+    """
+    Streams ``queryset`` as CSV with a header line, in the same chunks as
+    iter_ndjson_export. ``photo_variants`` is left out.
+    """
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, CSV_EXPORT_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for data in _export_rows(queryset, chunk_size or settings.ANIMAL_EXPORT_CHUNK_SIZE, request):
+        writer.writerows(data)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -0,0 +1,141 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .llm import FALLBACK_THOUGHT
+
+THOUGHT_CACHE_ALIAS = 'thoughts'
+THOUGHT_HITS_KEY = 'thought-cache:hits'
+THOUGHT_MISSES_KEY = 'thought-cache:misses'
+
+
+def _incr(cache, key, delta):
+    if not delta:
+        return
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout=None)
+
+
+def thought_cache_key(prompt: str, day=None) -> str:
+    """
+    Key of a generated thought: a hash of the whitespace- and case-normalized
+    prompt plus the calendar day, so each profile gets one thought per day.
+    """
+
+    normalized = " ".join(prompt.lower().split())
+    day = day or timezone.localdate()
+    digest = hashlib.sha256(normalized.encode()).hexdigest()
+    return f"thought:{day.isoformat()}:{digest}"
+
+
+def get_cached_thoughts(prompts: dict) -> dict:
+    """
+    Looks up ``{key: prompt}`` in the thought cache and returns ``{key: thought}``
+    for the hits.
+    """
+
+    if not prompts:
+        return {}
+
+    cache = caches[THOUGHT_CACHE_ALIAS]
+    cache_keys = {key: thought_cache_key(prompt) for key, prompt in prompts.items()}
+    found = cache.get_many(set(cache_keys.values()))
+    thoughts = {key: found[cache_key] for key, cache_key in cache_keys.items() if cache_key in found}
+
+    _incr(cache, THOUGHT_HITS_KEY, len(thoughts))
+    _incr(cache, THOUGHT_MISSES_KEY, len(prompts) - len(thoughts))
+    return thoughts
+
+
+def cache_thoughts(prompts: dict, thoughts: dict):
+    """
+    Stores ``{key: thought}`` for the matching ``prompts``. Fallback answers are
+    never cached so they get retried.
+    """
+
+    entries = {
+        thought_cache_key(prompts[key]): thought
+        for key, thought in thoughts.items()
+        if thought and thought != FALLBACK_THOUGHT
+    }
+    if entries:
+        caches[THOUGHT_CACHE_ALIAS].set_many(entries, timeout=settings.THOUGHT_CACHE_TTL_SECONDS)
+
+
+def thought_cache_stats() -> dict:
+    cache = caches[THOUGHT_CACHE_ALIAS]
+    counts = cache.get_many([THOUGHT_HITS_KEY, THOUGHT_MISSES_KEY])
+    return {
+        "hits": counts.get(THOUGHT_HITS_KEY, 0),
+        "misses": counts.get(THOUGHT_MISSES_KEY, 0),
+    }
+
+
+ANIMAL_LIST_CACHE_ALIAS = 'default'
+ANIMAL_LIST_HITS_KEY = 'animal-list-cache:hits'
+ANIMAL_LIST_MISSES_KEY = 'animal-list-cache:misses'
+
+
+def _animal_list_version_key(tutor_id) -> str:
+    return f"animal-list:version:{tutor_id}"
+
+
+def animal_list_version(tutor_id) -> int:
+    """
+    Current version of a tutor's cached list pages. A lost version key starts
+    again from the clock, never from a number older pages could still use.
+    """
+
+    cache = caches[ANIMAL_LIST_CACHE_ALIAS]
+    key = _animal_list_version_key(tutor_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_animal_list_versions(tutor_ids):
+    """
+    Invalidates every cached list page of ``tutor_ids`` by moving their
+    version on; the old pages are never read again and expire on their own.
+    """
+
+    cache = caches[ANIMAL_LIST_CACHE_ALIAS]
+    for tutor_id in set(tutor_ids):
+        key = _animal_list_version_key(tutor_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def animal_list_cache_key(tutor_id, url: str) -> str:
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f"animal-list:{tutor_id}:{animal_list_version(tutor_id)}:{digest}"
+
+
+def get_cached_animal_list(key: str):
+    cache = caches[ANIMAL_LIST_CACHE_ALIAS]
+    entry = cache.get(key)
+    _incr(cache, ANIMAL_LIST_HITS_KEY if entry is not None else ANIMAL_LIST_MISSES_KEY, 1)
+    return entry
+
+
+def cache_animal_list(key: str, entry: dict):
+    caches[ANIMAL_LIST_CACHE_ALIAS].set(key, entry, timeout=settings.ANIMAL_LIST_CACHE_TTL_SECONDS)
+
+
+def animal_list_cache_stats() -> dict:
+    cache = caches[ANIMAL_LIST_CACHE_ALIAS]
+    counts = cache.get_many([ANIMAL_LIST_HITS_KEY, ANIMAL_LIST_MISSES_KEY])
+    return {
+        "hits": counts.get(ANIMAL_LIST_HITS_KEY, 0),
+        "misses": counts.get(ANIMAL_LIST_MISSES_KEY, 0),
+    }
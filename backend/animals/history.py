@@ -0,0 +1,248 @@
+"""
+Thought history storage. On PostgreSQL ``animals_thoughthistory`` is range
+partitioned by month: one ``animals_thoughthistory_pYYYY_MM`` table per
+month plus a default partition that catches rows written before their
+month's partition exists. Retention then costs one DDL statement per month
+instead of a DELETE per row. Other databases get a plain table with the same
+functions done through the ORM.
+"""
+
+import re
+from datetime import date
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from .models import ThoughtHistory
+
+TABLE = ThoughtHistory._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+_PARTITION_RE = re.compile(rf"^{TABLE}_p(\d{{4}})_(\d{{2}})$")
+_COMPACTED = 'compacted'
+
+
+def add_months(month: date, months: int) -> date:
+    year, index = divmod(month.month - 1 + months, 12)
+    return date(month.year + year, index + 1, 1)
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month:%Y_%m}"
+
+
+def _connection():
+    return connections[router.db_for_write(ThoughtHistory)]
+
+
+def is_partitioned(connection=None) -> bool:
+    return (connection or _connection()).vendor == 'postgresql'
+
+
+def history_rows(entries):
+    """
+    Returns the ThoughtHistory rows of ``(animal_id, thought, generated_at)``
+    entries, one per animal and day, the last entry of a day winning.
+    """
+
+    rows = {}
+    for animal_id, thought, generated_at in entries:
+        day = timezone.localdate(generated_at)
+        rows[(animal_id, day)] = ThoughtHistory(
+            animal_id=animal_id,
+            date=day,
+            thought=thought[:ThoughtHistory.THOUGHT_MAX_LENGTH],
+            generated_at=generated_at,
+        )
+    return list(rows.values())
+
+
+def record_history(entries, batch_size=None):
+    """
+    Upserts the history rows of ``entries``: regenerating a thought on the same
+    day replaces that day's row.
+    """
+
+    ThoughtHistory.objects.bulk_create(
+        history_rows(entries),
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=('animal', 'date'),
+        update_fields=('thought', 'generated_at'),
+    )
+
+
+def list_partitions(connection=None) -> dict:
+    """
+    Returns ``{month: compacted}`` for the monthly partitions that exist, or an
+    empty dict where the table is not partitioned.
+    """
+
+    connection = connection or _connection()
+    if not is_partitioned(connection):
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, obj_description(child.oid, 'pg_class')
+            FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = %s::regclass
+            """,
+            [TABLE],
+        )
+        partitions = {}
+        for name, comment in cursor.fetchall():
+            match = _PARTITION_RE.match(name)
+            if match:
+                partitions[date(int(match[1]), int(match[2]), 1)] = comment == _COMPACTED
+    return dict(sorted(partitions.items()))
+
+
+def _lock(cursor):
+    # Serializes partition maintenance across processes for the transaction.
+    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [TABLE])
+
+
+def _attach(cursor, name, month):
+    cursor.execute(
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def _create_partition(cursor, month):
+    """
+    Creates the partition of ``month``, moving in the rows the default
+    partition holds for it, then attaches it. Attaching builds its primary
+    key and foreign key from the parent's.
+    """
+
+    name = partition_name(month)
+    cursor.execute(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved",
+        [month, add_months(month, 1)],
+    )
+    _attach(cursor, name, month)
+
+
+def ensure_partitions(months_ahead=1, today=None) -> list:
+    """
+    Creates the missing partitions from the current month to ``months_ahead``
+    months ahead and returns their months. A no-op where the table is not
+    partitioned.
+    """
+
+    connection = _connection()
+    if not is_partitioned(connection):
+        return []
+
+    first = month_start(today or timezone.localdate())
+    months = [add_months(first, offset) for offset in range(months_ahead + 1)]
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        _lock(cursor)
+        existing = list_partitions(connection)
+        for month in months:
+            if month not in existing:
+                _create_partition(cursor, month)
+                created.append(month)
+    return created
+
+
+def _compact_partition(cursor, month):
+    """
+    Rewrites the partition of ``month`` with only the last thought of each
+    animal in that month, then swaps it in: the old table is dropped whole,
+    so no dead rows are left behind.
+    """
+
+    name = partition_name(month)
+    compacted = f"{name}_compacted"
+    cursor.execute(f"CREATE TABLE {compacted} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"INSERT INTO {compacted} SELECT DISTINCT ON (animal_id) * FROM {name} ORDER BY animal_id, date DESC"
+    )
+    cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+    cursor.execute(f"DROP TABLE {name}")
+    cursor.execute(f"ALTER TABLE {compacted} RENAME TO {name}")
+    _attach(cursor, name, month)
+    cursor.execute(f"COMMENT ON TABLE {name} IS '{_COMPACTED}'")
+
+
+def _compact_rows(month):
+    rows = ThoughtHistory.objects.filter(date__gte=month, date__lt=add_months(month, 1))
+    latest = rows.filter(animal=OuterRef('animal')).order_by('-date').values('date')[:1]
+    rows.exclude(date=Subquery(latest)).delete()
+
+
+def prune_history(drop_before=None, compact_before=None, dry_run=False) -> list:
+    """
+    Applies retention to the months before ``drop_before`` (dropped) and
+    before ``compact_before`` (compacted to the last thought per animal), both
+    first days of a month. Returns ``[(month, action)]``.
+
+    On PostgreSQL the work is per partition: a DROP TABLE per expired month and
+    one rewrite per month to compact, never done twice for the same month.
+    Elsewhere the rows are deleted through the ORM.
+    """
+
+    connection = _connection()
+
+    if not is_partitioned(connection):
+        cutoff = max(filter(None, (drop_before, compact_before)), default=None)
+        if cutoff is None:
+            return []
+        actions = []
+        for day in ThoughtHistory.objects.filter(date__lt=cutoff).dates('date', 'month'):
+            month = month_start(day)
+            action = 'dropped' if drop_before and month < drop_before else 'compacted'
+            actions.append((month, action))
+            if dry_run:
+                continue
+            if action == 'dropped':
+                ThoughtHistory.objects.filter(date__gte=month, date__lt=add_months(month, 1)).delete()
+            else:
+                _compact_rows(month)
+        return actions
+
+    actions = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        _lock(cursor)
+        for month, compacted in list_partitions(connection).items():
+            if drop_before and month < drop_before:
+                actions.append((month, 'dropped'))
+                if not dry_run:
+                    cursor.execute(f"DROP TABLE {partition_name(month)}")
+            elif compact_before and month < compact_before and not compacted:
+                actions.append((month, 'compacted'))
+                if not dry_run:
+                    _compact_partition(cursor, month)
+        if drop_before and not dry_run:
+            # Stragglers in the default partition, normally none.
+            cursor.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE date < %s", [drop_before])
+    return actions
+
+
+def retention_cutoffs(today=None, retention_months=None, compact_after_months=None):
+    """
+    Returns the ``(drop_before, compact_before)`` months for prune_history:
+    the current month and the ``retention_months`` before it are kept, and
+    the months older than ``compact_after_months`` are compacted. ``0`` turns
+    either off.
+    """
+
+    this_month = month_start(today or timezone.localdate())
+    retention_months = settings.THOUGHT_HISTORY_RETENTION_MONTHS if retention_months is None else retention_months
+    if compact_after_months is None:
+        compact_after_months = settings.THOUGHT_HISTORY_COMPACT_AFTER_MONTHS
+    return (
+        add_months(this_month, -retention_months) if retention_months else None,
+        add_months(this_month, -compact_after_months) if compact_after_months else None,
+    )
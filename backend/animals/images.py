@@ -0,0 +1,52 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+def variant_name(photo_name: str, width: int) -> str:
+    directory, filename = os.path.split(photo_name)
+    stem, _ = os.path.splitext(filename)
+    return os.path.join(directory, 'variants', f"{stem}_{width}w.webp")
+
+
+def build_photo_variants(photo) -> dict:
+    """
+    Resizes ``photo`` to each of PHOTO_VARIANT_WIDTHS and stores the results as
+    WebP next to the original. Returns ``{width: storage name}``. The photo is
+    never upscaled: widths above the original's are skipped, except that the
+    smallest one is always produced, at the original size.
+    """
+
+    with photo.open('rb'), Image.open(photo) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+        variants = {}
+        for width in sorted(settings.PHOTO_VARIANT_WIDTHS):
+            if width > image.width and variants:
+                break
+            resized = image.copy()
+            resized.thumbnail((width, image.height), Image.LANCZOS)
+
+            buffer = BytesIO()
+            resized.save(buffer, 'WEBP', quality=settings.PHOTO_VARIANT_QUALITY, method=4)
+            name = default_storage.save(variant_name(photo.name, width), ContentFile(buffer.getvalue()))
+            variants[str(width)] = name
+    return variants
+
+
+def delete_photo_variants(variants: dict):
+    for name in (variants or {}).values():
+        default_storage.delete(name)
+
+
+def delete_photo(name: str, variants: dict):
+    """Deletes a photo and its variants from the storage."""
+
+    if name:
+        default_storage.delete(name)
+    delete_photo_variants(variants)
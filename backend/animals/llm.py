@@ -1,29 +1,130 @@
 import os
 import time
+import asyncio
+import threading
+import weakref
 import httpx
 import json
 
+from petcare import metrics
+
+from .ratelimit import CircuitBreaker, RateLimitExceeded, TokenBucket
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 MODEL_NAME = "gemini-2.5-flash"
-API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{MODEL_NAME}:generateContent"
+API_BASE_URL = os.getenv("GEMINI_API_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+API_URL = f"{API_BASE_URL}/models/{MODEL_NAME}:generateContent"
+STREAM_API_URL = f"{API_BASE_URL}/models/{MODEL_NAME}:streamGenerateContent?alt=sse"
 
-MAX_RETRIES = 3
-RETRY_WAIT_SECONDS = 5
+RATE_LIMIT_PER_SECOND = float(os.getenv("LLM_RATE_LIMIT_PER_SECOND", 10))
+RATE_LIMIT_BURST = float(os.getenv("LLM_RATE_LIMIT_BURST", RATE_LIMIT_PER_SECOND))
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT_SECONDS", 10))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv("LLM_CIRCUIT_COOLDOWN_SECONDS", 60))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", 30))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", 5))
+POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", 100))
+POOL_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_KEEPALIVE_CONNECTIONS", 20))
+POOL_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY_SECONDS", 30))
 
-def generate_text_for_animal(prompt: str, max_tokens: int = 60) -> str:
+FALLBACK_THOUGHT = "Could not generate the thought at this time."
+
+rate_limiter = TokenBucket("gemini", RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+circuit_breaker = CircuitBreaker("gemini", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_COOLDOWN_SECONDS)
+
+
+class GeminiUnavailable(Exception):
     """
-    Generates a text (thought) for an animal using the Gemini API (Google Generative Language).
+    Raised when Gemini throttles us (429/503), the circuit breaker is open or
+    the rate limiter would make the call wait longer than
+    RATE_LIMIT_MAX_WAIT_SECONDS. ``retry_after`` hints, in seconds, when it is worth trying again.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _client_options() -> dict:
+    return {
+        "http2": HTTP2_AVAILABLE,
+        "timeout": httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+        "limits": httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    }
+
+
+def get_client() -> httpx.Client:
+    """
+    Returns the process-wide Gemini client, creating it on first use so every
+    call reuses the same pool of keep-alive connections.
+    """
+
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(**_client_options())
+        return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Returns the async Gemini client bound to the running event loop. Async
+    connections cannot be shared across loops, so there is one client per loop.
+    """
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_options())
+        _async_clients[loop] = client
+    return client
+
+
+def close_clients():
+    """
+    Closes the pooled clients. Async clients are closed on their own loop when
+    it is idle; clients of closed or running loops are just dropped.
     """
 
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+    for loop, client in list(_async_clients.items()):
+        if not loop.is_closed() and not loop.is_running():
+            loop.run_until_complete(client.aclose())
+        _async_clients.pop(loop, None)
+
+
+def _build_headers() -> dict:
     if not GEMINI_API_KEY:
         raise RuntimeError("GEMINI_API_KEY not set")
 
-    headers = {
+    return {
         "x-goog-api-key": GEMINI_API_KEY,
         "Content-Type": "application/json"
     }
 
-    payload = {
+
+def _build_payload(prompt: str) -> dict:
+    return {
         "contents": [
             {
             "parts": [
@@ -35,31 +136,323 @@ def generate_text_for_animal(prompt: str, max_tokens: int = 60) -> str:
         ]
     }
 
-    with httpx.Client(timeout=30) as client:
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                resp = client.post(API_URL, headers=headers, json=payload)
-                resp.raise_for_status()
-                data = resp.json()
 
-                try:
-                    return data["candidates"][0]["content"]["parts"][0]["text"].strip()
+def _extract_text(data: dict) -> str:
+    try:
+        return data["candidates"][0]["content"]["parts"][0]["text"].strip()
+    except Exception:
+        return FALLBACK_THOUGHT
+
+
+def _before_call(operation: str) -> float:
+    """
+    Fails fast while the circuit is open (or half-open with its probe in
+    flight) and when the rate limiter's queue is longer than
+    RATE_LIMIT_MAX_WAIT_SECONDS. Otherwise reserves a rate limiter token and
+    returns how long to wait before sending the request.
+    """
+
+    remaining = circuit_breaker.allow_request()
+    if remaining:
+        metrics.LLM_REQUESTS.labels(operation, "circuit_open").inc()
+        raise GeminiUnavailable("Gemini circuit breaker is open", retry_after=remaining)
+    try:
+        delay = rate_limiter.reserve(max_wait=RATE_LIMIT_MAX_WAIT_SECONDS)
+    except RateLimitExceeded as e:
+        metrics.LLM_REQUESTS.labels(operation, "rate_limited").inc()
+        raise GeminiUnavailable("Gemini rate limit queue is full", retry_after=e.wait) from e
+    metrics.LLM_RATE_LIMIT_WAIT.observe(delay)
+    return delay
+
+
+def _wait(delay: float):
+    try:
+        time.sleep(delay)
+    except BaseException:
+        rate_limiter.refund()
+        raise
+
+
+async def _await(delay: float):
+    # Cancelled callers (client disconnects, closed generators) hand their
+    # token back instead of leaving the bucket in debt for nothing.
+    try:
+        await asyncio.sleep(delay)
+    except BaseException:
+        rate_limiter.refund()
+        raise
+
+
+def _record_call(operation: str, status: str, started: float):
+    metrics.LLM_REQUEST_DURATION.labels(operation).observe(time.perf_counter() - started)
+    metrics.LLM_REQUESTS.labels(operation, status).inc()
+
+
+def _retry_after(response: httpx.Response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _handle_status_error(e: httpx.HTTPStatusError):
+    status_code = e.response.status_code
+    if status_code in (429, 503):
+        circuit_breaker.record_failure()
+        raise GeminiUnavailable(
+            f"Gemini returned {status_code}",
+            retry_after=_retry_after(e.response),
+        ) from e
+    elif status_code < 500:
+        # Any other 4xx is a problem with the request, not an outage: it
+        # still counts as a success, which also frees a half-open probe.
+        circuit_breaker.record_success()
+        if status_code in (400, 401):
+            return
+        raise e
+    else:
+        circuit_breaker.record_failure()
+        raise e
+
+
+def _post(client: httpx.Client, payload: dict, operation: str = "generate"):
+    """
+    Posts ``payload`` to Gemini through the shared rate limiter and circuit
+    breaker. Returns the decoded JSON body, or None when the call failed.
+    Latency and outcome are recorded under ``operation``.
+
+    Throttling (429/503), an open circuit and a rate limit wait over
+    RATE_LIMIT_MAX_WAIT_SECONDS raise GeminiUnavailable instead of sleeping,
+    so callers can reschedule the work.
+    """
+
+    headers = _build_headers()
+    _wait(_before_call(operation))
+
+    started = time.perf_counter()
+    status = "error"
+    try:
+        resp = client.post(API_URL, headers=headers, json=payload)
+        status = str(resp.status_code)
+        resp.raise_for_status()
+        data = resp.json()
+    except httpx.HTTPStatusError as e:
+        return _handle_status_error(e)
+    except httpx.TransportError as e:
+        status = "transport_error"
+        circuit_breaker.record_failure()
+        print(f"[ERROR] Failed to generate text: {e}")
+        return None
+    except Exception as e:
+        circuit_breaker.record_failure()
+        print(f"[ERROR] Failed to generate text: {e}")
+        return None
+    finally:
+        _record_call(operation, status, started)
 
+    circuit_breaker.record_success()
+    return data
+
+
+async def _apost(client: httpx.AsyncClient, payload: dict, operation: str = "generate"):
+    headers = _build_headers()
+    await _await(_before_call(operation))
+
+    started = time.perf_counter()
+    status = "error"
+    try:
+        resp = await client.post(API_URL, headers=headers, json=payload)
+        status = str(resp.status_code)
+        resp.raise_for_status()
+        data = resp.json()
+    except httpx.HTTPStatusError as e:
+        return _handle_status_error(e)
+    except httpx.TransportError as e:
+        status = "transport_error"
+        circuit_breaker.record_failure()
+        print(f"[ERROR] Failed to generate text: {e}")
+        return None
+    except Exception as e:
+        circuit_breaker.record_failure()
+        print(f"[ERROR] Failed to generate text: {e}")
+        return None
+    finally:
+        _record_call(operation, status, started)
+
+    circuit_breaker.record_success()
+    return data
+
+
+def generate_text_for_animal(prompt: str, max_tokens: int = 60) -> str:
+    """
+    Generates a text (thought) for an animal using the Gemini API (Google Generative Language).
+    """
+
+    data = _post(get_client(), _build_payload(prompt))
+
+    if data is None:
+        return FALLBACK_THOUGHT
+    return _extract_text(data)
+
+
+async def agenerate_text_for_animal(prompt: str, client: httpx.AsyncClient = None, max_tokens: int = 60) -> str:
+    """
+    Async counterpart of generate_text_for_animal. Uses the pooled client of
+    the running loop unless ``client`` is given.
+    """
+
+    client = client or get_async_client()
+    data = await _apost(client, _build_payload(prompt))
+
+    if data is None:
+        return FALLBACK_THOUGHT
+    return _extract_text(data)
+
+
+def _build_batch_payload(prompts: dict) -> dict:
+    lines = [
+        "You will write one thought for each animal below, following the instructions given for it.",
+        "",
+    ]
+    for animal_id, prompt in prompts.items():
+        lines.append(f"Animal id {animal_id}: {prompt}")
+    lines += [
+        "",
+        "Answer with a JSON array containing one object per animal, "
+        "in the form {\"id\": \"<animal id>\", \"thought\": \"<thought>\"}.",
+    ]
+
+    payload = _build_payload("\n".join(lines))
+    payload["generationConfig"] = {
+        "responseMimeType": "application/json",
+        "responseSchema": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "id": {"type": "STRING"},
+                    "thought": {"type": "STRING"},
+                },
+                "required": ["id", "thought"],
+            },
+        },
+    }
+    return payload
+
+
+def _parse_batch_response(data, expected_ids) -> dict:
+    """
+    Returns ``{animal_id: thought}`` for every well-formed entry of a batched
+    response. Unknown ids, duplicates and empty thoughts are dropped.
+    """
+
+    if data is None:
+        return {}
+
+    try:
+        items = json.loads(data["candidates"][0]["content"]["parts"][0]["text"])
+    except Exception:
+        return {}
+
+    if not isinstance(items, list):
+        return {}
+
+    thoughts = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        animal_id = item.get("id")
+        thought = item.get("thought")
+        if animal_id not in expected_ids or animal_id in thoughts:
+            continue
+        if not isinstance(thought, str) or not thought.strip():
+            continue
+        thoughts[animal_id] = thought.strip()
+    return thoughts
+
+
+def generate_texts_for_animals(prompts: dict) -> dict:
+    """
+    Generates thoughts for several animals with a single Gemini request.
+
+    ``prompts`` maps animal ids (as strings) to their individual prompts. The
+    model is asked for a JSON array keyed by id; any animal missing from a
+    valid answer falls back to its own generate_text_for_animal call.
+    """
+
+    if len(prompts) == 1:
+        (animal_id, prompt), = prompts.items()
+        return {animal_id: generate_text_for_animal(prompt)}
+
+    data = _post(get_client(), _build_batch_payload(prompts), operation="batch")
+
+    thoughts = _parse_batch_response(data, prompts.keys())
+    missing = [animal_id for animal_id in prompts if animal_id not in thoughts]
+    metrics.LLM_BATCH_FALLBACKS.inc(len(missing))
+    for animal_id in missing:
+        thoughts[animal_id] = generate_text_for_animal(prompts[animal_id])
+    return thoughts
+
+
+async def agenerate_texts_for_animals(prompts: dict, client: httpx.AsyncClient = None) -> dict:
+    """
+    Async counterpart of generate_texts_for_animals.
+    """
+
+    client = client or get_async_client()
+
+    if len(prompts) == 1:
+        (animal_id, prompt), = prompts.items()
+        return {animal_id: await agenerate_text_for_animal(prompt, client)}
+
+    data = await _apost(client, _build_batch_payload(prompts), operation="batch")
+
+    thoughts = _parse_batch_response(data, prompts.keys())
+    missing = [animal_id for animal_id in prompts if animal_id not in thoughts]
+    metrics.LLM_BATCH_FALLBACKS.inc(len(missing))
+    fallbacks = await asyncio.gather(*(agenerate_text_for_animal(prompts[animal_id], client) for animal_id in missing))
+    thoughts.update(zip(missing, fallbacks))
+    return thoughts
+
+
+def stream_text_for_animal(prompt: str):
+    """
+    Streams a thought with Gemini's streamGenerateContent, yielding text
+    fragments as the model produces them. Yields the fallback thought if the
+    call fails before producing any text.
+    """
+
+    headers = _build_headers()
+    _wait(_before_call("stream"))
+    produced = False
+
+    started = time.perf_counter()
+    status = "error"
+    try:
+        with get_client().stream("POST", STREAM_API_URL, headers=headers, json=_build_payload(prompt)) as resp:
+            status = str(resp.status_code)
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                try:
+                    text = json.loads(line[5:])["candidates"][0]["content"]["parts"][0]["text"]
                 except Exception:
-                    return "Could not generate the thought at this time."
-
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code in (429, 503):
-                    wait_time = RETRY_WAIT_SECONDS * attempt
-                    time.sleep(wait_time)
-                elif e.response.status_code == 401:
-                    break
-                elif e.response.status_code == 400:
-                    break
-                else:
-                    raise
-            except Exception as e:
-                print(f"[ERROR] Failed to generate text: {e}")
-                break
-
-    return "Could not generate the thought at this time."
+                    continue
+                if text:
+                    produced = True
+                    yield text
+    except httpx.HTTPStatusError as e:
+        _handle_status_error(e)
+    except httpx.TransportError as e:
+        status = "transport_error"
+        circuit_breaker.record_failure()
+        print(f"[ERROR] Failed to stream text: {e}")
+    else:
+        circuit_breaker.record_success()
+    finally:
+        _record_call("stream", status, started)
+
+    if not produced:
+        yield FALLBACK_THOUGHT
+
@@ -1,57 +1,61 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
-from animals.models import Animal
-from django.utils import timezone
+from animals.cache import bump_animal_list_versions
+from animals.mock_data import create_mock_animals, create_mock_tutors, delete_mock_animals, mock_tutors
 import random
+import time
 
 
 class Command(BaseCommand):
-    help = 'Gera 3 tutores e 10 animais para cada um (mock).'
+    help = 'Gera tutores e animais mock com inserts em lote (ex.: --tutors 10000 --animals-per-tutor 100).'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--tutors', type=int, default=3, help='Number of tutors to create.')
+        parser.add_argument('--animals-per-tutor', type=int, default=3, help='Number of animals per tutor.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed, for reproducible data.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk INSERT.')
+        parser.add_argument('--with-thoughts', action='store_true', help="Pre-fill today's thoughts.")
+        parser.add_argument('--password', default='123456', help='Password of every mock tutor.')
+        parser.add_argument('--prefix', default='mock', help='Username prefix of the mock tutors.')
 
     def handle(self, *args, **options):
-        User = get_user_model()
-
-
-        tutors_data = [
-            {"username": "alice", "email": "alice@example.com", "name": "Alice Santos"},
-            {"username": "bruno", "email": "bruno@example.com", "name": "Bruno Almeida"},
-            {"username": "carla", "email": "carla@example.com", "name": "Carla Ribeiro"},
-        ]
-
-        species_list = ["dog", "cat", "rabbit", "bird", "hamster", "fish", "reptile", "horse", "other"]
-        animal_names = ["Rex", "Luna", "Mimi", "Bolt", "Tico", "Nala", "Foxy", "Toby", "Belinha", "Fred"]
-        breeds = ["Mixed", "Labrador", "Persian", "Siamese", "Golden", "Mini Lop", "Cockatiel", "Syrian", "Betta", "Corn Snake", "Arabian"]
-
+        prefix = options['prefix']
+        rng = random.Random(options['seed'])
+        started = time.monotonic()
 
         self.stdout.write(self.style.WARNING("Deleting old data..."))
-        Animal.objects.all().delete()
-        User.objects.filter(username__in=[t["username"] for t in tutors_data]).delete()
+        old_tutors = mock_tutors(prefix)
+        old_tutor_ids = list(old_tutors.values_list('pk', flat=True))
+        # Plain DELETEs send no signals, so the cached list pages are
+        # invalidated here.
+        delete_mock_animals(old_tutor_ids, options['batch_size'])
+        bump_animal_list_versions(old_tutor_ids)
+        old_tutors.delete()
 
         self.stdout.write(self.style.SUCCESS("Creating tutors..."))
-        tutors = []
-        for data in tutors_data:
-            user = User(username=data["username"], email=data["email"], name=data["name"])
-            user.set_password("123456")
-            user.save()
-            tutors.append(user)
+        tutors = create_mock_tutors(options['tutors'], options['password'], prefix, options['batch_size'])
 
         self.stdout.write(self.style.SUCCESS("Creating animals..."))
-        pk = 1
-        for tutor in tutors:
-            for _ in range(3):
-                Animal.objects.create(
-                    id=pk,
-                    tutor=tutor,
-                    name=random.choice(animal_names),
-                    species=random.choice(species_list),
-                    breed=random.choice(breeds),
-                    age=random.randint(1, 15),
-                    photo=None,
-                    thought_of_the_day=None,
-                    thought_generated_at=None,
-                )
-                pk += 1
-
-
-        self.stdout.write(self.style.SUCCESS("Mock data created successfully!"))
\ No newline at end of file
+
+        last_report = 0
+
+        def progress(created, total):
+            nonlocal last_report
+            elapsed = time.monotonic() - started
+            if created == total or elapsed - last_report >= 1:
+                last_report = elapsed
+                rate = created / elapsed if elapsed > 0 else 0
+                self.stdout.write(f"  {created}/{total} animals ({elapsed:.1f}s, {rate:.0f} rows/s)")
+
+        created = create_mock_animals(
+            [tutor.pk for tutor in tutors],
+            options['animals_per_tutor'],
+            rng=rng,
+            with_thoughts=options['with_thoughts'],
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Mock data created successfully! {len(tutors)} tutors, {created} animals "
+            f"in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from animals.history import ensure_partitions, prune_history, retention_cutoffs
+
+
+class Command(BaseCommand):
+    help = 'Cria as partições futuras do histórico de pensamentos e aplica a retenção (descarta ou compacta meses antigos).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-months', type=int, default=settings.THOUGHT_HISTORY_RETENTION_MONTHS,
+            help='Months kept before the current one; older months are dropped (0 keeps everything).',
+        )
+        parser.add_argument(
+            '--compact-after-months', type=int, default=settings.THOUGHT_HISTORY_COMPACT_AFTER_MONTHS,
+            help='Months older than this keep only the last thought per animal (0 disables compaction).',
+        )
+        parser.add_argument(
+            '--months-ahead', type=int, default=settings.THOUGHT_HISTORY_PARTITIONS_AHEAD,
+            help='Monthly partitions to create ahead of the current month.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only list what would be done.')
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            for month in ensure_partitions(options['months_ahead']):
+                self.stdout.write(self.style.SUCCESS(f"Created partition for {month:%Y-%m}"))
+
+        drop_before, compact_before = retention_cutoffs(
+            retention_months=options['retention_months'],
+            compact_after_months=options['compact_after_months'],
+        )
+        actions = prune_history(drop_before, compact_before, dry_run=options['dry_run'])
+        prefix = "Would have " if options['dry_run'] else ""
+        for month, action in actions:
+            self.stdout.write(f"{prefix}{action} {month:%Y-%m}")
+        self.stdout.write(self.style.SUCCESS(f"Thought history pruned: {len(actions)} month(s)."))
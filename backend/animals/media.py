@@ -0,0 +1,229 @@
+"""
+Protected serving of the uploaded media kept on the local filesystem.
+
+Media URLs carry a timestamped signature of the animal, its tutor and its
+photo, issued by the API to that tutor, since browsers load photos with plain
+``<img>`` tags that send no token; the photo and its variants share it. The
+view checks the signature, its age and that the animal still owns the file,
+then either hands the file to the front proxy (``X-Accel-Redirect``/
+``X-Sendfile``) or streams it itself.
+Photo names are content-hashed, so every response is cacheable as immutable.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import time
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+
+from .models import Animal
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_url_period() -> int:
+    """Start, as a Unix time, of the current signing period of media URLs."""
+
+    period = settings.MEDIA_URL_TTL_SECONDS
+    return int(time.time()) // period * period
+
+
+class _MediaSigner(signing.TimestampSigner):
+    """
+    Rounds timestamps down to MEDIA_URL_TTL_SECONDS, so an animal's URLs stay
+    the same, and cached, for that long. A URL is then valid for one to two
+    periods after it is issued.
+    """
+
+    def timestamp(self):
+        return signing.b62_encode(media_url_period())
+
+
+_signer = _MediaSigner(salt='animals.media')
+
+
+def serves_protected_media(storage=None) -> bool:
+    # Remote storages (S3) serve their objects themselves.
+    return isinstance(storage or default_storage, FileSystemStorage)
+
+
+def media_signature(animal_id, tutor_id, photo) -> tuple[str, str]:
+    """
+    Returns the ``(timestamp, signature)`` shared by the URLs of an animal's
+    photo and its variants, valid while ``photo`` is the animal's photo.
+    """
+
+    return tuple(_signer.sign(f"{animal_id}:{tutor_id}:{photo}").rsplit(':', 2)[1:])
+
+
+def check_media_signature(animal_id, tutor_id, photo, timestamp, signature) -> bool:
+    try:
+        _signer.unsign(
+            f"{animal_id}:{tutor_id}:{photo}:{timestamp}:{signature}",
+            max_age=2 * settings.MEDIA_URL_TTL_SECONDS,
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def media_urls(photo, variants, animal_id, tutor_id) -> tuple:
+    """
+    Returns the URLs of an animal's ``photo`` and of its ``{width: name}``
+    ``variants``: signed for the protected media view when the files are
+    local, with one signature for all of them, the storage's own URLs
+    otherwise.
+    """
+
+    variants = variants or {}
+    if not serves_protected_media():
+        return (
+            default_storage.url(photo) if photo else None,
+            {width: default_storage.url(name) for width, name in variants.items()},
+        )
+    if not photo and not variants:
+        return None, {}
+
+    timestamp, signature = media_signature(animal_id, tutor_id, photo)
+    query = f"?{urlencode({'animal': animal_id, 't': timestamp, 'sig': signature})}"
+    return (
+        default_storage.url(photo) + query if photo else None,
+        {width: default_storage.url(name) + query for width, name in variants.items()},
+    )
+
+
+def protected_media(request, name):
+    """
+    Serves ``name`` if the request's signature has not expired and was issued
+    for an animal that still owns the file, as its photo or one of its
+    variants, and still has the photo the signature was issued for. Anything
+    else is a 404, so the view does not reveal which files exist.
+    """
+
+    animal_id, timestamp, signature = request.GET.get('animal'), request.GET.get('t'), request.GET.get('sig')
+    if not animal_id or not timestamp or not signature:
+        raise Http404
+    try:
+        animal = Animal.objects.filter(id=animal_id).values('tutor_id', 'photo', 'photo_variants').first()
+    except ValidationError:
+        raise Http404
+    if animal is None or name not in (animal['photo'], *(animal['photo_variants'] or {}).values()):
+        raise Http404
+    if not check_media_signature(animal_id, animal['tutor_id'], animal['photo'], timestamp, signature):
+        raise Http404
+    return serve_media(request, name)
+
+
+def serve_media(request, name):
+    """
+    Returns the response for the local media file ``name``, as configured by
+    MEDIA_SERVE_MODE:
+
+    - ``x-accel``: an empty response whose ``X-Accel-Redirect`` makes nginx
+      send the file from its internal MEDIA_ACCEL_REDIRECT_PREFIX location;
+    - ``x-sendfile``: the same with ``X-Sendfile`` and the file's path, for
+      Apache's mod_xsendfile or lighttpd;
+    - ``django``: a FileResponse, which the WSGI server can send with
+      sendfile(), answering single-range requests with a 206.
+
+    Names never change content, so the ETag is derived from the name alone and
+    revalidations get a 304 without touching the file.
+    """
+
+    etag = f'"{hashlib.md5(name.encode(), usedforsecurity=False).hexdigest()}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        mode = settings.MEDIA_SERVE_MODE
+        if mode == 'x-accel':
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+        elif mode == 'x-sendfile':
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = default_storage.path(name)
+        else:
+            response = _file_response(request, default_storage.path(name), content_type, etag)
+    response['ETag'] = etag
+    response['Cache-Control'] = settings.MEDIA_CACHE_CONTROL
+    return response
+
+
+def _file_response(request, path, content_type, etag):
+    try:
+        file = open(path, 'rb')
+    except FileNotFoundError:
+        raise Http404
+
+    size = os.fstat(file.fileno()).st_size
+    byte_range = None
+    if request.headers.get('If-Range', etag) == etag:
+        byte_range = parse_range(request.headers.get('Range'), size)
+
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    elif byte_range is False:
+        file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(_FileRange(file, end - start + 1), content_type=content_type, status=206)
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def parse_range(header, size):
+    """
+    Returns the ``(start, end)`` bytes of a single-range ``Range`` header,
+    ``None`` when the whole file should be sent (no header, several ranges or
+    an invalid one) and ``False`` when the range is unsatisfiable.
+    """
+
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            return False
+        return max(size - suffix, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return False
+    if start > end:
+        return None
+    return start, end
+
+
+class _FileRange:
+    """Read-only view of the next ``length`` bytes of an open file."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
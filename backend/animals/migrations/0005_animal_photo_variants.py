@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0004_thoughtgenerationrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized WebP copies of the photo, by width'),
+        ),
+    ]
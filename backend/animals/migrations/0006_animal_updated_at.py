@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0005_animal_photo_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
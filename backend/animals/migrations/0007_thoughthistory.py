@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_thought_history(apps, schema_editor):
+    """
+    PostgreSQL gets a table range-partitioned by month, with a default
+    partition until ``animals.history.ensure_partitions`` creates the monthly
+    ones, and a primary key that also covers ``thought`` and ``generated_at``.
+    Other databases get the plain table.
+    """
+
+    ThoughtHistory = apps.get_model('animals', 'ThoughtHistory')
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.create_model(ThoughtHistory)
+        return
+
+    schema_editor.execute("""
+        CREATE TABLE animals_thoughthistory (
+            animal_id uuid NOT NULL,
+            date date NOT NULL,
+            thought varchar(500) NOT NULL,
+            generated_at timestamp with time zone NOT NULL,
+            CONSTRAINT animals_thoughthistory_pkey PRIMARY KEY (animal_id, date) INCLUDE (thought, generated_at),
+            CONSTRAINT animals_thoughthistory_animal_id_fk_animals_animal_id FOREIGN KEY (animal_id)
+                REFERENCES animals_animal (id) DEFERRABLE INITIALLY DEFERRED
+        ) PARTITION BY RANGE (date)
+    """)
+    schema_editor.execute(
+        "CREATE TABLE animals_thoughthistory_default PARTITION OF animals_thoughthistory DEFAULT"
+    )
+
+
+def drop_thought_history(apps, schema_editor):
+    schema_editor.delete_model(apps.get_model('animals', 'ThoughtHistory'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0006_animal_updated_at'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ThoughtHistory',
+                    fields=[
+                        ('pk', models.CompositePrimaryKey('animal', 'date', blank=True, editable=False, primary_key=True, serialize=False)),
+                        ('date', models.DateField()),
+                        ('thought', models.CharField(max_length=500)),
+                        ('generated_at', models.DateTimeField()),
+                        ('animal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thought_history', to='animals.animal')),
+                    ],
+                    options={
+                        'verbose_name_plural': 'thought history',
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_thought_history, drop_thought_history),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:01
+
+import animals.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0007_thoughthistory'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='animal',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, upload_to=animals.models.photo_upload_to),
+        ),
+    ]
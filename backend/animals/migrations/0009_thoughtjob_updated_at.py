@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0008_animal_photo_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thoughtjob',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0009_thoughtjob_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thoughtgenerationrun',
+            name='failed_chunks',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:05
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_created_at(apps, schema_editor):
+    # updated_at is the closest record of when an existing animal was created.
+    Animal = apps.get_model('animals', 'Animal')
+    Animal.objects.using(schema_editor.connection.alias).update(created_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('animals', '0011_animal_tutor_no_db_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='animal',
+            index=models.Index(fields=['tutor', 'created_at', 'id'], name='animal_tutor_created_idx'),
+        ),
+    ]
@@ -0,0 +1,178 @@
+import random
+import re
+import uuid
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import Animal, ThoughtHistory
+
+# Reserved top-level domain (RFC 2606): no real account can have these emails,
+# which is what marks a tutor as mock data.
+MOCK_EMAIL_DOMAIN = "mock.invalid"
+
+SPECIES = [choice[0] for choice in Animal.SPECIES_CHOICES]
+NAMES = ["Rex", "Luna", "Mimi", "Bolt", "Tico", "Nala", "Foxy", "Toby", "Belinha", "Fred"]
+BREEDS = ["Mixed", "Labrador", "Persian", "Siamese", "Golden", "Mini Lop", "Cockatiel", "Syrian", "Betta", "Corn Snake", "Arabian"]
+THOUGHTS = [
+    "I wonder if the mail carrier is coming back today.",
+    "Naps in the sun are the best part of being me.",
+    "If I stare at the treat jar long enough, it will open.",
+    "Today I will guard the couch with all my heart.",
+    "Is that a new smell? I must investigate immediately.",
+]
+
+ANIMAL_COLUMNS = (
+    'id', 'tutor', 'name', 'species', 'breed', 'age', 'photo', 'photo_variants',
+    'thought_of_the_day', 'thought_generated_at', 'updated_at', 'created_at',
+)
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def create_mock_tutors(count, password, prefix="mock", batch_size=5000):
+    """
+    Bulk-creates ``count`` tutors named ``{prefix}{i}`` and returns them. The
+    password is hashed once and the hash shared by every tutor, so creating
+    them costs no per-user hashing.
+    """
+
+    User = get_user_model()
+    password_hash = make_password(password)
+    tutors = User.objects.bulk_create(
+        [
+            User(username=f"{prefix}{i}", email=f"{prefix}{i}@{MOCK_EMAIL_DOMAIN}", name=f"Tutor {i}", password=password_hash)
+            for i in range(count)
+        ],
+        batch_size=batch_size,
+    )
+    if tutors and tutors[0].pk is None:
+        # Backends that cannot return the ids of a bulk insert.
+        tutors = list(User.objects.filter(username__in=[tutor.username for tutor in tutors]).order_by('id'))
+    return tutors
+
+
+def mock_tutors(prefix="mock"):
+    """
+    Returns the tutors created by ``create_mock_tutors`` with ``prefix``:
+    usernames ``{prefix}{i}`` with an email on MOCK_EMAIL_DOMAIN.
+    """
+
+    return get_user_model().objects.filter(
+        username__regex=rf'^{re.escape(prefix)}[0-9]+$',
+        email__endswith=f"@{MOCK_EMAIL_DOMAIN}",
+    )
+
+
+def delete_mock_animals(tutor_ids, batch_size=5000):
+    """
+    Deletes the animals of ``tutor_ids`` and their thought history with plain
+    DELETE statements, ``batch_size`` tutors at a time, and returns the number
+    of animals deleted.
+
+    The ORM cascade would load every animal to send its signals; like
+    ``create_mock_animals``, this sends none, so callers invalidate the cached
+    list pages themselves.
+    """
+
+    connection = connections[router.db_for_write(Animal)]
+    quote = connection.ops.quote_name
+    animals = quote(Animal._meta.db_table)
+    history = quote(ThoughtHistory._meta.db_table)
+    animal_id = quote(Animal._meta.get_field('id').column)
+    tutor_id = quote(Animal._meta.get_field('tutor').column)
+    history_animal_id = quote(ThoughtHistory._meta.get_field('animal').column)
+
+    deleted = 0
+    for batch in _chunked(tutor_ids, batch_size):
+        placeholders = ', '.join(['%s'] * len(batch))
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {history} WHERE {history_animal_id} IN "
+                f"(SELECT {animal_id} FROM {animals} WHERE {tutor_id} IN ({placeholders}))",
+                batch,
+            )
+            cursor.execute(f"DELETE FROM {animals} WHERE {tutor_id} IN ({placeholders})", batch)
+            deleted += cursor.rowcount
+    return deleted
+
+
+def iter_mock_animal_rows(tutor_ids, animals_per_tutor, connection, rng=None, with_thoughts=False):
+    """
+    Yields one tuple of database values per animal, in ANIMAL_COLUMNS order.
+    Everything, ids included, is drawn from ``rng``, so the same seed always
+    produces the same data. Only the id needs converting per row; the other
+    values are prepared once.
+    """
+
+    rng = rng or random.Random(0)
+    fields = {name: Animal._meta.get_field(name) for name in ANIMAL_COLUMNS}
+    prepare_id = fields['id'].get_db_prep_save
+    now = fields['updated_at'].get_db_prep_save(timezone.now(), connection)
+    no_variants = fields['photo_variants'].get_db_prep_save({}, connection)
+    generated_at = now if with_thoughts else None
+
+    for tutor_id in tutor_ids:
+        for _ in range(animals_per_tutor):
+            yield (
+                prepare_id(uuid.UUID(int=rng.getrandbits(128), version=4), connection),
+                tutor_id,
+                f"{rng.choice(NAMES)} {rng.randint(1, 10**6)}",
+                rng.choice(SPECIES),
+                rng.choice(BREEDS),
+                rng.randint(1, 15),
+                None,
+                no_variants,
+                rng.choice(THOUGHTS) if with_thoughts else None,
+                generated_at,
+                now,
+                now,
+            )
+
+
+def _copy_supported(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    return is_psycopg3
+
+
+def create_mock_animals(tutor_ids, animals_per_tutor, rng=None, with_thoughts=False, batch_size=5000, progress=None):
+    """
+    Inserts the rows of iter_mock_animal_rows ``batch_size`` at a time, calling
+    ``progress(created, total)`` after each batch, and returns the number of
+    animals created.
+
+    Rows skip the ORM's per-object SQL compilation: they are streamed with COPY
+    on PostgreSQL (psycopg 3) and sent with ``executemany`` elsewhere. Like
+    ``bulk_create``, this sends no signals.
+    """
+
+    connection = connections[router.db_for_write(Animal)]
+    table = connection.ops.quote_name(Animal._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(Animal._meta.get_field(name).column) for name in ANIMAL_COLUMNS)
+    use_copy = _copy_supported(connection)
+
+    total = len(tutor_ids) * animals_per_tutor
+    created = 0
+    rows = iter_mock_animal_rows(tutor_ids, animals_per_tutor, connection, rng, with_thoughts)
+    for batch in _chunked(rows, batch_size):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            if use_copy:
+                with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                    for row in batch:
+                        copy.write_row(row)
+            else:
+                placeholders = ', '.join(['%s'] * len(ANIMAL_COLUMNS))
+                cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", batch)
+        created += len(batch)
+        if progress is not None:
+            progress(created, total)
+    return created
@@ -1,6 +1,25 @@
+import hashlib
+import os
 import uuid
+from datetime import timedelta
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+PHOTO_UPLOAD_DIR = 'pet_photos/'
+
+
+def photo_upload_to(instance, filename):
+    """
+    Stores photos as ``pet_photos/<name>_<content hash><ext>``: a photo's URL
+    never points to other bytes, so it can be cached as immutable.
+    """
+
+    digest = hashlib.sha256()
+    for chunk in instance.photo.chunks():
+        digest.update(chunk)
+    stem, ext = os.path.splitext(os.path.basename(filename))
+    return f"{PHOTO_UPLOAD_DIR}{stem}_{digest.hexdigest()[:12]}{ext.lower()}"
 
 
 class Animal(models.Model):
@@ -17,14 +36,125 @@ class Animal(models.Model):
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    tutor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='pets')
+    # Indexed by animal_tutor_id_idx, whose (tutor, id) prefix serves the
+    # same lookups and also the cursor pages' ``ORDER BY id``.
+    tutor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='pets', db_index=False)
     name = models.CharField(max_length=120)
     species = models.CharField(max_length=20, choices=SPECIES_CHOICES)
     breed = models.CharField(max_length=80, blank=True, null=True)
     age = models.PositiveIntegerField(blank=True, null=True, help_text="Age in years")
-    photo = models.ImageField(upload_to='pet_photos/', null=True, blank=True)
+    photo = models.ImageField(upload_to=photo_upload_to, null=True, blank=True)
+    photo_variants = models.JSONField(default=dict, blank=True, help_text="Resized WebP copies of the photo, by width")
     thought_of_the_day = models.TextField(null=True, blank=True)
     thought_generated_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Ids are random UUIDs; page-number pages are sorted by this instead.
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tutor', 'id'], name='animal_tutor_id_idx'),
+            models.Index(fields=['tutor', 'created_at', 'id'], name='animal_tutor_created_idx'),
+            models.Index(fields=['thought_generated_at'], name='animal_thought_generated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.species})"
+
+
+class ThoughtJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tutor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='thought_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total = models.PositiveIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    results = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by every progress save, so stuck jobs can be told apart.
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.tutor} ({self.status})"
+
+    def fail_if_stale(self, timeout=None) -> bool:
+        """
+        Marks the job failed when it is pending or running but has not saved
+        any progress for ``timeout`` seconds (THOUGHT_JOB_TIMEOUT_SECONDS), as
+        happens when its worker is gone for good. Returns whether it did.
+        """
+
+        timeout = settings.THOUGHT_JOB_TIMEOUT_SECONDS if timeout is None else timeout
+        if self.status not in (self.STATUS_PENDING, self.STATUS_RUNNING):
+            return False
+        now = timezone.now()
+        if self.updated_at > now - timedelta(seconds=timeout):
+            return False
+        # Only if no progress was saved since this instance was loaded.
+        failed = ThoughtJob.objects.filter(id=self.id, updated_at=self.updated_at).update(
+            status=self.STATUS_FAILED, finished_at=now, updated_at=now,
+        )
+        if failed:
+            self.status, self.finished_at, self.updated_at = self.STATUS_FAILED, now, now
+        return bool(failed)
+
+
+class ThoughtGenerationRun(models.Model):
+    """
+    Checkpoint of the nightly generation for one window (day). Chunk tasks add
+    their stats as they finish, so an interrupted run can be inspected and
+    resumed. ``failed_chunks`` holds the ``[start_id, end_id]`` bounds of the
+    chunks that ran out of retries.
+    """
+
+    window_start = models.DateTimeField(unique=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    chunks = models.PositiveIntegerField(default=0)
+    chunks_done = models.PositiveIntegerField(default=0)
+    generated = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    failed_chunks = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"Run for {self.window_start:%Y-%m-%d} ({self.chunks_done}/{self.chunks} chunks)"
+
+
+
+class ThoughtHistory(models.Model):
+    """
+    One animal's thought for one day. ``Animal.thought_of_the_day`` keeps only
+    the latest one; this table keeps them all.
+
+    On PostgreSQL the table is range-partitioned by month (see
+    ``animals.history``), so old months are dropped whole instead of deleted
+    row by row. The primary key index also covers ``thought`` and
+    ``generated_at``, which makes reading an animal's latest or recent
+    thoughts an index-only scan.
+    """
+
+    # Short enough for the thought to fit in the primary key index.
+    THOUGHT_MAX_LENGTH = 500
+
+    pk = models.CompositePrimaryKey('animal', 'date')
+    animal = models.ForeignKey(Animal, on_delete=models.CASCADE, related_name='thought_history')
+    date = models.DateField()
+    thought = models.CharField(max_length=THOUGHT_MAX_LENGTH)
+    generated_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name_plural = 'thought history'
 
     def __str__(self):
-        return f"{self.name} ({self.species})"
\ No newline at end of file
+        return f"{self.animal_id} on {self.date}"
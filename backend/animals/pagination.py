@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class AnimalCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the (tutor, id) index: every page is a single
+    ``WHERE id > cursor ORDER BY id LIMIT n`` query, with no COUNT and no OFFSET.
+    """
+
+    ordering = 'id'
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    page_size_query_param = 'page_size'
+    max_page_size = settings.ANIMALS_MAX_PAGE_SIZE
+
+
+class ThoughtHistoryCursorPagination(CursorPagination):
+    """
+    Newest-first keyset pagination of one animal's thought history, walking the
+    (animal, date) primary key.
+    """
+
+    ordering = '-date'
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    page_size_query_param = 'page_size'
+    max_page_size = settings.ANIMALS_MAX_PAGE_SIZE
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    PageNumberPagination for the async views: the COUNT and the page query go
+    through the async ORM, while page numbers, links and errors are the stock
+    ones, so both views answer the same.
+    """
+
+    async def apaginate_queryset(self, queryset, request):
+        self.request = request
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+
+        self.page.object_list = [row async for row in self.page.object_list]
+        return self.page.object_list
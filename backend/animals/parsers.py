@@ -0,0 +1,30 @@
+from django.conf import settings
+from rest_framework.parsers import BaseParser
+
+from .bulk import iter_csv_rows, iter_ndjson_rows
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses a newline-delimited JSON body lazily: ``request.data`` is an
+    iterator of ``(line_number, row, error)``, read from the stream as it is
+    consumed.
+    """
+
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        return iter_ndjson_rows(stream or [], encoding)
+
+
+class CSVParser(BaseParser):
+    """
+    Parses a CSV body with a header line lazily, like NDJSONParser.
+    """
+
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        return iter_csv_rows(stream or [], encoding)
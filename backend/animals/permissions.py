@@ -3,4 +3,4 @@ from rest_framework import permissions
 
 class IsTutorOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.tutor == request.user
\ No newline at end of file
+        return obj.tutor_id == request.user.id
\ No newline at end of file
@@ -0,0 +1,258 @@
+import os
+import random
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+REDIS_URL = (
+    os.getenv("LLM_RATE_LIMIT_REDIS_URL")
+    or os.getenv("REDIS_URL")
+    or os.getenv("CELERY_BROKER_URL")
+)
+KEY_PREFIX = "petcare:llm"
+
+_redis_client = None
+_redis_lock = threading.Lock()
+
+
+def get_redis():
+    """
+    Returns the shared Redis connection, or None when no Redis URL is set or the
+    redis package is missing. Callers fall back to per-process state then.
+    """
+
+    global _redis_client
+    if redis is None or not REDIS_URL:
+        return None
+    with _redis_lock:
+        if _redis_client is None:
+            _redis_client = redis.Redis.from_url(REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+        return _redis_client
+
+
+def backoff_delay(attempt: int, base: float = 2, cap: float = 300, retry_after: float = None) -> float:
+    """
+    Exponential backoff with full jitter: a random delay in
+    ``[0, min(cap, base * 2 ** attempt)]``, never shorter than ``retry_after``.
+    """
+
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return delay
+
+
+_TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate)
+local wait = math.max(0, (1 - tokens) / rate)
+if max_wait >= 0 and wait > max_wait then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    return {0, tostring(wait)}
+end
+tokens = tokens - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 60)
+return {1, tostring(wait)}
+"""
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised by TokenBucket.reserve when the wait for a token would exceed the
+    caller's ``max_wait``. No token is taken.
+    """
+
+    def __init__(self, wait):
+        super().__init__(f"Rate limit wait of {wait:.1f}s exceeds the maximum")
+        self.wait = wait
+
+
+class TokenBucket:
+    """
+    Token bucket shared by every process through Redis, with a per-process
+    fallback when Redis is not available.
+
+    ``reserve()`` takes a token, letting the bucket go into debt, and returns
+    how long the caller must wait before using it. Callers are paced one after
+    another at exactly ``rate`` per second instead of all retrying together
+    once the bucket refills. With ``max_wait``, a caller that would wait longer
+    gets RateLimitExceeded instead, so the debt stays bounded; a caller that
+    gives up while waiting hands its token back with ``refund()``.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float = None):
+        self.key = f"{KEY_PREFIX}:bucket:{name}"
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._script = None
+
+    def reserve(self, max_wait: float = None) -> float:
+        if self.rate <= 0:
+            return 0.0
+
+        client = get_redis()
+        if client is not None:
+            try:
+                if self._script is None:
+                    self._script = client.register_script(_TOKEN_BUCKET_SCRIPT)
+                granted, wait = self._script(
+                    keys=[self.key], args=[self.rate, self.capacity, -1 if max_wait is None else max_wait],
+                )
+                if not granted:
+                    raise RateLimitExceeded(float(wait))
+                return float(wait)
+            except redis.RedisError as e:
+                print(f"[WARNING] Rate limiter falling back to local state: {e}")
+
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            wait = max(0.0, (1 - tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                self._tokens = tokens
+                raise RateLimitExceeded(wait)
+            self._tokens = tokens - 1
+            return wait
+
+    def refund(self):
+        """Returns a reserved token that will not be used."""
+
+        if self.rate <= 0:
+            return
+
+        client = get_redis()
+        if client is not None:
+            try:
+                client.hincrbyfloat(self.key, 'tokens', 1)
+                return
+            except redis.RedisError as e:
+                print(f"[WARNING] Rate limiter falling back to local state: {e}")
+
+        with self._lock:
+            self._tokens += 1
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures and stays open for
+    ``cooldown`` seconds, during which calls should be short-circuited. Then
+    it is half-open: ``allow_request()`` lets a single probe through, the
+    other callers still being short-circuited, until the probe's success
+    closes the circuit or its failure reopens it. A probe that never reports
+    back frees its slot after another ``cooldown``.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown: float):
+        self.failures_key = f"{KEY_PREFIX}:circuit:{name}:failures"
+        self.open_key = f"{KEY_PREFIX}:circuit:{name}:open"
+        self.probe_key = f"{KEY_PREFIX}:circuit:{name}:probe"
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0.0
+        self._probe_until = 0.0
+        self._lock = threading.Lock()
+
+    def remaining_open(self) -> float:
+        """
+        Seconds left until the circuit lets a call through again, or 0 when it
+        is closed or half-open.
+        """
+
+        client = get_redis()
+        if client is not None:
+            try:
+                ttl = client.pttl(self.open_key)
+                return max(ttl, 0) / 1000
+            except redis.RedisError as e:
+                print(f"[WARNING] Circuit breaker falling back to local state: {e}")
+
+        with self._lock:
+            return max(self._open_until - time.monotonic(), 0.0)
+
+    def allow_request(self) -> float:
+        """
+        Returns 0 when the caller may send its request, as the probe when the
+        circuit is half-open, or else the seconds worth waiting before trying
+        again.
+        """
+
+        client = get_redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline()
+                pipe.pttl(self.open_key)
+                pipe.get(self.failures_key)
+                ttl, failures = pipe.execute()
+                if ttl > 0:
+                    return ttl / 1000
+                if int(failures or 0) < self.failure_threshold:
+                    return 0.0
+                if client.set(self.probe_key, 1, nx=True, px=int(self.cooldown * 1000)):
+                    return 0.0
+                return max(client.pttl(self.probe_key), 1) / 1000
+            except redis.RedisError as e:
+                print(f"[WARNING] Circuit breaker falling back to local state: {e}")
+
+        with self._lock:
+            now = time.monotonic()
+            if self._open_until > now:
+                return self._open_until - now
+            if self._failures < self.failure_threshold:
+                return 0.0
+            if self._probe_until <= now:
+                self._probe_until = now + self.cooldown
+                return 0.0
+            return self._probe_until - now
+
+    def record_success(self):
+        client = get_redis()
+        if client is not None:
+            try:
+                client.delete(self.failures_key, self.probe_key)
+                return
+            except redis.RedisError as e:
+                print(f"[WARNING] Circuit breaker falling back to local state: {e}")
+
+        with self._lock:
+            self._failures = 0
+            self._probe_until = 0.0
+
+    def record_failure(self):
+        client = get_redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline()
+                pipe.incr(self.failures_key)
+                pipe.expire(self.failures_key, int(self.cooldown * 10))
+                failures, _ = pipe.execute()
+                if failures >= self.failure_threshold:
+                    pipe = client.pipeline()
+                    pipe.set(self.open_key, 1, px=int(self.cooldown * 1000))
+                    pipe.delete(self.probe_key)
+                    pipe.execute()
+                return
+            except redis.RedisError as e:
+                print(f"[WARNING] Circuit breaker falling back to local state: {e}")
+
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self.cooldown
+                self._probe_until = 0.0
@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets views answer ``Accept: text/event-stream``. Streams are returned as
+    StreamingHttpResponse and bypass rendering; this only renders errors.
+    """
+
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f"event: error\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Lets the export answer ``Accept: application/x-ndjson`` (or
+    ``?format=ndjson``). Exports are streamed; this only renders errors.
+    """
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode() + b"\n"
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Lets the export answer ``Accept: text/csv`` (or ``?format=csv``). Exports
+    are streamed; this only renders errors, as a one-column ``detail`` CSV.
+    """
+
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        detail = data.get('detail', data) if isinstance(data, dict) else data
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['detail'])
+        writer.writerow([detail])
+        return buffer.getvalue().encode()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer with the same output, encoded by orjson when it is installed.
+    Indented output (``Accept: application/json; indent=4``) and installs
+    without orjson go through the stock renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=JSONEncoder().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same as JSONRenderer: keep the output valid JavaScript.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
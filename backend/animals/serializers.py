@@ -1,8 +1,29 @@
+from django.conf import settings
+from django.db import models
 from rest_framework import serializers
-from .models import Animal
+from .media import media_urls
+from .models import Animal, ThoughtHistory, ThoughtJob
+from .uploads import PHOTO_CONTENT_TYPES
+
+
+class AnimalImageField(serializers.ImageField):
+    """ImageField outputting the animal's media URL, signed when served locally."""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url, _ = media_urls(value.name, None, value.instance.pk, value.instance.tutor_id)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
 
 
 class AnimalSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.ImageField: AnimalImageField,
+    }
+    photo_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Animal
         fields = (
@@ -13,7 +34,115 @@ class AnimalSerializer(serializers.ModelSerializer):
             'breed',
             'age',
             'photo',
+            'photo_variants',
             'thought_of_the_day',
             'thought_generated_at',
         )
-        read_only_fields = ('tutor', 'thought_of_the_day', 'thought_generated_at')
\ No newline at end of file
+        read_only_fields = ('tutor', 'thought_of_the_day', 'thought_generated_at')
+
+    def get_photo_variants(self, obj) -> dict:
+        """
+        ``{width: url}`` of the resized WebP copies of the photo. Empty until the
+        background task has produced them.
+        """
+
+        absolute_url = _absolute_url_builder(self.context.get('request'))
+        _, urls = media_urls(obj.photo.name, obj.photo_variants, obj.pk, obj.tutor_id)
+        return {width: absolute_url(url) for width, url in urls.items()}
+
+
+ANIMAL_READ_FIELDS = AnimalSerializer.Meta.fields
+
+
+class AnimalImportSerializer(AnimalSerializer):
+    """
+    Validates one row of a bulk import with the AnimalSerializer rules for the
+    columns an import can set. Other columns, such as those of an export, are
+    ignored.
+    """
+
+    class Meta(AnimalSerializer.Meta):
+        fields = ('name', 'species', 'breed', 'age')
+        read_only_fields = ()
+
+_datetime_field = serializers.DateTimeField()
+
+
+def _absolute_url_builder(request):
+    """
+    Returns a function turning media URLs into the absolute URLs
+    AnimalImageField would output, resolving the request's scheme and host
+    only once.
+    """
+
+    if request is None:
+        return lambda url: url
+
+    scheme_host = request.build_absolute_uri('/')[:-1]
+
+    def absolute_url(url):
+        if url.startswith('/') and not url.startswith('//'):
+            return scheme_host + url
+        return request.build_absolute_uri(url)
+
+    return absolute_url
+
+
+def serialize_animal_rows(rows, request=None) -> list:
+    """
+    Read-only fast path of AnimalSerializer for rows fetched with
+    ``.values(*ANIMAL_READ_FIELDS)``. Produces the same output, without the
+    per-field overhead of a ModelSerializer.
+    """
+
+    absolute_url = _absolute_url_builder(request)
+    data = []
+    for row in rows:
+        # One signature per animal, shared by the photo and its variants.
+        photo, variants = media_urls(row['photo'], row['photo_variants'], row['id'], row['tutor'])
+        generated_at = row['thought_generated_at']
+        data.append({
+            'id': str(row['id']),
+            'tutor': row['tutor'],
+            'name': row['name'],
+            'species': row['species'],
+            'breed': row['breed'],
+            'age': row['age'],
+            'photo': absolute_url(photo) if photo else None,
+            'photo_variants': {width: absolute_url(url) for width, url in variants.items()},
+            'thought_of_the_day': row['thought_of_the_day'],
+            'thought_generated_at': _datetime_field.to_representation(generated_at) if generated_at else None,
+        })
+    return data
+
+
+class ThoughtJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ThoughtJob
+        fields = (
+            'id',
+            'status',
+            'total',
+            'completed',
+            'results',
+            'created_at',
+            'finished_at',
+        )
+        read_only_fields = fields
+
+
+
+class ThoughtHistorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ThoughtHistory
+        fields = ('date', 'thought', 'generated_at')
+        read_only_fields = fields
+
+
+class PhotoUploadSerializer(serializers.Serializer):
+    content_type = serializers.ChoiceField(choices=sorted(PHOTO_CONTENT_TYPES))
+    size = serializers.IntegerField(min_value=1, max_value=settings.PHOTO_UPLOAD_MAX_BYTES)
+
+
+class PhotoUploadConfirmSerializer(serializers.Serializer):
+    upload_token = serializers.CharField()
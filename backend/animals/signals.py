@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_animal_list_versions
+from .models import Animal
+
+
+@receiver(post_save, sender=Animal)
+@receiver(post_delete, sender=Animal)
+def invalidate_animal_list_cache(sender, instance, **kwargs):
+    bump_animal_list_versions([instance.tutor_id])
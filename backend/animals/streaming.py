@@ -0,0 +1,30 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+
+async def aiter_sync(iterator):
+    """
+    Serves a sync generator to an ASGI response one item at a time, always on
+    the same worker thread so its event loop and DB connection stay put.
+    """
+
+    done = object()
+    get_next = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (item := await get_next(iterator, done)) is not done:
+            yield item
+    finally:
+        await sync_to_async(iterator.close, thread_sensitive=True)()
+
+
+def streaming_response(request, iterator, content_type):
+    """
+    StreamingHttpResponse over the sync generator ``iterator``. Under ASGI it
+    is wrapped in aiter_sync, since Django would otherwise read the whole
+    generator into memory before sending anything.
+    """
+
+    if isinstance(request._request, ASGIRequest):
+        iterator = aiter_sync(iterator)
+    return StreamingHttpResponse(iterator, content_type=content_type)
@@ -1,25 +1,312 @@
-from celery import shared_task
+import time
+from celery import chord, shared_task
+from celery.signals import task_postrun, task_prerun, worker_process_shutdown, worker_shutdown
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
-from .models import Animal
-from .llm import generate_text_for_animal
+from petcare import metrics
+from . import llm
+from .cache import bump_animal_list_versions
+from .history import ensure_partitions, prune_history, retention_cutoffs
+from .images import build_photo_variants, delete_photo_variants
+from .models import Animal, ThoughtGenerationRun, ThoughtJob
+from .ratelimit import backoff_delay
+from .thoughts import ThoughtWriter, generate_thoughts, generation_window_start, iter_generated_thoughts, stale_animals
+
+
+def iter_chunk_bounds(queryset, chunk_size):
+    """
+    Yields ``(start_id, end_id)`` pairs that split ``queryset`` into chunks of
+    ``chunk_size`` animals ordered by id. ``start_id`` is exclusive and
+    ``end_id`` inclusive; ``None`` leaves that side of the range open.
+
+    Each boundary is found with a single indexed keyset query, so no offsets
+    are scanned and the ids are never loaded all at once.
+    """
+
+    queryset = queryset.order_by('id')
+    start_id = None
+
+    while True:
+        remaining = queryset if start_id is None else queryset.filter(id__gt=start_id)
+        end_ids = list(remaining.values_list('id', flat=True)[chunk_size - 1:chunk_size])
+
+        if not end_ids:
+            if remaining.exists():
+                yield start_id, None
+            return
+
+        yield start_id, end_ids[0]
+        start_id = end_ids[0]
+
+
+def chunk_queryset(start_id=None, end_id=None, animal_ids=None, stale_before=None):
+    animals = Animal.objects.only('id', 'name', 'species', 'breed', 'age')
+    if stale_before is not None:
+        animals = stale_animals(animals, stale_before)
+    if start_id is not None:
+        animals = animals.filter(id__gt=start_id)
+    if end_id is not None:
+        animals = animals.filter(id__lte=end_id)
+    if animal_ids is not None:
+        animals = animals.filter(id__in=animal_ids)
+    return animals
 
 
 @shared_task
 def generate_daily_thoughts():
-    animals = Animal.objects.all()
-    print("Thoughts generated at:", timezone.now())
-    for animal in animals:
-        prompt = (
-            f"Imagine you are a {animal.species} named {animal.name}. "
-            f"You are {animal.age} years old, which is a very important detail for your personality and view of the world. "
-            f"Your species, {animal.species}, influences how you think and feel. "
-            f"Your breed is {animal.breed}. "
-            f"Generate a short, cute, and unique thought (max 180 characters) that reflects your age and species."
+    """
+    Splits the animals whose thought is older than today's generation window
+    into keyset-ordered chunks and fans them out to the worker pool, with
+    ``summarize_daily_thoughts`` collecting the per-chunk stats.
+
+    Progress is checkpointed on the window's ThoughtGenerationRun. Chunks are
+    cut from the animals still stale only, so re-running after a partial
+    failure dispatches no chunk whose animals all have today's thought. A
+    chunk that runs out of retries closes the run through
+    ``record_failed_chunk``, since the chord never calls its callback then.
+    """
+
+    window_start = generation_window_start()
+    run, _ = ThoughtGenerationRun.objects.get_or_create(window_start=window_start)
+    print("Thoughts generated at:", timezone.now(), "for window", window_start)
+
+    stale = stale_animals(Animal.objects.all(), window_start)
+    bounds = list(iter_chunk_bounds(stale, settings.THOUGHT_GENERATION_CHUNK_SIZE))
+    if not bounds:
+        ThoughtGenerationRun.objects.filter(id=run.id, finished_at__isnull=True).update(finished_at=timezone.now())
+        return {"chunks": 0, "run_id": run.id}
+
+    ThoughtGenerationRun.objects.filter(id=run.id).update(
+        chunks=F('chunks') + len(bounds), finished_at=None, failed_chunks=[],
+    )
+    header = [
+        generate_thoughts_chunk.s(
+            str(start_id) if start_id is not None else None,
+            str(end_id) if end_id is not None else None,
+            run_id=run.id,
+        ).on_error(record_failed_chunk.s(run_id=run.id))
+        for start_id, end_id in bounds
+    ]
+    chord(header)(summarize_daily_thoughts.s(run_id=run.id))
+    return {"chunks": len(header), "run_id": run.id}
+
+
+@shared_task(
+    bind=True,
+    acks_late=True,
+    autoretry_for=(Exception,),
+    max_retries=settings.THOUGHT_GENERATION_MAX_RETRIES,
+    retry_backoff=True,
+)
+def generate_thoughts_chunk(self, start_id=None, end_id=None, animal_ids=None, previous=None, run_id=None):
+    """
+    Generates thoughts for one chunk of animals. When Gemini throttles us, the
+    chunk is rescheduled with a jittered exponential backoff for the throttled
+    animals only, carrying the stats gathered so far in ``previous``.
+
+    Within a run, animals that are already fresh are skipped and the final
+    stats are added to the run's checkpoint.
+    """
+
+    run = ThoughtGenerationRun.objects.get(id=run_id) if run_id is not None else None
+    animals = chunk_queryset(start_id, end_id, animal_ids, stale_before=run.window_start if run else None)
+    stats = generate_thoughts(animals.iterator(chunk_size=settings.THOUGHT_GENERATION_BATCH_SIZE))
+    throttled = stats.pop("throttled")
+    for result, count in (("generated", stats["generated"]), ("failed", stats["failed"]), ("throttled", len(throttled))):
+        metrics.THOUGHTS.labels(result).inc(count)
+
+    if previous:
+        stats["generated"] += previous["generated"]
+        stats["failed"] += previous["failed"]
+
+    if throttled:
+        if self.request.retries >= self.max_retries:
+            stats["failed"] += len(throttled)
+        else:
+            raise self.retry(
+                args=(start_id, end_id),
+                kwargs={"animal_ids": throttled, "previous": stats, "run_id": run_id},
+                countdown=backoff_delay(self.request.retries, retry_after=llm.circuit_breaker.remaining_open()),
+            )
+
+    if run is not None:
+        ThoughtGenerationRun.objects.filter(id=run.id).update(
+            chunks_done=F('chunks_done') + 1,
+            generated=F('generated') + stats["generated"],
+            failed=F('failed') + stats["failed"],
+        )
+    return stats
+
+
+@shared_task
+def record_failed_chunk(request, exc, traceback, run_id=None):
+    """
+    Errback of the chunk tasks: adds the failed chunk's bounds to the run and
+    closes it, so the next trigger resumes with the animals still stale.
+    """
+
+    start_id, end_id = (list(request.args) + [None, None])[:2]
+    with transaction.atomic():
+        run = ThoughtGenerationRun.objects.select_for_update().filter(id=run_id).first()
+        if run is None:
+            return
+        run.failed_chunks.append([start_id, end_id])
+        run.finished_at = timezone.now()
+        run.save(update_fields=['failed_chunks', 'finished_at'])
+    print(f"[ERROR] Thought chunk ({start_id}, {end_id}] of run {run_id} failed: {exc}")
+
+
+@shared_task
+def summarize_daily_thoughts(results, run_id=None):
+    summary = {"chunks": len(results), "generated": 0, "failed": 0}
+    for stats in results:
+        summary["generated"] += stats["generated"]
+        summary["failed"] += stats["failed"]
+    if run_id is not None:
+        ThoughtGenerationRun.objects.filter(id=run_id).update(finished_at=timezone.now())
+    print("Thoughts generated:", summary)
+    return summary
+
+
+@shared_task(
+    bind=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    max_retries=settings.THOUGHT_GENERATION_MAX_RETRIES,
+)
+def run_thought_job(self, job_id, animal_ids=None):
+    """
+    Generates thoughts for every animal of the job's tutor, saving per-animal
+    results on the ThoughtJob so the status endpoint can report progress.
+
+    As in generate_thoughts_chunk, the animals Gemini throttled are retried
+    with a jittered exponential backoff (``animal_ids``) and only count as
+    errors once the retries are spent. A job whose worker died is delivered
+    again and skips the animals it already has results for; one that never
+    comes back is failed by ThoughtJob.fail_if_stale.
+    """
+
+    job = ThoughtJob.objects.filter(id=job_id).first()
+    if job is None or job.status in (ThoughtJob.STATUS_DONE, ThoughtJob.STATUS_FAILED):
+        return None
+
+    animals = Animal.objects.filter(tutor_id=job.tutor_id).only('id', 'name', 'species', 'breed', 'age')
+    if job.status == ThoughtJob.STATUS_PENDING and animal_ids is None:
+        job.total = animals.count()
+    if animal_ids is not None:
+        animals = animals.filter(id__in=animal_ids)
+    elif job.results:
+        animals = animals.exclude(id__in=[result["animal_id"] for result in job.results])
+
+    job.status = ThoughtJob.STATUS_RUNNING
+    job.save(update_fields=['status', 'total', 'updated_at'])
+
+    throttled = []
+    last_saved = time.monotonic()
+    try:
+        with ThoughtWriter() as writer:
+            for animal, thought, error in iter_generated_thoughts(animals):
+                if isinstance(error, llm.GeminiUnavailable):
+                    throttled.append((animal, error))
+                    continue
+                if error is not None:
+                    job.results.append({"animal_id": str(animal.id), "name": animal.name, "error": str(error)})
+                else:
+                    writer.add(animal.id, thought)
+                    job.results.append({"animal_id": str(animal.id), "name": animal.name, "thought": thought})
+                job.completed = len(job.results)
+
+                if time.monotonic() - last_saved >= settings.THOUGHT_JOB_PROGRESS_INTERVAL_SECONDS:
+                    writer.flush()
+                    job.save(update_fields=['completed', 'results', 'updated_at'])
+                    last_saved = time.monotonic()
+    except Exception:
+        job.status = ThoughtJob.STATUS_FAILED
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'completed', 'results', 'finished_at', 'updated_at'])
+        raise
+
+    if throttled and self.request.retries < self.max_retries:
+        job.save(update_fields=['completed', 'results', 'updated_at'])
+        raise self.retry(
+            kwargs={"animal_ids": [str(animal.id) for animal, _ in throttled]},
+            countdown=backoff_delay(self.request.retries, retry_after=llm.circuit_breaker.remaining_open()),
         )
-        try:
-            thought = generate_text_for_animal(prompt)
-            animal.thought_of_the_day = thought
-            animal.thought_generated_at = timezone.now()
-            animal.save()
-        except Exception as e:
-            print('Error generating thought for', animal.id, e)
\ No newline at end of file
+
+    for animal, error in throttled:
+        job.results.append({"animal_id": str(animal.id), "name": animal.name, "error": str(error)})
+    job.completed = len(job.results)
+    job.status = ThoughtJob.STATUS_DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'completed', 'results', 'finished_at', 'updated_at'])
+    return {"generated": sum(1 for result in job.results if "thought" in result), "total": job.total}
+
+
+@shared_task
+def maintain_thought_history():
+    """
+    Creates the thought history partitions of the coming months and applies
+    the retention settings to the old ones. Runs before the nightly
+    generation, so its writes land in monthly partitions.
+    """
+
+    created = ensure_partitions(settings.THOUGHT_HISTORY_PARTITIONS_AHEAD)
+    pruned = prune_history(*retention_cutoffs())
+    return {
+        "created": [month.isoformat() for month in created],
+        "pruned": [(month.isoformat(), action) for month, action in pruned],
+    }
+
+
+@shared_task(acks_late=True)
+def generate_photo_variants(animal_id, photo_name):
+    """
+    Builds the resized WebP variants of an animal's photo. If the photo was
+    replaced or removed in the meantime the variants are discarded, the task
+    for the new photo takes care of it.
+    """
+
+    animal = Animal.objects.filter(id=animal_id).only('id', 'tutor_id', 'photo', 'photo_variants').first()
+    if animal is None or animal.photo.name != photo_name:
+        return {}
+
+    variants = build_photo_variants(animal.photo)
+    updated = Animal.objects.filter(id=animal_id, photo=photo_name).update(photo_variants=variants, updated_at=timezone.now())
+    if not updated:
+        delete_photo_variants(variants)
+        return {}
+    bump_animal_list_versions([animal.tutor_id])
+
+    delete_photo_variants({
+        width: name for width, name in animal.photo_variants.items() if name not in variants.values()
+    })
+    return variants
+
+
+_task_started = {}
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def record_task_metrics(task_id=None, task=None, state=None, **kwargs):
+    """
+    Records the duration and final state (SUCCESS, FAILURE, RETRY...) of every
+    task run by this worker process.
+    """
+
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        metrics.TASK_DURATION.labels(task.name).observe(time.perf_counter() - started)
+    metrics.TASKS.labels(task.name, state or "UNKNOWN").inc()
+
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def close_llm_clients(**kwargs):
+    llm.close_clients()
@@ -1,16 +1,59 @@
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, APITestCase, APIClient
 from rest_framework import status
+from rest_framework.request import Request
+from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
-from animals.models import Animal
+from animals import async_views, llm
+from animals.llm import generate_texts_for_animals
+from animals.cache import animal_list_cache_stats, animal_list_version, thought_cache_stats
+from animals.history import retention_cutoffs
+from animals.media import _signer, media_urls
+from animals.models import Animal, ThoughtGenerationRun, ThoughtHistory
+from animals.renderers import ORJSONRenderer
+from animals.serializers import ANIMAL_READ_FIELDS, AnimalSerializer, serialize_animal_rows
+from animals.ratelimit import CircuitBreaker, RateLimitExceeded, TokenBucket
+from animals.tasks import chunk_queryset, generate_daily_thoughts, generate_photo_variants, generate_thoughts_chunk, iter_chunk_bounds, record_failed_chunk, summarize_daily_thoughts
+from animals.thoughts import ThoughtWriter, generate_thoughts, generation_window_start, stale_animals
+from benchmarks.stub_gemini import StubGeminiServer
 from faker import Faker
+from moto import mock_aws
+from petcare.middleware import RequestMetricsMiddleware
+from prometheus_client import REGISTRY
+from unittest.mock import AsyncMock, patch
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from PIL import Image
+import asyncio
+import boto3
+import hashlib
+import httpx
+import json
 import random
+import shutil
+import tempfile
+import time
+from urllib.parse import urlsplit
 
 User = get_user_model()
 fake = Faker()
 
 class AnimalAPITestCase(APITestCase):
     def setUp(self):
+        caches['default'].clear()
         self.user = User.objects.create_user(
             username=fake.user_name(),
             email=fake.email(),
@@ -35,6 +78,45 @@ class AnimalAPITestCase(APITestCase):
         results = response.data["results"]
         self.assertTrue(any(a["id"] == str(self.animal.id) for a in results))
 
+    def test_list_animals_with_cursor_pagination(self):
+        for _ in range(14):
+            Animal.objects.create(tutor=self.user, name=fake.first_name(), species='cat')
+
+        url = reverse('animal-list')
+        seen = []
+        params = {'pagination': 'cursor', 'page_size': 4}
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+            self.assertLessEqual(len(response.data['results']), 4)
+            seen.extend(a['id'] for a in response.data['results'])
+            url, params = response.data['next'], None
+
+        self.assertEqual(len(seen), 15)
+        self.assertEqual(seen, sorted(seen))
+
+    def test_list_pages_are_in_creation_order(self):
+        created = [self.animal.id]
+        for _ in range(14):
+            created.append(Animal.objects.create(tutor=self.user, name=fake.first_name(), species='cat').id)
+
+        seen = []
+        for page in (1, 2):
+            response = self.client.get(reverse('animal-list'), {'page': page})
+            seen.extend(a['id'] for a in response.data['results'])
+        self.assertEqual(seen, [str(animal_id) for animal_id in created])
+
+    def test_cursor_page_size_is_capped(self):
+        for _ in range(4):
+            Animal.objects.create(tutor=self.user, name=fake.first_name(), species='cat')
+
+        with patch('animals.views.AnimalCursorPagination.max_page_size', 2):
+            response = self.client.get(reverse('animal-list'), {'pagination': 'cursor', 'page_size': 50})
+        self.assertEqual(len(response.data['results']), 2)
+
     def test_retrieve_animal(self):
         url = reverse('animal-detail', args=[self.animal.id])
         response = self.client.get(url)
@@ -72,8 +154,1245 @@ class AnimalAPITestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['age'], new_age)
 
+    def test_detail_answers_304_for_a_matching_etag(self):
+        url = reverse('animal-detail', args=[self.animal.id])
+        response = self.client.get(url)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_detail_answers_304_when_not_modified_since(self):
+        url = reverse('animal-detail', args=[self.animal.id])
+        last_modified = self.client.get(url)['Last-Modified']
+
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_changes_when_an_animal_changes(self):
+        url = reverse('animal-list')
+        etag = self.client.get(url)['ETag']
+
+        caches['default'].clear()
+        with patch('animals.views.serialize_animal_rows') as serialize:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        serialize.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with ThoughtWriter() as writer:
+            writer.add(self.animal.id, 'Something new', generated_at=timezone.now() + timedelta(seconds=1))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_changes_when_an_animal_is_deleted(self):
+        other = Animal.objects.create(tutor=self.user, name=fake.first_name(), species='cat')
+        url = reverse('animal-list')
+        etag = self.client.get(url)['ETag']
+
+        other.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_depends_on_the_page(self):
+        url = reverse('animal-list')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, {'page_size': 5}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_pages_are_served_from_the_cache(self):
+        url = reverse('animal-list')
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(animal_list_cache_stats(), {"hits": 1, "misses": 1})
+
+    def test_list_cache_is_invalidated_by_writes(self):
+        url = reverse('animal-list')
+        self.client.get(url)
+
+        self.client.patch(reverse('animal-detail', args=[self.animal.id]), {'name': 'Renamed'}, format='json')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['name'], 'Renamed')
+
+        with ThoughtWriter() as writer:
+            writer.add(self.animal.id, 'Fresh thought')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['thought_of_the_day'], 'Fresh thought')
+
+        self.animal.delete()
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'], [])
+
+    def test_list_cache_is_per_tutor(self):
+        other = User.objects.create_user(username=fake.user_name(), email=fake.email(), password='testpass123')
+        Animal.objects.create(tutor=other, name=fake.first_name(), species='cat')
+        self.client.get(reverse('animal-list'))
+
+        client = APIClient()
+        client.force_authenticate(user=other)
+        response = client.get(reverse('animal-list'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotIn(str(self.animal.id), [animal['id'] for animal in response.data['results']])
+
     def test_delete_animal(self):
         url = reverse('animal-detail', args=[self.animal.id])
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Animal.objects.filter(id=self.animal.id).exists())
+
+
+class BulkImportExportTestCase(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username=fake.user_name(), email=fake.email(), password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def _import(self, body, content_type):
+        return self.client.generic('POST', reverse('animal-bulk-import'), body.encode(), content_type)
+
+    def _export(self, data=None, **extra):
+        response = self.client.get(reverse('animal-export'), data, **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content).decode()
+
+    @override_settings(ANIMAL_IMPORT_BATCH_SIZE=2)
+    def test_ndjson_import_reports_rejected_lines(self):
+        body = "\n".join([
+            json.dumps({'name': 'Rex', 'species': 'dog', 'age': 3}),
+            json.dumps({'name': 'Mimi', 'species': 'cat', 'tutor': 999}),
+            '',
+            json.dumps({'name': 'Bolt', 'species': 'dragon'}),
+            '{not json',
+            json.dumps({'species': 'bird', 'age': -1}),
+            json.dumps({'name': 'Tico', 'species': 'bird'}),
+        ])
+        response = self._import(body, 'application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['failed'], 3)
+        self.assertEqual([error['line'] for error in response.data['errors']], [4, 5, 6])
+        self.assertIn('species', response.data['errors'][0]['errors'])
+        self.assertEqual(set(response.data['errors'][2]['errors']), {'name', 'age'})
+        self.assertEqual(
+            sorted(Animal.objects.filter(tutor=self.user).values_list('name', flat=True)), ['Mimi', 'Rex', 'Tico'],
+        )
+
+    def test_csv_import(self):
+        body = "name,species,breed,age\nRex,dog,Labrador,3\nMimi,cat,,\nBolt,dog,Mixed,old\n"
+        response = self._import(body, 'text/csv')
+
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['errors'], [{'line': 4, 'errors': {'age': ['A valid integer is required.']}}])
+        mimi = Animal.objects.get(tutor=self.user, name='Mimi')
+        self.assertIsNone(mimi.breed)
+        self.assertIsNone(mimi.age)
+
+    def test_import_rejects_other_content_types_and_bad_files(self):
+        response = self.client.post(reverse('animal-bulk-import'), [{'name': 'Rex'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+        response = self._import('{"name": "Rex"}', 'application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['created'], 0)
+
+    def test_import_invalidates_the_list_cache(self):
+        self.client.get(reverse('animal-list'))
+        self._import(json.dumps({'name': 'Rex', 'species': 'dog'}), 'application/x-ndjson')
+        response = self.client.get(reverse('animal-list'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 1)
+
+    @override_settings(ANIMAL_EXPORT_CHUNK_SIZE=2)
+    def test_ndjson_export_matches_the_api(self):
+        for i in range(5):
+            Animal.objects.create(tutor=self.user, name=f'Pet {i}', species='dog', age=i)
+        Animal.objects.create(tutor=User.objects.create_user(username=fake.user_name(), password='x'), name='Other', species='cat')
+
+        response, body = self._export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('attachment', response['Content-Disposition'])
+        exported = [json.loads(line) for line in body.splitlines()]
+        expected = [self.client.get(reverse('animal-detail', args=[animal['id']])).data for animal in exported]
+        self.assertEqual(exported, json.loads(json.dumps(expected)))
+        self.assertEqual(len(exported), 5)
+        self.assertEqual([animal['name'] for animal in exported], [f'Pet {i}' for i in range(5)])
+
+    @override_settings(ANIMAL_EXPORT_CHUNK_SIZE=2)
+    def test_csv_export_can_be_imported_back(self):
+        for i in range(3):
+            Animal.objects.create(tutor=self.user, name=f'Pet, "{i}"', species='cat', breed='Persian', age=i)
+
+        response, body = self._export(HTTP_ACCEPT='text/csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(body.splitlines()[0], 'id,tutor,name,species,breed,age,photo,thought_of_the_day,thought_generated_at')
+        self.assertEqual(len(body.splitlines()), 4)
+        self.assertEqual(self._export(data={'format': 'csv'})[1], body)
+
+        other = User.objects.create_user(username=fake.user_name(), password='x')
+        self.client.force_authenticate(user=other)
+        response = self._import(body, 'text/csv')
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(
+            sorted(Animal.objects.filter(tutor=other).values_list('name', 'breed', 'age')),
+            [(f'Pet, "{i}"', 'Persian', i) for i in range(3)],
+        )
+
+
+class AsyncAnimalViewsTestCase(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username=fake.user_name(), email=fake.email(), password='testpass123')
+        for i in range(12):
+            Animal.objects.create(tutor=self.user, name=f'Pet {i}', species='dog', age=i)
+        self.animal = Animal.objects.filter(tutor=self.user).first()
+        self.headers = {'Authorization': f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        self.client.credentials(HTTP_AUTHORIZATION=self.headers['Authorization'])
+
+    def _get(self, view, path, data=None, headers=None, **kwargs):
+        request = AsyncRequestFactory().get(path, data, headers={**self.headers, **(headers or {})})
+        return async_to_sync(view)(request, **kwargs)
+
+    def test_async_list_matches_the_sync_list(self):
+        url = reverse('animal-list')
+        for params in ({}, {'page': 2}):
+            response = self._get(async_views.animal_list, url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            caches['default'].clear()
+
+            expected = self.client.get(url, params)
+            self.assertEqual(response.content, expected.content)
+            self.assertEqual(response['ETag'], expected['ETag'])
+
+    def test_async_list_shares_the_page_cache(self):
+        url = reverse('animal-list')
+        first = self.client.get(url)
+
+        response = self._get(async_views.animal_list, url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.content, first.content)
+
+        response = self._get(async_views.animal_list, url, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_async_list_rejects_invalid_pages(self):
+        response = self._get(async_views.animal_list, reverse('animal-list'), {'page': 9})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(json.loads(response.content), {'detail': 'Invalid page.'})
+
+    def test_async_detail_matches_the_sync_detail(self):
+        url = reverse('animal-detail', args=[self.animal.id])
+        response = self._get(async_views.animal_detail, url, pk=str(self.animal.id))
+        expected = self.client.get(url)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+        response = self._get(async_views.animal_detail, url, headers={'If-None-Match': expected['ETag']}, pk=str(self.animal.id))
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_async_detail_of_another_tutor_is_not_found(self):
+        other = User.objects.create_user(username=fake.user_name(), email=fake.email(), password='testpass123')
+        theirs = Animal.objects.create(tutor=other, name='Mimi', species='cat')
+
+        for pk in (str(theirs.id), 'not-a-uuid'):
+            response = self._get(async_views.animal_detail, '/api/animals/x/', pk=pk)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_async_views_require_authentication(self):
+        request = AsyncRequestFactory().get(reverse('animal-list'))
+        response = async_to_sync(async_views.animal_list)(request)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+    def test_writes_and_browsable_api_go_to_the_sync_views(self):
+        request = AsyncRequestFactory().post(
+            reverse('animal-list'), {'name': 'Mimi', 'species': 'cat'}, content_type='application/json', headers=self.headers,
+        )
+        response = async_to_sync(async_views.animal_list)(request)
+        response.render()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(json.loads(response.content)['tutor'], self.user.id)
+
+        response = self._get(async_views.animal_list, reverse('animal-list'), headers={'Accept': 'text/html'})
+        self.assertEqual(response.accepted_renderer.format, 'api')
+
+    def test_asgi_middleware_stack_is_async(self):
+        # petcare.asgi turns WhiteNoise off; nothing else may need a thread.
+        middleware = [name for name in settings.MIDDLEWARE if name != 'whitenoise.middleware.WhiteNoiseMiddleware']
+        with override_settings(MIDDLEWARE=middleware), patch('django.core.handlers.base.logger.debug') as debug:
+            ASGIHandler()
+        self.assertEqual([call.args for call in debug.call_args_list if 'adapted' in call.args[0]], [])
+
+
+class MockDataTestCase(APITestCase):
+    def _generate(self, **options):
+        call_command('generate_mock_data', stdout=StringIO(), **options)
+        return list(Animal.objects.order_by('tutor__username', 'name').values_list('id', 'tutor__username', 'name', 'species', 'age'))
+
+    def test_generate_mock_data_is_reproducible(self):
+        first = self._generate(tutors=3, animals_per_tutor=4, seed=7, batch_size=5)
+        self.assertEqual(len(first), 12)
+        self.assertEqual(User.objects.filter(username__startswith='mock').count(), 3)
+        self.assertTrue(self.client.login(username='mock0', password='123456'))
+
+        self.assertEqual(self._generate(tutors=3, animals_per_tutor=4, seed=7, batch_size=5), first)
+
+    def test_regenerating_spares_real_accounts_and_invalidates_list_pages(self):
+        real = User.objects.create_user(username='mock7', email='mock7@example.com', name='Real', password='testpass123')
+        self._generate(tutors=1, animals_per_tutor=1)
+        old_tutor = User.objects.get(username='mock0')
+        version = animal_list_version(old_tutor.pk)
+        kept = Animal.objects.create(tutor=real, name='Kept', species='cat')
+        for animal in (kept, Animal.objects.get(tutor=old_tutor)):
+            ThoughtHistory.objects.create(animal=animal, date=timezone.localdate(), thought='Hi', generated_at=timezone.now())
+
+        self._generate(tutors=1, animals_per_tutor=1)
+        self.assertTrue(User.objects.filter(pk=real.pk).exists())
+        self.assertFalse(User.objects.filter(pk=old_tutor.pk).exists())
+        self.assertEqual(list(ThoughtHistory.objects.values_list('animal', flat=True)), [kept.id])
+        self.assertNotEqual(animal_list_version(old_tutor.pk), version)
+
+    def test_generate_mock_data_with_thoughts(self):
+        self._generate(tutors=1, animals_per_tutor=2, with_thoughts=True)
+        animal = Animal.objects.first()
+        self.assertIsNotNone(animal.thought_of_the_day)
+        self.assertIsNotNone(animal.thought_generated_at)
+        self.assertEqual(animal.photo_variants, {})
+        self.assertEqual(stale_animals(Animal.objects.all(), generation_window_start()).count(), 0)
+
+
+class ThoughtHistoryTestCase(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='history', email='history@example.com', name='History', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.animal = Animal.objects.create(tutor=self.user, name='Rex', species='dog', age=3)
+        self.other = Animal.objects.create(tutor=self.user, name='Mimi', species='cat', age=2)
+
+    def add_history(self, animal, *days):
+        ThoughtHistory.objects.bulk_create(
+            ThoughtHistory(animal=animal, date=day, thought=f'Thought of {day}', generated_at=timezone.now())
+            for day in days
+        )
+
+    def test_writer_records_one_history_row_per_day(self):
+        today = timezone.localdate()
+        yesterday = timezone.now() - timedelta(days=1)
+
+        with ThoughtWriter() as writer:
+            writer.add(self.animal.id, 'Yesterday', generated_at=yesterday)
+        with ThoughtWriter() as writer:
+            writer.add(self.animal.id, 'First try')
+        with ThoughtWriter() as writer:
+            writer.add(self.animal.id, 'Second try')
+
+        history = list(ThoughtHistory.objects.filter(animal=self.animal).order_by('date').values_list('date', 'thought'))
+        self.assertEqual(history, [(timezone.localdate(yesterday), 'Yesterday'), (today, 'Second try')])
+
+    def test_history_endpoint_pages_newest_first(self):
+        today = timezone.localdate()
+        self.add_history(self.animal, *(today - timedelta(days=i) for i in range(3)))
+        self.add_history(self.other, today)
+        url = reverse('animal-thought-history', args=[self.animal.id])
+
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['date'] for row in response.data['results']], [str(today), str(today - timedelta(days=1))])
+        self.assertEqual(set(response.data['results'][0]), {'date', 'thought', 'generated_at'})
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['date'] for row in response.data['results']], [str(today - timedelta(days=2))])
+        self.assertIsNone(response.data['next'])
+
+        stranger = User.objects.create_user(username='stranger', email='stranger@example.com', name='Stranger', password='testpass123')
+        self.client.force_authenticate(user=stranger)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_prune_drops_and_compacts_old_months(self):
+        self.add_history(self.animal, date(2025, 1, 5), date(2025, 1, 20), date(2026, 6, 1), date(2026, 6, 2), date(2026, 10, 1), date(2026, 10, 2))
+        self.add_history(self.other, date(2026, 6, 3))
+        self.assertEqual(retention_cutoffs(date(2026, 10, 18), 12, 3), (date(2025, 10, 1), date(2026, 7, 1)))
+
+        out = StringIO()
+        with patch('animals.history.timezone.localdate', return_value=date(2026, 10, 18)):
+            call_command('prune_thought_history', '--retention-months', '12', '--compact-after-months', '3', '--dry-run', stdout=out)
+            self.assertEqual(ThoughtHistory.objects.count(), 7)
+            call_command('prune_thought_history', '--retention-months', '12', '--compact-after-months', '3', stdout=out)
+
+        self.assertEqual(
+            sorted(ThoughtHistory.objects.values_list('animal__name', 'date')),
+            [('Mimi', date(2026, 6, 3)), ('Rex', date(2026, 6, 2)), ('Rex', date(2026, 10, 1)), ('Rex', date(2026, 10, 2))],
+        )
+        self.assertIn('Would have dropped 2025-01', out.getvalue())
+
+    def test_deleting_an_animal_deletes_its_history(self):
+        self.add_history(self.animal, timezone.localdate())
+        self.client.delete(reverse('animal-detail', args=[self.animal.id]))
+        self.assertFalse(ThoughtHistory.objects.exists())
+
+
+S3_STORAGES = {
+    'default': {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {'bucket_name': 'test-photos', 'region_name': 'us-east-1', 'access_key': 'testing', 'secret_key': 'testing'},
+    },
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@mock_aws
+@override_settings(STORAGES=S3_STORAGES, PHOTO_VARIANT_WIDTHS=[160])
+class DirectPhotoUploadTestCase(APITestCase):
+    def setUp(self):
+        self.s3 = boto3.client('s3', region_name='us-east-1', aws_access_key_id='testing', aws_secret_access_key='testing')
+        self.s3.create_bucket(Bucket='test-photos')
+        self.user = User.objects.create_user(username='uploader', email='uploader@example.com', name='Uploader', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.animal = Animal.objects.create(tutor=self.user, name='Rex', species='dog')
+
+    def request_upload(self, animal=None, **data):
+        data = {'content_type': 'image/png', 'size': 50_000, **data}
+        return self.client.post(reverse('animal-photo-upload', args=[(animal or self.animal).id]), data, format='json')
+
+    def confirm(self, upload_token, animal=None):
+        url = reverse('animal-confirm-photo-upload', args=[(animal or self.animal).id])
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, {'upload_token': upload_token}, format='json')
+
+    def test_presigned_upload_is_confirmed_and_attached(self):
+        response = self.request_upload()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        fields = response.data['fields']
+        self.assertTrue(fields['key'].startswith(f'pet_photos/{self.animal.id}/'))
+        self.assertEqual(fields['Content-Type'], 'image/png')
+        self.assertIn('policy', fields)
+        self.assertIn('test-photos', response.data['url'])
+
+        # The client's direct upload.
+        self.s3.put_object(Bucket='test-photos', Key=fields['key'], Body=make_image_file().read(), ContentType='image/png')
+
+        response = self.confirm(response.data['upload_token'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.animal.refresh_from_db()
+        self.assertEqual(self.animal.photo.name, fields['key'])
+        self.assertEqual(list(self.animal.photo_variants), ['160'])
+        self.assertIn('Signature=', response.data['photo'])
+
+    @override_settings(STORAGES={**S3_STORAGES, 'default': {
+        **S3_STORAGES['default'], 'OPTIONS': {**S3_STORAGES['default']['OPTIONS'], 'location': 'media'},
+    }})
+    def test_presigned_upload_key_includes_the_storage_location(self):
+        response = self.request_upload()
+        key = response.data['fields']['key']
+        self.assertTrue(key.startswith(f'media/pet_photos/{self.animal.id}/'))
+
+        self.s3.put_object(Bucket='test-photos', Key=key, Body=make_image_file().read(), ContentType='image/png')
+        self.assertEqual(self.confirm(response.data['upload_token']).status_code, status.HTTP_200_OK)
+        self.assertEqual(Animal.objects.get(id=self.animal.id).photo.name, key.removeprefix('media/'))
+
+    def test_confirm_rejects_missing_uploads_and_foreign_tokens(self):
+        token = self.request_upload().data['upload_token']
+        response = self.confirm(token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['upload_token'], ['The photo has not been uploaded yet.'])
+
+        other = Animal.objects.create(tutor=self.user, name='Mimi', species='cat')
+        self.assertEqual(self.confirm(token, animal=other).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.confirm(token + 'x').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Animal.objects.get(id=self.animal.id).photo)
+
+    def test_upload_requests_are_validated(self):
+        self.assertEqual(self.request_upload(content_type='text/html').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.request_upload(size=10**9).status_code, status.HTTP_400_BAD_REQUEST)
+
+        stranger = User.objects.create_user(username='stranger', email='stranger@example.com', name='Stranger', password='testpass123')
+        self.client.force_authenticate(user=stranger)
+        self.assertEqual(self.request_upload().status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(STORAGES={**S3_STORAGES, 'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'}})
+    def test_direct_uploads_need_s3_storage(self):
+        self.assertEqual(self.request_upload().status_code, status.HTTP_501_NOT_IMPLEMENTED)
+
+
+class MetricsTestCase(APITestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user(username='metrics', email='metrics@example.com', name='Metrics', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_are_recorded_per_url_name(self):
+        requests_before = self.sample('petcare_http_requests_total', view='animal-list', method='GET', status='200')
+        queries_before = self.sample('petcare_http_request_queries_count', view='animal-list')
+
+        response = self.client.get(reverse('animal-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.sample('petcare_http_requests_total', view='animal-list', method='GET', status='200'), requests_before + 1)
+        self.assertEqual(self.sample('petcare_http_request_queries_count', view='animal-list'), queries_before + 1)
+        self.assertEqual(connection.execute_wrappers, [])
+
+    def test_async_requests_are_recorded(self):
+        token = RefreshToken.for_user(self.user).access_token
+        before = self.sample('petcare_http_requests_total', view='animal-list', method='GET', status='200')
+
+        response = async_to_sync(self.async_client.get)(reverse('animal-list'), headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.sample('petcare_http_requests_total', view='animal-list', method='GET', status='200'), before + 1)
+
+    @override_settings(METRICS_N_PLUS_ONE_THRESHOLD=3)
+    def test_repeated_statements_are_flagged_as_n_plus_one(self):
+        def view(request):
+            for _ in range(int(request.GET['repeat'])):
+                list(Animal.objects.filter(tutor=self.user))
+            return HttpResponse()
+
+        middleware = RequestMetricsMiddleware(view)
+        flagged_before = self.sample('petcare_http_n_plus_one_requests_total', view='<unresolved>')
+
+        middleware(RequestFactory().get('/', {'repeat': 2}))
+        self.assertEqual(self.sample('petcare_http_n_plus_one_requests_total', view='<unresolved>'), flagged_before)
+
+        with self.assertLogs('petcare.middleware', 'DEBUG') as logs:
+            middleware(RequestFactory().get('/', {'repeat': 3}))
+        self.assertEqual(self.sample('petcare_http_n_plus_one_requests_total', view='<unresolved>'), flagged_before + 1)
+        self.assertIn('Possible N+1 in <unresolved>: 3 runs', logs.output[0])
+
+    def test_metrics_endpoint_serves_prometheus_text(self):
+        self.client.get(reverse('animal-list'))
+
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_401_UNAUTHORIZED)
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('petcare_http_request_duration_seconds_bucket{', body)
+        self.assertIn('view="animal-list"', body)
+        self.assertIn('petcare_db_connections_opened_total{alias="default"}', body)
+
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_llm_calls_and_tasks_are_recorded(self):
+        def handler(request):
+            if b'throttle' in request.content:
+                return httpx.Response(429)
+            return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": "Hi"}]}}]})
+
+        client = httpx.Client(transport=httpx.MockTransport(handler))
+        ok_before = self.sample('petcare_llm_requests_total', operation='generate', status='200')
+        throttled_before = self.sample('petcare_llm_requests_total', operation='generate', status='429')
+        durations_before = self.sample('petcare_llm_request_duration_seconds_count', operation='generate')
+
+        with patch.object(llm, 'GEMINI_API_KEY', 'test-key'), \
+                patch.object(llm, 'circuit_breaker', CircuitBreaker('test', failure_threshold=5, cooldown=30)):
+            llm._post(client, llm._build_payload('prompt'))
+            with self.assertRaises(llm.GeminiUnavailable):
+                llm._post(client, llm._build_payload('throttle'))
+
+        self.assertEqual(self.sample('petcare_llm_requests_total', operation='generate', status='200'), ok_before + 1)
+        self.assertEqual(self.sample('petcare_llm_requests_total', operation='generate', status='429'), throttled_before + 1)
+        self.assertEqual(self.sample('petcare_llm_request_duration_seconds_count', operation='generate'), durations_before + 2)
+
+        task = 'animals.tasks.generate_photo_variants'
+        runs_before = self.sample('petcare_tasks_total', task=task, state='SUCCESS')
+        generate_photo_variants.delay('00000000-0000-0000-0000-000000000000', 'missing.png')
+        self.assertEqual(self.sample('petcare_tasks_total', task=task, state='SUCCESS'), runs_before + 1)
+        self.assertGreater(self.sample('petcare_task_duration_seconds_count', task=task), 0)
+
+
+def make_image_file(width=1200, height=900, name='photo.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'orange').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(PHOTO_VARIANT_WIDTHS=[160, 320, 640])
+class PhotoVariantsTestCase(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username=fake.user_name(),
+            email=fake.email(),
+            name=fake.name(),
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_animal_with_photo(self, **image_kwargs):
+        data = {'name': fake.first_name(), 'species': 'dog', 'photo': make_image_file(**image_kwargs)}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('animal-list'), data, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Animal.objects.get(id=response.data['id'])
+
+    def test_upload_generates_webp_variants(self):
+        animal = self.create_animal_with_photo()
+
+        self.assertEqual(sorted(animal.photo_variants, key=int), ['160', '320', '640'])
+        for width, name in animal.photo_variants.items():
+            with default_storage.open(name) as variant, Image.open(variant) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.width, int(width))
+
+        response = self.client.get(reverse('animal-detail', args=[animal.id]))
+        url = urlsplit(response.data['photo_variants']['320'])
+        self.assertTrue(url.path.endswith('_320w.webp'))
+        self.assertTrue(url.path.startswith('/media/'))
+        self.assertEqual(url.netloc, 'testserver')
+
+    def test_small_photos_are_not_upscaled(self):
+        animal = self.create_animal_with_photo(width=200, height=100)
+        self.assertEqual(sorted(animal.photo_variants, key=int), ['160'])
+
+    def test_removing_the_photo_deletes_its_variants(self):
+        animal = self.create_animal_with_photo()
+        names = [animal.photo.name, *animal.photo_variants.values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # The frontend sends an empty multipart value to remove the photo.
+            response = self.client.patch(reverse('animal-detail', args=[animal.id]), {'photo': ''}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['photo'])
+        self.assertEqual(response.data['photo_variants'], {})
+        for name in names:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_updates_without_a_photo_keep_it(self):
+        animal = self.create_animal_with_photo()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse('animal-detail', args=[animal.id]), {'age': 3}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['age'], 3)
+        self.assertEqual(Animal.objects.get(id=animal.id).photo.name, animal.photo.name)
+        self.assertTrue(default_storage.exists(animal.photo.name))
+        self.assertEqual(len(response.data['photo_variants']), 3)
+
+    def test_deleting_the_animal_deletes_its_photo_files(self):
+        animal = self.create_animal_with_photo()
+        names = [animal.photo.name, *animal.photo_variants.values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('animal-detail', args=[animal.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        for name in names:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_replacing_the_photo_regenerates_its_variants(self):
+        animal = self.create_animal_with_photo()
+        old_names = list(animal.photo_variants.values())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('animal-detail', args=[animal.id]),
+                {'photo': make_image_file(name='new.png')},
+                format='multipart',
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        animal.refresh_from_db()
+        self.assertEqual(len(animal.photo_variants), 3)
+        self.assertTrue(all('new_' in name for name in animal.photo_variants.values()))
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_fast_read_path_matches_the_model_serializer(self):
+        animal = self.create_animal_with_photo()
+        with ThoughtWriter() as writer:
+            writer.add(animal.id, 'Line\u2028separator \u00e9')
+        Animal.objects.create(tutor=self.user, name='Plain', species='cat')
+
+        request = Request(APIRequestFactory().get('/api/animals/'))
+        expected = AnimalSerializer(Animal.objects.order_by('id'), many=True, context={'request': request}).data
+        rows = serialize_animal_rows(Animal.objects.order_by('id').values(*ANIMAL_READ_FIELDS), request)
+
+        self.assertEqual(rows, expected)
+        self.assertEqual(ORJSONRenderer().render(rows), JSONRenderer().render(expected))
+
+    def test_variants_of_a_replaced_photo_are_discarded(self):
+        animal = self.create_animal_with_photo()
+        Animal.objects.filter(id=animal.id).update(photo_variants={})
+
+        self.assertEqual(generate_photo_variants(str(animal.id), 'pet_photos/old.png'), {})
+        animal.refresh_from_db()
+        self.assertEqual(animal.photo_variants, {})
+
+
+class ProtectedMediaTestCase(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, PHOTO_VARIANT_WIDTHS=[160])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username=fake.user_name(),
+            email=fake.email(),
+            name=fake.name(),
+            password='testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        data = {'name': fake.first_name(), 'species': 'dog', 'photo': make_image_file(name='rex.png')}
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('animal-list'), data, format='multipart')
+        self.animal = Animal.objects.get(id=response.data['id'])
+        self.photo_url = response.data['photo']
+        # Browsers load photos through <img> tags, without the JWT.
+        self.client.force_authenticate(user=None)
+
+    def test_photo_names_are_content_hashed(self):
+        with default_storage.open(self.animal.photo.name) as photo:
+            digest = hashlib.sha256(photo.read()).hexdigest()[:12]
+        self.assertEqual(self.animal.photo.name, f'pet_photos/rex_{digest}.png')
+
+    def test_signed_url_serves_the_photo_with_immutable_caching(self):
+        response = self.client.get(self.photo_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        with default_storage.open(self.animal.photo.name) as photo:
+            self.assertEqual(b''.join(response.streaming_content), photo.read())
+
+        response = self.client.get(self.photo_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_range_requests(self):
+        with default_storage.open(self.animal.photo.name) as photo:
+            content = photo.read()
+
+        response = self.client.get(self.photo_url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(content)}')
+        self.assertEqual(b''.join(response.streaming_content), content[10:20])
+
+        response = self.client.get(self.photo_url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), content[-5:])
+
+        response = self.client.get(self.photo_url, HTTP_RANGE=f'bytes={len(content)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_access_needs_a_valid_signature_and_ownership(self):
+        url = urlsplit(self.photo_url)
+        self.assertEqual(self.client.get(url.path).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.get(self.photo_url.replace('sig=', 'sig=x')).status_code, status.HTTP_404_NOT_FOUND,
+        )
+        # The photo and its variants share the animal's signature; other files do not.
+        variant = self.animal.photo_variants['160']
+        self.assertEqual(
+            self.client.get(f'{default_storage.url(variant)}?{url.query}').status_code, status.HTTP_200_OK,
+        )
+        other = Animal.objects.create(tutor=self.user, name='Other', species='cat', photo=self.animal.photo.name)
+        self.assertEqual(self.client.get(f'{url.path}?{url.query.replace(str(self.animal.id), str(other.id))}').status_code, status.HTTP_404_NOT_FOUND)
+
+        other = User.objects.create_user(
+            username=fake.user_name(), email=fake.email(), name=fake.name(), password='testpass123',
+        )
+        Animal.objects.filter(id=self.animal.id).update(tutor=other)
+        self.assertEqual(self.client.get(self.photo_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_photo_and_variants_share_one_signature(self):
+        with patch('animals.media._signer.sign', wraps=_signer.sign) as sign:
+            row = serialize_animal_rows(Animal.objects.filter(id=self.animal.id).values(*ANIMAL_READ_FIELDS))[0]
+        self.assertEqual(sign.call_count, 1)
+        self.assertEqual({urlsplit(url).query for url in [row['photo'], *row['photo_variants'].values()]}, {urlsplit(row['photo']).query})
+
+    @override_settings(MEDIA_URL_TTL_SECONDS=3600)
+    def test_signed_urls_are_stable_within_a_period_and_expire(self):
+        url = lambda: media_urls(self.animal.photo.name, None, self.animal.id, self.animal.tutor_id)[0]
+        with patch('animals.media.time.time', return_value=7200):
+            issued = url()
+        with patch('animals.media.time.time', return_value=7200 + 3599):
+            self.assertEqual(url(), issued)
+            self.assertEqual(self.client.get(issued).status_code, status.HTTP_200_OK)
+        with patch('animals.media.time.time', return_value=7200 + 3600):
+            self.assertNotEqual(url(), issued)
+        with patch('animals.media.time.time', return_value=7200 + 2 * 3600 + 1):
+            self.assertEqual(self.client.get(issued).status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(MEDIA_URL_TTL_SECONDS=3600)
+    def test_validators_change_with_the_signing_period(self):
+        self.client.force_authenticate(user=self.user)
+        now = time.time()
+        for url in (reverse('animal-detail', args=[self.animal.id]), reverse('animal-list')):
+            caches['default'].clear()
+            first = self.client.get(url)
+            headers = {'HTTP_IF_NONE_MATCH': first['ETag'], 'HTTP_IF_MODIFIED_SINCE': first['Last-Modified']}
+            self.assertEqual(self.client.get(url, **headers).status_code, status.HTTP_304_NOT_MODIFIED)
+
+            caches['default'].clear()
+            with patch('animals.media.time.time', return_value=now + 3 * 3600):
+                response = self.client.get(url, **headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], first['ETag'])
+            self.assertNotEqual(response['Last-Modified'], first['Last-Modified'])
+
+    def test_files_can_be_handed_to_the_front_proxy(self):
+        with override_settings(MEDIA_SERVE_MODE='x-accel'):
+            response = self.client.get(self.photo_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.animal.photo.name}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        with override_settings(MEDIA_SERVE_MODE='x-sendfile'):
+            response = self.client.get(self.photo_url)
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.animal.photo.name))
+
+
+@override_settings(THOUGHT_PROMPT_BATCH_SIZE=1)
+class DailyThoughtsTestCase(APITestCase):
+    def setUp(self):
+        caches['thoughts'].clear()
+        self.user = User.objects.create_user(
+            username=fake.user_name(),
+            email=fake.email(),
+            name=fake.name(),
+            password='testpass123'
+        )
+        self.animals = [
+            Animal.objects.create(
+                tutor=self.user,
+                name=fake.first_name(),
+                species=random.choice([s[0] for s in Animal.SPECIES_CHOICES]),
+                breed=fake.word(),
+                age=random.randint(1, 15),
+            )
+            for _ in range(12)
+        ]
+
+    @override_settings(THOUGHT_GENERATION_CHUNK_SIZE=5)
+    def test_generate_daily_thoughts_updates_every_animal(self):
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value='Woof!')):
+            stats = generate_daily_thoughts()
+
+        run = ThoughtGenerationRun.objects.get()
+        self.assertEqual(stats, {"chunks": 3, "run_id": run.id})
+        for animal in Animal.objects.all():
+            self.assertEqual(animal.thought_of_the_day, 'Woof!')
+            self.assertIsNotNone(animal.thought_generated_at)
+
+        self.assertEqual((run.chunks, run.chunks_done, run.generated, run.failed), (3, 3, 12, 0))
+        self.assertIsNotNone(run.finished_at)
+
+    @override_settings(THOUGHT_GENERATION_CHUNK_SIZE=5)
+    def test_second_run_on_the_same_day_skips_fresh_animals(self):
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value='Woof!')):
+            generate_daily_thoughts()
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value='Again')) as generate:
+            stats = generate_daily_thoughts()
+
+        self.assertEqual(stats["chunks"], 0)
+        generate.assert_not_awaited()
+        self.assertEqual(ThoughtGenerationRun.objects.count(), 1)
+
+    @override_settings(THOUGHT_GENERATION_CHUNK_SIZE=5)
+    def test_interrupted_run_resumes_with_the_remaining_animals(self):
+        yesterday = generation_window_start() - timedelta(hours=1)
+        fresh = [animal.id for animal in self.animals[:8]]
+        Animal.objects.filter(id__in=fresh).update(thought_of_the_day='Done', thought_generated_at=timezone.now())
+        Animal.objects.exclude(id__in=fresh).update(thought_of_the_day='Old', thought_generated_at=yesterday)
+
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value='Resumed')) as generate:
+            stats = generate_daily_thoughts()
+
+        self.assertEqual(stats["chunks"], 1)
+        self.assertEqual(generate.await_count, 4)
+        self.assertEqual(Animal.objects.filter(thought_of_the_day='Done').count(), 8)
+        self.assertEqual(Animal.objects.filter(thought_of_the_day='Resumed').count(), 4)
+
+    @override_settings(THOUGHT_GENERATION_CHUNK_SIZE=5)
+    def test_failed_chunk_closes_the_run_and_is_resumed(self):
+        # Eager chords raise before calling errbacks, so the chunks are run one by one.
+        run = ThoughtGenerationRun.objects.create(window_start=generation_window_start(), chunks=3)
+        bounds = [
+            (str(start_id) if start_id else None, str(end_id) if end_id else None)
+            for start_id, end_id in iter_chunk_bounds(Animal.objects.all(), 5)
+        ]
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value='Woof!')):
+            for index, chunk_bounds in enumerate(bounds):
+                chunk = generate_thoughts_chunk.s(*chunk_bounds, run_id=run.id).on_error(
+                    record_failed_chunk.s(run_id=run.id),
+                )
+                if index == 1:
+                    with patch('animals.tasks.generate_thoughts', side_effect=RuntimeError('Worker lost')), \
+                            patch.object(generate_thoughts_chunk, 'max_retries', 0):
+                        chunk.apply(throw=False)
+                else:
+                    chunk.apply(throw=False)
+
+        run.refresh_from_db()
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(run.failed_chunks, [list(bounds[1])])
+        self.assertEqual(Animal.objects.filter(thought_of_the_day='Woof!').count(), 7)
+
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value='Resumed')) as resumed:
+            stats = generate_daily_thoughts()
+
+        self.assertEqual(stats["chunks"], 1)
+        self.assertEqual(resumed.await_count, 5)
+        run.refresh_from_db()
+        self.assertEqual(run.failed_chunks, [])
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual((run.chunks, run.chunks_done, run.generated), (4, 3, 12))
+        self.assertEqual(Animal.objects.filter(thought_of_the_day='Resumed').count(), 5)
+
+    def test_chunk_bounds_cover_every_animal_once(self):
+        bounds = list(iter_chunk_bounds(Animal.objects.all(), 5))
+        self.assertEqual(len(bounds), 3)
+
+        seen = []
+        for start_id, end_id in bounds:
+            seen.extend(chunk_queryset(start_id, end_id).values_list('id', flat=True))
+        self.assertCountEqual(seen, [animal.id for animal in self.animals])
+
+    def test_summarize_daily_thoughts_adds_up_chunk_stats(self):
+        summary = summarize_daily_thoughts([
+            {"generated": 4, "failed": 1},
+            {"generated": 5, "failed": 0},
+        ])
+        self.assertEqual(summary, {"chunks": 2, "generated": 9, "failed": 1})
+
+    def test_generation_respects_concurrency_cap(self):
+        in_flight = 0
+        peak = 0
+
+        async def fake_generate(prompt, client=None, max_tokens=60):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return 'Meow'
+
+        with patch('animals.llm.agenerate_text_for_animal', fake_generate):
+            stats = generate_thoughts(Animal.objects.all(), concurrency=4, batch_size=5)
+
+        self.assertEqual(stats["generated"], 12)
+        self.assertEqual(peak, 4)
+
+    def test_concurrency_is_not_limited_by_the_batch_size(self):
+        in_flight = 0
+        peak = 0
+
+        async def fake_generate(prompt, client=None, max_tokens=60):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return 'Meow'
+
+        with patch('animals.llm.agenerate_text_for_animal', fake_generate):
+            stats = generate_thoughts(Animal.objects.all(), concurrency=6, batch_size=2)
+
+        self.assertEqual(stats["generated"], 12)
+        self.assertEqual(peak, 6)
+
+    def test_failed_generation_is_counted_and_not_saved(self):
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(side_effect=RuntimeError('boom'))):
+            stats = generate_thoughts(Animal.objects.all())
+
+        self.assertEqual(stats, {"generated": 0, "failed": 12, "throttled": []})
+        self.assertFalse(Animal.objects.filter(thought_of_the_day__isnull=False).exists())
+
+    def test_thought_writer_only_updates_thought_fields(self):
+        animal = self.animals[0]
+        stale = Animal.objects.get(id=animal.id)
+        Animal.objects.filter(id=animal.id).update(name='Renamed')
+
+        with ThoughtWriter() as writer:
+            writer.add(stale.id, 'Fresh thought')
+
+        animal.refresh_from_db()
+        self.assertEqual(animal.name, 'Renamed')
+        self.assertEqual(animal.thought_of_the_day, 'Fresh thought')
+
+    def test_thought_writer_flushes_in_batches(self):
+        writer = ThoughtWriter(flush_size=5)
+        with self.assertNumQueries(6):
+            for animal in self.animals:
+                writer.add(animal.id, 'Batched')
+        with self.assertNumQueries(3):
+            writer.flush()
+        self.assertEqual(Animal.objects.filter(thought_of_the_day='Batched').count(), 12)
+        self.assertEqual(ThoughtHistory.objects.filter(thought='Batched').count(), 12)
+
+    def test_animals_are_packed_into_batched_prompts(self):
+        async def fake_generate(prompts, client=None):
+            return {animal_id: f'Thought for {animal_id}' for animal_id in prompts}
+
+        with patch('animals.llm.agenerate_texts_for_animals', side_effect=fake_generate) as generate:
+            stats = generate_thoughts(Animal.objects.all(), prompt_batch_size=5)
+
+        self.assertEqual(stats["generated"], 12)
+        self.assertEqual(sorted(len(call.args[0]) for call in generate.call_args_list), [2, 5, 5])
+        for animal in Animal.objects.all():
+            self.assertEqual(animal.thought_of_the_day, f'Thought for {animal.id}')
+
+
+    def test_throttled_animals_are_retried_by_the_chunk_task(self):
+        throttled_once = set()
+
+        async def fake_generate(prompt, client=None, max_tokens=60):
+            if prompt not in throttled_once and len(throttled_once) < 4:
+                throttled_once.add(prompt)
+                raise llm.GeminiUnavailable("Gemini returned 429")
+            return 'Eventually'
+
+        with patch('animals.llm.agenerate_text_for_animal', fake_generate), \
+                patch('animals.tasks.backoff_delay', return_value=0) as backoff:
+            stats = generate_thoughts_chunk.apply(throw=False).get()
+
+        self.assertEqual(stats, {"generated": 12, "failed": 0})
+        backoff.assert_called_once()
+        self.assertEqual(Animal.objects.filter(thought_of_the_day='Eventually').count(), 12)
+
+
+    def test_cached_thoughts_skip_the_llm(self):
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value='Cached')) as generate:
+            generate_thoughts(Animal.objects.all())
+            first_calls = generate.await_count
+            stats = generate_thoughts(Animal.objects.all())
+
+        self.assertEqual(first_calls, 12)
+        self.assertEqual(generate.await_count, 12)
+        self.assertEqual(stats["generated"], 12)
+        self.assertEqual(thought_cache_stats(), {"hits": 12, "misses": 12})
+
+    def test_animals_with_the_same_profile_share_one_generation(self):
+        Animal.objects.all().delete()
+        for _ in range(3):
+            Animal.objects.create(tutor=self.user, name='Rex', species='dog', breed='Mixed', age=3)
+
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value='Woof!')) as generate:
+            stats = generate_thoughts(Animal.objects.all())
+
+        self.assertEqual(stats["generated"], 3)
+        self.assertEqual(generate.await_count, 1)
+
+    def test_fallback_thoughts_are_not_cached(self):
+        with patch('animals.llm.agenerate_text_for_animal', AsyncMock(return_value=llm.FALLBACK_THOUGHT)) as generate:
+            generate_thoughts(Animal.objects.all())
+            generate_thoughts(Animal.objects.all())
+
+        self.assertEqual(generate.await_count, 24)
+
+
+    def test_generation_against_the_gemini_stub(self):
+        with StubGeminiServer() as server, \
+                patch.object(llm, 'API_URL', server.url), \
+                patch.object(llm, 'GEMINI_API_KEY', 'test-key'):
+            stats = generate_thoughts(Animal.objects.all(), prompt_batch_size=5)
+            llm.close_clients()
+
+        self.assertEqual(stats["generated"], 12)
+        self.assertEqual(server.requests, 3)
+        for animal in Animal.objects.all():
+            self.assertEqual(animal.thought_of_the_day, f'A stub thought for {animal.id}.')
+
+
+class BatchedPromptTestCase(SimpleTestCase):
+    def _response(self, items):
+        return {"candidates": [{"content": {"parts": [{"text": json.dumps(items)}]}}]}
+
+    def test_batched_response_is_parsed_by_id(self):
+        prompts = {"a": "prompt a", "b": "prompt b"}
+        data = self._response([{"id": "b", "thought": " Bee "}, {"id": "a", "thought": "Ay"}])
+
+        with patch('animals.llm._post', return_value=data) as post, \
+                patch('animals.llm.generate_text_for_animal') as single:
+            thoughts = generate_texts_for_animals(prompts)
+
+        self.assertEqual(thoughts, {"a": "Ay", "b": "Bee"})
+        post.assert_called_once()
+        single.assert_not_called()
+
+    def test_missing_and_malformed_entries_fall_back_to_single_calls(self):
+        prompts = {"a": "prompt a", "b": "prompt b", "c": "prompt c"}
+        data = self._response([
+            {"id": "a", "thought": "Ay"},
+            {"id": "b", "thought": ""},
+            {"id": "zzz", "thought": "Unknown"},
+            "garbage",
+        ])
+
+        with patch('animals.llm._post', return_value=data), \
+                patch('animals.llm.generate_text_for_animal', side_effect=lambda prompt: f'single {prompt}'):
+            thoughts = generate_texts_for_animals(prompts)
+
+        self.assertEqual(thoughts, {"a": "Ay", "b": "single prompt b", "c": "single prompt c"})
+
+    def test_unparseable_response_falls_back_for_every_animal(self):
+        prompts = {"a": "prompt a", "b": "prompt b"}
+        data = {"candidates": [{"content": {"parts": [{"text": "not json"}]}}]}
+
+        with patch('animals.llm._post', return_value=data), \
+                patch('animals.llm.generate_text_for_animal', return_value='single') as single:
+            thoughts = generate_texts_for_animals(prompts)
+
+        self.assertEqual(thoughts, {"a": "single", "b": "single"})
+        self.assertEqual(single.call_count, 2)
+
+
+class LLMClientPoolTestCase(SimpleTestCase):
+    def tearDown(self):
+        llm.close_clients()
+
+    def test_sync_client_is_reused_until_closed(self):
+        client = llm.get_client()
+        self.assertIs(llm.get_client(), client)
+
+        llm.close_clients()
+        self.assertTrue(client.is_closed)
+        self.assertIsNot(llm.get_client(), client)
+
+    def test_async_client_is_reused_within_a_loop(self):
+        async def get_twice():
+            return llm.get_async_client(), llm.get_async_client()
+
+        loop = asyncio.new_event_loop()
+        try:
+            first, second = loop.run_until_complete(get_twice())
+            self.assertIs(first, second)
+
+            llm.close_clients()
+            self.assertTrue(first.is_closed)
+        finally:
+            loop.close()
+
+
+class StreamTextTestCase(SimpleTestCase):
+    def test_stream_yields_text_fragments(self):
+        def chunk(text):
+            return "data: " + json.dumps({"candidates": [{"content": {"parts": [{"text": text}]}}]}) + "\r\n\r\n"
+
+        def handler(request):
+            return httpx.Response(200, text=chunk("Wo") + chunk("of!"), headers={"Content-Type": "text/event-stream"})
+
+        client = httpx.Client(transport=httpx.MockTransport(handler))
+        with patch.object(llm, 'GEMINI_API_KEY', 'test-key'), \
+                patch.object(llm, 'get_client', return_value=client):
+            fragments = list(llm.stream_text_for_animal('prompt'))
+
+        self.assertEqual(fragments, ["Wo", "of!"])
+
+
+class RateLimitTestCase(SimpleTestCase):
+    def test_token_bucket_paces_callers_once_the_burst_is_spent(self):
+        bucket = TokenBucket('test', rate=10, capacity=2)
+        waits = [bucket.reserve() for _ in range(4)]
+
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 0.1, places=2)
+        self.assertAlmostEqual(waits[3], 0.2, places=2)
+
+    def test_token_bucket_refuses_waits_over_the_maximum(self):
+        bucket = TokenBucket('test', rate=10, capacity=1)
+        self.assertEqual(bucket.reserve(max_wait=0.5), 0.0)
+        self.assertAlmostEqual(bucket.reserve(max_wait=0.5), 0.1, places=2)
+
+        with self.assertRaises(RateLimitExceeded):
+            bucket.reserve(max_wait=0.1)
+        bucket.refund()
+        self.assertAlmostEqual(bucket.reserve(max_wait=0.5), 0.1, places=2)
+
+    def test_waiting_call_over_the_maximum_raises(self):
+        with patch.object(llm, 'rate_limiter', TokenBucket('test', rate=1, capacity=1)), \
+                patch.object(llm, 'circuit_breaker', CircuitBreaker('test', failure_threshold=5, cooldown=30)), \
+                patch.object(llm, 'RATE_LIMIT_MAX_WAIT_SECONDS', 0.5):
+            llm._before_call('generate')
+            with self.assertRaises(llm.GeminiUnavailable) as ctx:
+                llm._before_call('generate')
+        self.assertGreater(ctx.exception.retry_after, 0.5)
+
+    def test_half_open_circuit_lets_one_probe_through(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, cooldown=30)
+        breaker.record_failure()
+        self.assertGreater(breaker.allow_request(), 29)
+
+        breaker._open_until = 0.0
+        self.assertEqual(breaker.allow_request(), 0)
+        self.assertGreater(breaker.allow_request(), 0)
+
+        breaker.record_failure()
+        self.assertGreater(breaker.allow_request(), 29)
+
+        breaker._open_until = 0.0
+        self.assertEqual(breaker.allow_request(), 0)
+        breaker.record_success()
+        self.assertEqual(breaker.allow_request(), 0)
+        self.assertEqual(breaker.allow_request(), 0)
+
+    def test_circuit_breaker_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker('test', failure_threshold=2, cooldown=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.remaining_open(), 0)
+
+        breaker.record_failure()
+        self.assertGreater(breaker.remaining_open(), 29)
+
+    def test_client_errors_close_a_half_open_circuit(self):
+        breaker = CircuitBreaker('test', failure_threshold=1, cooldown=30)
+        client = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(400)))
+        breaker.record_failure()
+        breaker._open_until = 0.0
+
+        with patch.object(llm, 'GEMINI_API_KEY', 'test-key'), \
+                patch.object(llm, 'circuit_breaker', breaker):
+            self.assertIsNone(llm._post(client, llm._build_payload('prompt')))
+        self.assertEqual(breaker.allow_request(), 0)
+        self.assertEqual(breaker.allow_request(), 0)
+
+    def test_throttled_call_raises_and_trips_the_breaker(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(429, headers={"Retry-After": "7"})
+
+        breaker = CircuitBreaker('test', failure_threshold=1, cooldown=30)
+        client = httpx.Client(transport=httpx.MockTransport(handler))
+
+        with patch.object(llm, 'GEMINI_API_KEY', 'test-key'), \
+                patch.object(llm, 'circuit_breaker', breaker):
+            with self.assertRaises(llm.GeminiUnavailable) as ctx:
+                llm._post(client, llm._build_payload('prompt'))
+            self.assertEqual(ctx.exception.retry_after, 7)
+
+            with self.assertRaises(llm.GeminiUnavailable):
+                llm._post(client, llm._build_payload('prompt'))
+
+        self.assertEqual(len(calls), 1)
+
@@ -0,0 +1,357 @@
+import asyncio
+import threading
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import llm
+from .cache import bump_animal_list_versions, cache_thoughts, get_cached_thoughts
+from .history import record_history
+from .models import Animal
+
+
+def build_thought_prompt(animal) -> str:
+    return (
+        f"Imagine you are a {animal.species} named {animal.name}. "
+        f"You are {animal.age} years old, which is a very important detail for your personality and view of the world. "
+        f"Your species, {animal.species}, influences how you think and feel. "
+        f"Your breed is {animal.breed}. "
+        f"Generate a short, cute, and unique thought (max 180 characters) that reflects your age and species."
+    )
+
+
+def generation_window_start(now=None):
+    """
+    Start of the current generation window: midnight of today in TIME_ZONE.
+    A thought generated since then counts as today's.
+    """
+
+    now = timezone.localtime(now)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def stale_animals(queryset, window_start):
+    return queryset.filter(Q(thought_generated_at__isnull=True) | Q(thought_generated_at__lt=window_start))
+
+
+_local = threading.local()
+
+
+def _get_event_loop():
+    """
+    Returns this thread's long-lived event loop. Keeping the loop alive between
+    runs lets the pooled async Gemini client keep its connections open too.
+    """
+
+    loop = getattr(_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _local.loop = asyncio.new_event_loop()
+    return loop
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+async def _achunked(iterable, size):
+    chunk = []
+    async for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _group_by_prompt(animals):
+    """
+    Returns ``({key: prompt}, {key: [animals]})``, one key per distinct prompt.
+    """
+
+    animals_by_prompt = {}
+    for animal in animals:
+        animals_by_prompt.setdefault(build_thought_prompt(animal), []).append(animal)
+
+    prompts = {str(group[0].id): prompt for prompt, group in animals_by_prompt.items()}
+    groups = {str(group[0].id): group for group in animals_by_prompt.values()}
+    return prompts, groups
+
+
+async def _generate_group(prompts, semaphore, queue):
+    async with semaphore:
+        try:
+            thoughts = await llm.agenerate_texts_for_animals(prompts)
+        except Exception as e:
+            for key in prompts:
+                queue.put_nowait((key, None, e))
+        else:
+            for key in prompts:
+                queue.put_nowait((key, thoughts[key], None))
+
+
+class _GenerationPipeline:
+    """
+    State shared by iter_generated_thoughts and aiter_generated_thoughts: the
+    Gemini calls of every batch feed one result queue, so a call starts as
+    soon as a slot of the semaphore frees up, not once the whole previous
+    batch has finished.
+    """
+
+    def __init__(self, loop, concurrency, prompt_batch_size, cache_batch_size):
+        self.loop = loop
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.queue = asyncio.Queue()
+        self.prompt_batch_size = prompt_batch_size
+        self.cache_batch_size = cache_batch_size
+        # Keys queued or in flight: reading the next batch waits while there
+        # are enough of them to keep every slot busy.
+        self.max_pending = concurrency * prompt_batch_size
+        self.tasks = set()
+        self.prompts = {}
+        self.groups = {}
+        self.generated = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self.groups)
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending >= self.max_pending
+
+    def start(self, prompts, groups, cached) -> list:
+        """
+        Schedules the calls of the prompts missing from ``cached`` and returns
+        the results of the cached ones.
+        """
+
+        missing = [key for key in prompts if key not in cached]
+        for keys in _chunked(missing, self.prompt_batch_size):
+            batch = {key: prompts[key] for key in keys}
+            self.prompts.update(batch)
+            self.groups.update((key, groups[key]) for key in keys)
+            task = self.loop.create_task(_generate_group(batch, self.semaphore, self.queue))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        return [(animal, thought, None) for key, thought in cached.items() for animal in groups[key]]
+
+    def receive(self, first) -> list:
+        """
+        Returns the ``(animal, thought, error)`` results of ``first`` and of
+        every other result already queued.
+        """
+
+        items = [first]
+        while not self.queue.empty():
+            items.append(self.queue.get_nowait())
+        results = []
+        for key, thought, error in items:
+            prompt, group = self.prompts.pop(key), self.groups.pop(key)
+            if error is None:
+                self.generated[key] = (prompt, thought)
+            results.extend((animal, thought, error) for animal in group)
+        return results
+
+    def take_generated(self, force=False):
+        """
+        Returns the ``(prompts, thoughts)`` to cache once ``cache_batch_size``
+        of them were generated (or any with ``force``), or None.
+        """
+
+        if not self.generated or (len(self.generated) < self.cache_batch_size and not force):
+            return None
+        generated, self.generated = self.generated, {}
+        return (
+            {key: prompt for key, (prompt, _) in generated.items()},
+            {key: thought for key, (_, thought) in generated.items()},
+        )
+
+    async def cancel(self):
+        pending = [task for task in self.tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def iter_generated_thoughts(animals, concurrency=None, batch_size=None, prompt_batch_size=None):
+    """
+    Generates thoughts for ``animals`` keeping up to ``concurrency`` Gemini calls
+    in flight, and yields ``(animal, thought, error)`` as soon as each one finishes.
+
+    Animals are pulled from the iterable ``batch_size`` at a time, and only
+    while the calls already scheduled would not keep every slot busy, so a
+    queryset iterator is streamed instead of being loaded whole. Thoughts
+    already in the daily thought cache are yielded right away, animals sharing
+    a prompt share a single generation, and each Gemini call covers up to
+    ``prompt_batch_size`` distinct prompts. Calls still in flight are
+    cancelled if the consumer stops.
+    """
+
+    concurrency = concurrency or settings.THOUGHT_GENERATION_CONCURRENCY
+    batch_size = batch_size or settings.THOUGHT_GENERATION_BATCH_SIZE
+    prompt_batch_size = prompt_batch_size or settings.THOUGHT_PROMPT_BATCH_SIZE
+
+    loop = _get_event_loop()
+    pipeline = _GenerationPipeline(loop, concurrency, prompt_batch_size, batch_size)
+    chunks = _chunked(animals, batch_size)
+    exhausted = False
+    try:
+        while True:
+            # Reading the database between results pauses the calls in flight,
+            # which only make progress while the loop runs below.
+            while not exhausted and not pipeline.saturated:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                prompts, groups = _group_by_prompt(chunk)
+                yield from pipeline.start(prompts, groups, get_cached_thoughts(prompts))
+
+            if not pipeline.pending:
+                break
+            yield from pipeline.receive(loop.run_until_complete(pipeline.queue.get()))
+            if to_cache := pipeline.take_generated():
+                cache_thoughts(*to_cache)
+
+        if to_cache := pipeline.take_generated(force=True):
+            cache_thoughts(*to_cache)
+    finally:
+        loop.run_until_complete(pipeline.cancel())
+
+
+async def aiter_generated_thoughts(animals, concurrency=None, batch_size=None, prompt_batch_size=None):
+    """
+    Async counterpart of iter_generated_thoughts for code already running on an
+    event loop (ASGI views). ``animals`` is an async iterable such as a
+    queryset; the thought cache is read and written from a worker thread.
+    """
+
+    concurrency = concurrency or settings.THOUGHT_GENERATION_CONCURRENCY
+    batch_size = batch_size or settings.THOUGHT_GENERATION_BATCH_SIZE
+    prompt_batch_size = prompt_batch_size or settings.THOUGHT_PROMPT_BATCH_SIZE
+
+    pipeline = _GenerationPipeline(asyncio.get_running_loop(), concurrency, prompt_batch_size, batch_size)
+    chunks = _achunked(animals, batch_size)
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and not pipeline.saturated:
+                chunk = await anext(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                prompts, groups = _group_by_prompt(chunk)
+                cached = await sync_to_async(get_cached_thoughts)(prompts)
+                for result in pipeline.start(prompts, groups, cached):
+                    yield result
+
+            if not pipeline.pending:
+                break
+            for result in pipeline.receive(await pipeline.queue.get()):
+                yield result
+            if to_cache := pipeline.take_generated():
+                await sync_to_async(cache_thoughts)(*to_cache)
+
+        if to_cache := pipeline.take_generated(force=True):
+            await sync_to_async(cache_thoughts)(*to_cache)
+    finally:
+        await pipeline.cancel()
+        await chunks.aclose()
+
+
+class ThoughtWriter:
+    """
+    Buffers generated thoughts and writes them back with one bulk UPDATE per
+    ``flush_size`` animals. Only the thought columns (and ``updated_at``, which
+    bulk updates do not touch on their own) are written, so concurrent edits
+    to the rest of the row (name, age, photo...) are left untouched. Each
+    flush also records the thoughts in ThoughtHistory and invalidates the
+    cached list pages of the tutors involved.
+    """
+
+    fields = ('thought_of_the_day', 'thought_generated_at', 'updated_at')
+
+    def __init__(self, flush_size=None):
+        self.flush_size = flush_size or settings.THOUGHT_WRITE_FLUSH_SIZE
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+
+    def _append(self, animal_id, thought, generated_at):
+        generated_at = generated_at or timezone.now()
+        self._buffer.append(Animal(
+            id=animal_id,
+            thought_of_the_day=thought,
+            thought_generated_at=generated_at,
+            updated_at=generated_at,
+        ))
+        return len(self._buffer) >= self.flush_size
+
+    def add(self, animal_id, thought, generated_at=None):
+        if self._append(animal_id, thought, generated_at):
+            self.flush()
+
+    async def aadd(self, animal_id, thought, generated_at=None):
+        if self._append(animal_id, thought, generated_at):
+            await self.aflush()
+
+    async def aflush(self):
+        await sync_to_async(self.flush)()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        with transaction.atomic(savepoint=False):
+            Animal.objects.bulk_update(self._buffer, self.fields, batch_size=self.flush_size)
+            # Animals deleted in the meantime get no history row.
+            tutors = dict(Animal.objects.filter(id__in=[animal.id for animal in self._buffer]).values_list('id', 'tutor_id'))
+            record_history(
+                (
+                    (animal.id, animal.thought_of_the_day, animal.thought_generated_at)
+                    for animal in self._buffer if animal.id in tutors
+                ),
+                batch_size=self.flush_size,
+            )
+        bump_animal_list_versions(tutors.values())
+        self._buffer = []
+
+
+def generate_thoughts(animals, concurrency=None, batch_size=None, prompt_batch_size=None) -> dict:
+    """
+    Generates a thought for every animal in ``animals`` and stores the results
+    through a ThoughtWriter.
+
+    Animals that could not be generated because Gemini was unavailable are
+    not counted as failed; their ids are returned under ``"throttled"`` so the
+    caller can retry them later.
+    """
+
+    stats = {"generated": 0, "failed": 0, "throttled": []}
+
+    with ThoughtWriter() as writer:
+        for animal, thought, error in iter_generated_thoughts(animals, concurrency, batch_size, prompt_batch_size):
+            if isinstance(error, llm.GeminiUnavailable):
+                stats["throttled"].append(str(animal.id))
+                continue
+            if error is not None:
+                print('Error generating thought for', animal.id, error)
+                stats["failed"] += 1
+                continue
+
+            writer.add(animal.id, thought)
+            stats["generated"] += 1
+
+    return stats
@@ -0,0 +1,98 @@
+import posixpath
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from rest_framework.exceptions import ValidationError
+
+from .models import PHOTO_UPLOAD_DIR
+
+PHOTO_CONTENT_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+}
+
+# How long after its upload URL expires a token can still be confirmed, so
+# an upload started just before the expiry can finish.
+CONFIRM_GRACE_SECONDS = 3600
+
+_signer = signing.TimestampSigner(salt='animals.photo-upload')
+
+
+class DirectUploadUnavailable(Exception):
+    """Raised when the storage backend cannot issue presigned uploads."""
+
+
+def supports_direct_uploads(storage=None) -> bool:
+    # S3Storage exposes its boto3 bucket; other backends have no way to
+    # presign a request.
+    return hasattr(storage or default_storage, 'bucket')
+
+
+def photo_upload_name(animal_id, content_type) -> str:
+    # Never reused, so the object's URL can be cached as immutable too.
+    return posixpath.join(PHOTO_UPLOAD_DIR, str(animal_id), f"{uuid.uuid4().hex}{PHOTO_CONTENT_TYPES[content_type]}")
+
+
+def storage_key(name, storage=None) -> str:
+    """Returns the bucket key of the storage name ``name``."""
+
+    location = (storage or default_storage).location
+    return posixpath.join(location, name) if location else name
+
+
+def presign_photo_upload(animal_id, content_type, size, storage=None) -> dict:
+    """
+    Returns a presigned POST (``url`` and form ``fields``) that lets the client
+    upload a photo of ``animal_id`` straight to the bucket, plus the
+    ``upload_token`` to confirm it with.
+
+    The policy pins the object key and Content-Type and caps the body at
+    ``size`` bytes, so the bucket rejects anything else. Nothing is sent to
+    the storage: the signature is computed locally.
+    """
+
+    storage = storage or default_storage
+    if not supports_direct_uploads(storage):
+        raise DirectUploadUnavailable("Direct uploads need the S3 storage backend.")
+
+    name = photo_upload_name(animal_id, content_type)
+    expires_in = settings.PHOTO_UPLOAD_URL_TTL_SECONDS
+    post = storage.bucket.meta.client.generate_presigned_post(
+        storage.bucket_name,
+        storage_key(name, storage),
+        Fields={'Content-Type': content_type},
+        Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, size]],
+        ExpiresIn=expires_in,
+    )
+    return {
+        'url': post['url'],
+        'fields': post['fields'],
+        'upload_token': _signer.sign_object({'animal': str(animal_id), 'name': name}),
+        'expires_in': expires_in,
+    }
+
+
+def confirm_photo_upload(animal_id, upload_token, storage=None) -> str:
+    """
+    Checks that ``upload_token`` was issued for ``animal_id`` and that its
+    object has been uploaded, and returns the storage name to attach. The
+    only storage call is a HEAD on the object, whatever its size.
+    """
+
+    storage = storage or default_storage
+    try:
+        data = _signer.unsign_object(
+            upload_token, max_age=settings.PHOTO_UPLOAD_URL_TTL_SECONDS + CONFIRM_GRACE_SECONDS,
+        )
+    except signing.BadSignature:
+        raise ValidationError({'upload_token': ['Invalid or expired upload token.']})
+
+    if data.get('animal') != str(animal_id):
+        raise ValidationError({'upload_token': ['Invalid or expired upload token.']})
+    if not storage.exists(data['name']):
+        raise ValidationError({'upload_token': ['The photo has not been uploaded yet.']})
+    return data['name']
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework.routers import DefaultRouter
 from .views import AnimalViewSet
 from django.urls import path, include
@@ -9,4 +10,12 @@ router.register(r'animals', AnimalViewSet, basename='animal')
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if settings.ASYNC_VIEWS:
+    from . import async_views
+
+    urlpatterns = [
+        path('animals/', async_views.animal_list, name='animal-list'),
+        path('animals/<uuid:pk>/', async_views.animal_detail, name='animal-detail'),
+    ] + urlpatterns
@@ -1,38 +1,293 @@
+import hashlib
+import json
+from datetime import datetime, timezone
 from django.shortcuts import render
-from rest_framework import viewsets, permissions
-from .models import Animal
-from .serializers import AnimalSerializer
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status, viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from django.db import transaction
+from .bulk import import_animals, iter_csv_export, iter_ndjson_export
+from .cache import animal_list_cache_key, cache_animal_list, get_cached_animal_list
+from .images import delete_photo
+from .media import media_url_period, serves_protected_media
+from .models import Animal, ThoughtHistory
+from .parsers import CSVParser, NDJSONParser
+from .renderers import CSVRenderer, NDJSONRenderer, ORJSONRenderer
+from .serializers import (
+    ANIMAL_READ_FIELDS, AnimalSerializer, PhotoUploadConfirmSerializer, PhotoUploadSerializer, ThoughtHistorySerializer,
+    serialize_animal_rows,
+)
+from .pagination import AnimalCursorPagination, ThoughtHistoryCursorPagination
 from .permissions import IsTutorOrReadOnly
+from .streaming import streaming_response
+from .tasks import generate_photo_variants
+from .uploads import DirectUploadUnavailable, confirm_photo_upload, presign_photo_upload
 from drf_spectacular.utils import extend_schema
 
 
 
+def _conditional_response(request, etag, last_modified):
+    """
+    Returns a 304 (or 412) response when the request's validators match, or
+    None when the view should build the full response.
+    """
+
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def _media_period(rows):
+    """
+    Start of the current media signing period when ``rows`` carry signed photo
+    URLs, which expire with it: a response validated in an older period must
+    not get a 304. None otherwise.
+    """
+
+    if serves_protected_media() and any(row['photo'] for row in rows):
+        return datetime.fromtimestamp(media_url_period(), tz=timezone.utc)
+    return None
+
+
+def _last_modified(row, period):
+    if period is not None and row['photo']:
+        return max(row['updated_at'], period)
+    return row['updated_at']
+
+
+def list_validators(request, links, rows):
+    """
+    Returns the ``(etag, last_modified)`` of a list page from its rows' ids and
+    ``updated_at`` values, its pagination ``links`` and the media signing
+    period of its photo URLs.
+    """
+
+    period = _media_period(rows)
+    versions = [(str(row['id']), row['updated_at'].timestamp()) for row in rows]
+    key = json.dumps([request.user.pk, request.get_full_path(), links, versions, period], default=str)
+    etag = f'W/"{hashlib.md5(key.encode()).hexdigest()}"'
+    return etag, max((_last_modified(row, period) for row in rows), default=None)
+
+
+def detail_validators(row):
+    """Returns the ``(etag, last_modified)`` of one animal, as list_validators."""
+
+    period = _media_period([row])
+    suffix = f":{period.timestamp():.0f}" if period is not None else ""
+    return f'W/"{row["id"]}:{row["updated_at"].timestamp()}{suffix}"', _last_modified(row, period)
+
+
 @extend_schema(tags=['Animals'])
 class AnimalViewSet(viewsets.ModelViewSet):
     serializer_class = AnimalSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    renderer_classes = (ORJSONRenderer, BrowsableAPIRenderer)
 
 
+    @property
+    def paginator(self):
+        """
+        Clients opt into cursor pagination with ``?pagination=cursor``; the
+        ``next``/``previous`` links keep the parameter, so they stay on it.
+        """
+
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = AnimalCursorPagination()
+        return super().paginator
+
     def get_queryset(self):
-        return Animal.objects.filter(tutor=self.request.user)
+        # Page-number pages list animals in creation order; the id only breaks
+        # ties. Cursor pages re-order by id (AnimalCursorPagination).
+        return Animal.objects.filter(tutor_id=self.request.user.id).order_by('created_at', 'id')
+
+    def list(self, request, *args, **kwargs):
+        """
+        Serialized pages are cached per tutor and URL under the tutor's list
+        version (see ``animals.cache``), so a hit costs no query beyond
+        authentication. ``X-Cache`` tells whether the page came from the cache.
+
+        The ETag is computed from the page's ids and ``updated_at`` values plus
+        its pagination links (and count), so a 304 costs only the pagination
+        queries and nothing is serialized. Last-Modified is informational
+        here: a deletion does not move it, so only If-None-Match can turn a
+        list request into a 304.
+        """
+
+        cache_key = animal_list_cache_key(request.user.pk, request.build_absolute_uri())
+        entry = get_cached_animal_list(cache_key)
+        if entry is not None:
+            response = _conditional_response(request, entry['etag'], None) or Response(entry['data'])
+            response['X-Cache'] = 'HIT'
+            return _set_validators(response, entry['etag'], entry['last_modified'])
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*ANIMAL_READ_FIELDS, 'updated_at')
+        page = self.paginate_queryset(queryset)
+        rows = page if page is not None else list(queryset)
+
+        links = self.get_paginated_response([]).data if page is not None else {}
+        etag, last_modified = list_validators(request, links, rows)
+
+        response = _conditional_response(request, etag, None)
+        if response is None:
+            data = serialize_animal_rows(rows, request)
+            if page is not None:
+                response = self.get_paginated_response(data)
+            else:
+                response = Response(data)
+            cache_animal_list(cache_key, {'data': response.data, 'etag': etag, 'last_modified': last_modified})
+        response['X-Cache'] = 'MISS'
+        return _set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Reads the row with ``.values()`` and serializes it on the fast path,
+        the same way as the list.
+        """
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*ANIMAL_READ_FIELDS, 'updated_at')
+        row = get_object_or_404(queryset, pk=kwargs[self.lookup_url_kwarg or self.lookup_field])
+        self.check_object_permissions(request, row)
+        etag, last_modified = detail_validators(row)
+
+        response = _conditional_response(request, etag, last_modified)
+        if response is None:
+            response = Response(serialize_animal_rows([row], request)[0])
+        return _set_validators(response, etag, last_modified)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=(NDJSONParser, CSVParser))
+    def bulk_import(self, request):
+        """
+        Creates animals for the tutor from an NDJSON body (one object per line)
+        or a CSV one (with a header line). Valid rows are inserted in batches;
+        the response counts them and reports the rejected lines.
+        """
+
+        rows = request.data
+        if isinstance(rows, dict):
+            # Empty body.
+            rows = []
+        report = import_animals(rows, request.user.id)
+
+        if report['created']:
+            status_code = status.HTTP_201_CREATED
+        elif report['failed']:
+            status_code = status.HTTP_400_BAD_REQUEST
+        else:
+            status_code = status.HTTP_200_OK
+        return Response(report, status=status_code)
+
+    @action(detail=False, methods=['get'], renderer_classes=(NDJSONRenderer, CSVRenderer))
+    def export(self, request):
+        """
+        Streams all of the tutor's animals as NDJSON, or as CSV with
+        ``Accept: text/csv`` or ``?format=csv``, in constant memory.
+        """
+
+        queryset = self.get_queryset()
+        if request.accepted_renderer.format == 'csv':
+            content, filename = iter_csv_export(queryset, request), 'animals.csv'
+        else:
+            content, filename = iter_ndjson_export(queryset, request), 'animals.ndjson'
+
+        content_type = request.accepted_renderer.media_type
+        if request.accepted_renderer.charset:
+            content_type = f"{content_type}; charset={request.accepted_renderer.charset}"
+        response = streaming_response(request, content, content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=True, methods=['get'], url_path='thoughts', serializer_class=ThoughtHistorySerializer)
+    def thought_history(self, request, pk=None):
+        """
+        The animal's past thoughts, newest first. Pages are cursor-based, so
+        each one is a single range scan of the history's primary key.
+        """
+
+        get_object_or_404(self.get_queryset().values('id'), pk=pk)
+        queryset = ThoughtHistory.objects.filter(animal_id=pk).values(*ThoughtHistorySerializer.Meta.fields)
+        paginator = ThoughtHistoryCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(ThoughtHistorySerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'], url_path='photo-upload', serializer_class=PhotoUploadSerializer)
+    def photo_upload(self, request, pk=None):
+        """
+        Issues a presigned POST for uploading the animal's photo straight to the
+        bucket. Post the returned ``fields`` plus a ``file`` field to ``url``,
+        then send the ``upload_token`` to ``photo-upload/confirm/``.
+        """
+
+        get_object_or_404(self.get_queryset().values('id'), pk=pk)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            upload = presign_photo_upload(pk, **serializer.validated_data)
+        except DirectUploadUnavailable as e:
+            return Response({'detail': str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        return Response(upload, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=True, methods=['post'], url_path='photo-upload/confirm', serializer_class=PhotoUploadConfirmSerializer,
+    )
+    def confirm_photo_upload(self, request, pk=None):
+        """
+        Attaches an uploaded photo to the animal. The file itself never goes
+        through Django: the variants task reads it from the bucket.
+        """
+
+        animal = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        name = confirm_photo_upload(animal.id, serializer.validated_data['upload_token'])
+
+        if animal.photo.name != name:
+            old_photo, old_variants = animal.photo.name, animal.photo_variants
+            animal.photo = name
+            animal.photo_variants = {}
+            animal.save(update_fields=['photo', 'photo_variants', 'updated_at'])
+            transaction.on_commit(lambda: delete_photo(old_photo, old_variants))
+            self._schedule_photo_variants(animal)
+        return Response(AnimalSerializer(animal, context=self.get_serializer_context()).data)
 
     def perform_create(self, serializer):
-        serializer.save(tutor=self.request.user)
-    
-    def perform_update(self, serializer):
-        instance = self.get_object()
+        animal = serializer.save(tutor_id=self.request.user.id)
+        self._schedule_photo_variants(animal)
 
-        photo_in_request = 'photo' in self.request.data
+    def perform_update(self, serializer):
+        # Only a ``photo`` sent in the request (a file, or null to remove it)
+        # replaces the current one; other updates leave it alone.
+        if 'photo' not in serializer.validated_data:
+            serializer.save()
+            return
 
-        wants_to_remove_photo = (
-            not photo_in_request and
-            instance.photo is not None 
-        )
+        old_photo, old_variants = serializer.instance.photo.name, serializer.instance.photo_variants
+        animal = serializer.save(photo_variants={})
+        if animal.photo.name != old_photo:
+            transaction.on_commit(lambda: delete_photo(old_photo, old_variants))
+            self._schedule_photo_variants(animal)
 
-        if wants_to_remove_photo:
-            instance.photo.delete(save=False)
-            instance.photo = None
-            instance.save()
-            serializer.validated_data['photo'] = None
+    def perform_destroy(self, instance):
+        photo, variants = instance.photo.name, instance.photo_variants
+        instance.delete()
+        if photo or variants:
+            transaction.on_commit(lambda: delete_photo(photo, variants))
 
-        serializer.save()
\ No newline at end of file
+    def _schedule_photo_variants(self, animal):
+        if animal.photo:
+            transaction.on_commit(lambda: generate_photo_variants.delay(str(animal.id), animal.photo.name))
@@ -0,0 +1,210 @@
+"""
+Serves the app under gunicorn (WSGI, sync views) and uvicorn (ASGI, async
+views) in turn and drives both with the same concurrent load: animal list
+reads, and thought streams against the local Gemini stub, where a request
+spends most of its time waiting on the LLM.
+
+    python -m benchmarks.asgi --concurrency 64 --requests 10 --latency 0.3
+
+Both servers get the same number of workers; gunicorn runs ``--threads``
+threads per worker, which caps its in-flight requests, while uvicorn is
+limited by the event loop only. ``asgi_whitenoise`` runs uvicorn with the
+sync-only WhiteNoise middleware back in the stack, which makes Django run
+every request through a thread: ``peak_server_threads`` (read from /proc)
+shows how many threads the servers held under the load. The database is a throwaway SQLite file and
+the list page cache is disabled, so every read reaches the ORM.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _prepare_database(path, tutors, animals_per_tutor):
+    os.environ["DJANGO_TESTING"] = "1"
+    os.environ["SQLITE_NAME"] = path
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "petcare.settings")
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from benchmarks.seed import seed
+
+    call_command("migrate", verbosity=0)
+    return [str(RefreshToken.for_user(tutor).access_token) for tutor in seed(tutors, animals_per_tutor)]
+
+
+def _start_server(kind, port, env, workers, threads):
+    if kind == "wsgi":
+        command = [
+            sys.executable, "-m", "gunicorn", "petcare.wsgi:application",
+            "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--threads", str(threads),
+            "--log-level", "warning",
+        ]
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", "petcare.asgi:application",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+            "--log-level", "warning", "--no-access-log",
+        ]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{kind} server did not start on port {port}")
+
+
+def _thread_count(pid):
+    """
+    Threads of ``pid`` and its descendants (the server's workers), read from
+    /proc; None where there is no /proc.
+    """
+
+    processes = {}
+    try:
+        names = os.listdir("/proc")
+    except OSError:
+        return None
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/status") as status:
+                fields = dict(line.split(":", 1) for line in status if ":" in line)
+        except OSError:
+            continue
+        processes[int(name)] = (int(fields["PPid"]), int(fields["Threads"]))
+
+    tree, total = {pid}, 0
+    for _ in range(3):
+        tree |= {child for child, (parent, _) in processes.items() if parent in tree}
+    for member in tree:
+        total += processes.get(member, (0, 0))[1]
+    return total
+
+
+async def _sample_threads(pid, peak):
+    while True:
+        count = _thread_count(pid)
+        if count is not None:
+            peak[0] = max(peak[0], count)
+        await asyncio.sleep(0.05)
+
+
+async def _load(base_url, path, tokens, concurrency, requests, pid=None):
+    import httpx
+
+    timings = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def user(token):
+            nonlocal errors
+            headers = {"Authorization": f"Bearer {token}", "Host": "localhost"}
+            for _ in range(requests):
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path, headers=headers)
+                except httpx.HTTPError:
+                    # A server error cut the response short (e.g. SQLite locked).
+                    errors += 1
+                    continue
+                timings.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200 or b"event: error" in response.content:
+                    errors += 1
+
+        peak_threads = [0]
+        sampler = asyncio.create_task(_sample_threads(pid, peak_threads)) if pid else None
+        start = time.perf_counter()
+        await asyncio.gather(*(user(tokens[i % len(tokens)]) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        if sampler is not None:
+            sampler.cancel()
+
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "mean_ms": round(statistics.mean(timings), 3),
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(statistics.quantiles(timings, n=20)[18], 3),
+        "requests_per_second": round(len(timings) / elapsed, 1),
+        "peak_server_threads": peak_threads[0] or None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=10, help="requests per simulated client and endpoint")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="gunicorn threads per worker")
+    parser.add_argument("--tutors", type=int, default=64)
+    parser.add_argument("--animals-per-tutor", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Gemini stub latency in seconds")
+    args = parser.parse_args()
+
+    from benchmarks.stub_gemini import StubGeminiServer
+
+    workdir = tempfile.mkdtemp()
+    tokens = _prepare_database(os.path.join(workdir, "db.sqlite3"), args.tutors, args.animals_per_tutor)
+
+    endpoints = {"animal_list": "/api/animals/", "thought_stream": "/api/auth/generate-thoughts/stream/"}
+    results = {"concurrency": args.concurrency, "workers": args.workers, "threads": args.threads, "servers": {}}
+
+    with StubGeminiServer(latency=args.latency) as stub:
+        env = {
+            **os.environ,
+            "DEBUG": "0",
+            "DJANGO_ALLOWED_HOSTS": "localhost,127.0.0.1",
+            "GEMINI_API_BASE_URL": stub.base_url,
+            "GEMINI_API_KEY": "benchmark",
+            "LLM_RATE_LIMIT_PER_SECOND": "0",
+            "THOUGHT_CACHE_TTL_SECONDS": "0",
+            "ANIMAL_LIST_CACHE_TTL_SECONDS": "0",
+        }
+        servers = {
+            "wsgi": ("wsgi", {"ASYNC_VIEWS": "0"}),
+            "asgi": ("asgi", {"ASYNC_VIEWS": "1", "WHITENOISE_ENABLED": "0"}),
+            "asgi_whitenoise": ("asgi", {"ASYNC_VIEWS": "1", "WHITENOISE_ENABLED": "1"}),
+        }
+        for name, (kind, server_env) in servers.items():
+            port = _free_port()
+            process = _start_server(kind, port, {**env, **server_env}, args.workers, args.threads)
+            try:
+                results["servers"][name] = {
+                    endpoint: asyncio.run(_load(f"http://127.0.0.1:{port}", path, tokens, args.concurrency, args.requests, process.pid))
+                    for endpoint, path in endpoints.items()
+                }
+            finally:
+                process.terminate()
+                process.wait()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Compares two benchmarks.run result files and flags regressions.
+
+    python -m benchmarks.compare baseline.json current.json --threshold 0.1
+
+Exits with status 1 when a latency, query count or throughput figure got worse
+by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+
+
+def compare(baseline, current, threshold):
+    rows = []
+
+    for name, before in baseline.get("endpoints", {}).items():
+        after = current.get("endpoints", {}).get(name)
+        if after is None:
+            continue
+        rows.append((f"{name} p50_ms", before["p50_ms"], after["p50_ms"], after["p50_ms"] > before["p50_ms"] * (1 + threshold)))
+        rows.append((f"{name} queries", before["queries"], after["queries"], after["queries"] > before["queries"]))
+
+    before = baseline.get("generation")
+    after = current.get("generation")
+    if before and after:
+        rows.append((
+            "generation animals_per_second",
+            before["animals_per_second"],
+            after["animals_per_second"],
+            after["animals_per_second"] < before["animals_per_second"] * (1 - threshold),
+        ))
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold)
+    regressed = False
+    for metric, before, after, is_regression in rows:
+        regressed = regressed or is_regression
+        flag = "REGRESSION" if is_regression else ""
+        print(f"{metric:<40} {before:>12} {after:>12} {flag}")
+
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
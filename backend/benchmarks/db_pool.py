@@ -0,0 +1,130 @@
+"""
+Compares per-request database latency under concurrent load for each
+DB_POOL_MODE: a new connection per request, persistent health-checked
+connections, and psycopg 3's pool (PostgreSQL with psycopg 3 only).
+
+Each simulated request goes through the same connection handling as a Django
+request (``close_old_connections`` before and after) and runs one query.
+
+    python -m benchmarks.db_pool --threads 16 --requests 200
+
+Run it against PostgreSQL (e.g. inside the Docker setup): SQLite connections
+are nearly free, and the in-memory test database never closes them, so the
+modes look alike there.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+
+
+def _run(threads, requests):
+    from django.db import close_old_connections, connection, connections
+
+    timings = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker():
+        local = []
+        barrier.wait()
+        for _ in range(requests):
+            start = time.perf_counter()
+            close_old_connections()
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            close_old_connections()
+            local.append((time.perf_counter() - start) * 1000)
+        connections.close_all()
+        with lock:
+            timings.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(timings),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(statistics.quantiles(timings, n=20)[18], 3),
+        "requests_per_second": round(len(timings) / elapsed, 1),
+    }
+
+
+def _pool_supported(connection):
+    if connection.vendor != "postgresql":
+        return False
+    try:
+        import psycopg_pool  # noqa: F401
+        from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    except ImportError:
+        return False
+    return is_psycopg3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "petcare.settings")
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection, connections
+    from django.test.utils import setup_test_environment
+
+    from petcare.db import database_stats
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    db_settings = connections.settings["default"]
+    original = {key: db_settings.get(key) for key in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS", "OPTIONS")}
+
+    modes = {
+        "none": {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "OPTIONS": {}},
+        "persistent": {"CONN_MAX_AGE": settings.DB_CONN_MAX_AGE, "CONN_HEALTH_CHECKS": True, "OPTIONS": {}},
+    }
+    if _pool_supported(connection):
+        modes["pool"] = {
+            "CONN_MAX_AGE": 0,
+            "CONN_HEALTH_CHECKS": False,
+            "OPTIONS": {"pool": {
+                "min_size": settings.DB_POOL_MIN_SIZE,
+                "max_size": max(settings.DB_POOL_MAX_SIZE, args.threads),
+                "timeout": settings.DB_POOL_TIMEOUT,
+            }},
+        }
+
+    results = {"database": connection.vendor, "threads": args.threads, "modes": {}}
+    try:
+        connection.close()
+        for mode, overrides in modes.items():
+            db_settings.update(overrides)
+            opened = database_stats()["default"]["connections_opened"]
+            results["modes"][mode] = _run(args.threads, args.requests)
+            stats = database_stats()["default"]
+            stats["connections_opened"] -= opened
+            results["modes"][mode]["stats"] = stats
+            if mode == "pool":
+                connection.close_pool()
+    finally:
+        db_settings.update(original)
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
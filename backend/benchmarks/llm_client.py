@@ -0,0 +1,62 @@
+"""
+Compares per-call latency of a fresh httpx.Client per call (the old
+behaviour) against the pooled client of animals.llm, using the local stub.
+
+    python -m benchmarks.llm_client --calls 500
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+from animals import llm
+from benchmarks.stub_gemini import StubGeminiServer
+
+
+def _measure(call, calls):
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "calls": calls,
+        "mean_ms": round(statistics.mean(timings), 3),
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(statistics.quantiles(timings, n=20)[18], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    llm.GEMINI_API_KEY = llm.GEMINI_API_KEY or os.getenv("GEMINI_API_KEY", "benchmark")
+    llm.rate_limiter.rate = 0
+    payload = llm._build_payload("Imagine you are a dog named Rex.")
+
+    def fresh_client_call():
+        with httpx.Client(timeout=llm.REQUEST_TIMEOUT_SECONDS) as client:
+            llm._post(client, payload)
+
+    def pooled_client_call():
+        llm.generate_text_for_animal("Imagine you are a dog named Rex.")
+
+    with StubGeminiServer() as server:
+        llm.API_URL = server.url
+        results = {
+            "fresh_client": _measure(fresh_client_call, args.calls),
+            "pooled_client": _measure(pooled_client_call, args.calls),
+        }
+        llm.close_clients()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
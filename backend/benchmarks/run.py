@@ -0,0 +1,174 @@
+"""
+Offline benchmark suite. Creates a throwaway test database, seeds it, then
+measures latency and DB query counts of the main endpoints and the thought
+generation throughput against the local Gemini stub. Results are JSON, so runs
+can be compared with ``python -m benchmarks.compare``.
+
+    DJANGO_TESTING=1 python -m benchmarks.run --tutors 20 --animals-per-tutor 50 --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+
+def _summary(timings):
+    return {
+        "iterations": len(timings),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(statistics.quantiles(timings, n=20)[18], 3) if len(timings) > 1 else round(timings[0], 3),
+    }
+
+
+def bench_endpoint(client, method, url, iterations, data=None):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings = []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data, format="json")
+            if getattr(response, "streaming", False):
+                b"".join(response.streaming_content)
+            timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method.upper()} {url} answered {response.status_code}")
+
+    result = _summary(timings)
+    result["queries"] = len(queries.captured_queries)
+    result["status"] = response.status_code
+    return result
+
+
+def bench_endpoints(tutor, iterations):
+    from django.urls import reverse
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from benchmarks.seed import PASSWORD
+
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(tutor).access_token}")
+    animal = tutor.pets.first()
+
+    return {
+        "login": bench_endpoint(
+            APIClient(), "post", reverse("token_obtain_pair"), iterations,
+            {"username": tutor.username, "password": PASSWORD},
+        ),
+        "profile": bench_endpoint(client, "get", reverse("profile"), iterations),
+        "animal_list": bench_endpoint(client, "get", reverse("animal-list"), iterations),
+        "animal_detail": bench_endpoint(client, "get", reverse("animal-detail", args=[animal.id]), iterations),
+        "animal_create": bench_endpoint(
+            client, "post", reverse("animal-list"), iterations,
+            {"name": "Bench", "species": "dog", "breed": "Mixed", "age": 3},
+        ),
+    }
+
+
+def bench_generation(latency, concurrency, prompt_batch_size):
+    from django.test import override_settings
+
+    from animals import llm
+    from animals.models import Animal
+    from animals.thoughts import generate_thoughts
+    from benchmarks.stub_gemini import StubGeminiServer
+
+    dummy_caches = {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "thoughts": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+    }
+
+    with StubGeminiServer(latency=latency) as server, override_settings(CACHES=dummy_caches):
+        llm.API_URL = server.url
+        llm.GEMINI_API_KEY = llm.GEMINI_API_KEY or "benchmark"
+        llm.rate_limiter.rate = 0
+
+        animals = Animal.objects.only("id", "name", "species", "breed", "age")
+        start = time.perf_counter()
+        stats = generate_thoughts(animals.iterator(), concurrency=concurrency, prompt_batch_size=prompt_batch_size)
+        elapsed = time.perf_counter() - start
+        llm.close_clients()
+
+    return {
+        "animals": stats["generated"] + stats["failed"] + len(stats["throttled"]),
+        "generated": stats["generated"],
+        "seconds": round(elapsed, 3),
+        "animals_per_second": round(stats["generated"] / elapsed, 1),
+        "llm_requests": server.requests,
+        "stub_latency_s": latency,
+        "concurrency": concurrency,
+        "prompt_batch_size": prompt_batch_size,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tutors", type=int, default=10)
+    parser.add_argument("--animals-per-tutor", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--prompt-batch-size", type=int, default=20)
+    parser.add_argument("--skip-generation", action="store_true")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "petcare.settings")
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    from animals.cache import animal_list_cache_stats
+    from benchmarks.seed import seed
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        start = time.perf_counter()
+        tutors = seed(args.tutors, args.animals_per_tutor)
+        seed_seconds = time.perf_counter() - start
+
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "git_commit": _git_commit(),
+                "python": platform.python_version(),
+                "database": connection.vendor,
+                "tutors": args.tutors,
+                "animals_per_tutor": args.animals_per_tutor,
+                "seed_seconds": round(seed_seconds, 3),
+            },
+            "endpoints": bench_endpoints(tutors[0], args.iterations),
+            "caches": {"animal_list": animal_list_cache_stats()},
+        }
+        if not args.skip_generation:
+            results["generation"] = bench_generation(args.llm_latency, args.concurrency, args.prompt_batch_size)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+import random
+
+from animals.mock_data import create_mock_animals, create_mock_tutors
+
+PASSWORD = "benchmark123"
+
+
+def seed(tutors, animals_per_tutor, batch_size=5000, rng=None):
+    """
+    Creates ``tutors`` tutors with ``animals_per_tutor`` animals each using
+    bulk inserts, and returns the tutors. Every tutor's password is PASSWORD.
+    """
+
+    users = create_mock_tutors(tutors, PASSWORD, prefix="bench", batch_size=batch_size)
+    create_mock_animals([user.pk for user in users], animals_per_tutor, rng or random.Random(0), batch_size=batch_size)
+    return users
@@ -0,0 +1,99 @@
+"""
+Compares the cost of serializing and rendering animal list payloads with the
+ModelSerializer + stock JSONRenderer against the ``.values()`` fast path +
+ORJSONRenderer. Runs on in-memory rows, no database needed.
+
+    python -m benchmarks.serialization --animals 1000 --rounds 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+
+def _measure(call, rounds, animals):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "rounds": rounds,
+        "mean_ms": round(statistics.mean(timings), 3),
+        "p50_ms": round(statistics.median(timings), 3),
+        "per_1k_animals_ms": round(statistics.median(timings) * 1000 / animals, 3),
+    }
+
+
+def _rows(count):
+    from django.utils import timezone
+
+    now = timezone.now()
+    return [
+        {
+            "id": uuid.uuid4(),
+            "tutor": 1,
+            "name": f"Pet {i}",
+            "species": "dog",
+            "breed": "Mixed",
+            "age": i % 15,
+            "photo": f"pet_photos/pet_{i}.jpg",
+            "photo_variants": {
+                str(width): f"pet_photos/variants/pet_{i}_{width}w.webp" for width in (160, 320, 640)
+            },
+            "thought_of_the_day": "I wonder if the mail carrier is coming back today.",
+            "thought_generated_at": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--animals", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "petcare.settings")
+    import django
+    django.setup()
+
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from animals.models import Animal
+    from animals.renderers import ORJSONRenderer
+    from animals.serializers import AnimalSerializer, serialize_animal_rows
+
+    request = Request(APIRequestFactory().get("/api/animals/", HTTP_HOST="localhost"))
+    rows = _rows(args.animals)
+    animals = [
+        Animal(**{("tutor_id" if field == "tutor" else field): value for field, value in row.items()})
+        for row in rows
+    ]
+
+    def model_serializer():
+        data = AnimalSerializer(animals, many=True, context={"request": request}).data
+        return JSONRenderer().render(data)
+
+    def fast_path():
+        return ORJSONRenderer().render(serialize_animal_rows(rows, request))
+
+    if model_serializer() != fast_path():
+        raise RuntimeError("The fast path output differs from the ModelSerializer output")
+
+    results = {
+        "animals": args.animals,
+        "model_serializer": _measure(model_serializer, args.rounds, args.animals),
+        "fast_path": _measure(fast_path, args.rounds, args.animals),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+A local stand-in for the Gemini generateContent endpoint, so the LLM code can
+be exercised and measured without touching the real API.
+
+Run it standalone and point ``GEMINI_API_BASE_URL`` at the printed base URL
+to drive real web or worker processes against it, e.g.
+
+    python -m benchmarks.stub_gemini --port 8089 --latency 0.3 --throttle-rate 0.05
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANIMAL_ID_PATTERN = re.compile(r"^Animal id (\S+):", re.MULTILINE)
+
+
+class _GeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        stub = self.server.stub
+
+        stub.record_request()
+        if stub.latency:
+            time.sleep(stub.latency)
+
+        roll = random.random()
+        if roll < stub.throttle_rate:
+            return self._send(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}}, {"Retry-After": "1"})
+        if roll < stub.throttle_rate + stub.error_rate:
+            return self._send(500, {"error": {"code": 500, "status": "INTERNAL"}})
+
+        self._send(200, {"candidates": [{"content": {"parts": [{"text": self._answer(payload)}]}}]})
+
+    def _answer(self, payload):
+        try:
+            prompt = payload["contents"][0]["parts"][0]["text"]
+        except (KeyError, IndexError):
+            prompt = ""
+
+        if payload.get("generationConfig", {}).get("responseMimeType") == "application/json":
+            return json.dumps([
+                {"id": animal_id, "thought": f"A stub thought for {animal_id}."}
+                for animal_id in ANIMAL_ID_PATTERN.findall(prompt)
+            ])
+        return "A stub thought."
+
+    def _send(self, status_code, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGeminiServer:
+    """
+    Runs the stub on a background thread. Use as a context manager; ``url`` is
+    the generateContent URL to point ``animals.llm.API_URL`` at.
+
+    ``latency`` is added to every response (seconds), ``throttle_rate`` and
+    ``error_rate`` are the fractions of requests answered with 429 and 500.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, throttle_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), _GeminiHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1beta"
+
+    @property
+    def url(self):
+        return f"{self.base_url}/models/stub:generateContent"
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Gemini stub server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with StubGeminiServer(args.host, args.port, args.latency, args.error_rate, args.throttle_rate) as server:
+        print(f"Gemini stub listening, set GEMINI_API_BASE_URL={server.base_url}")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -9,5 +9,10 @@ while ! nc -z "$DB_HOST" "$DB_PORT"; do
   sleep 1
 done
 
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Postgres OK! Iniciando Celery..."
 exec "$@"   
@@ -21,11 +21,19 @@ python manage.py collectstatic --noinput || echo "Falha em coletar staticfiles,
 
 PORT=${PORT:-8000}
 
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    echo "Limpando métricas de execuções anteriores em $PROMETHEUS_MULTIPROC_DIR..."
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Iniciando Django..."
 echo "Rodando no render? $RUNNING_IN_RENDER"
 echo "Usando a porta $PORT"
 
-if [ "$RUNNING_IN_RENDER" = "true" ]; then
+if [ "$RUNNING_IN_RENDER" = "true" ] && [ "$WEB_SERVER" = "asgi" ]; then
+    exec uvicorn petcare.asgi:application --host 0.0.0.0 --port $PORT
+elif [ "$RUNNING_IN_RENDER" = "true" ]; then
     exec gunicorn petcare.wsgi:application --bind 0.0.0.0:$PORT
 else
     exec python manage.py runserver 0.0.0.0:$PORT
@@ -9,8 +9,20 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'petcare.settings')
+# Serve the async views, and pool connections: persistent connections are
+# per thread, and ASGI runs sync code on many short-lived threads.
+os.environ.setdefault('ASYNC_VIEWS', '1')
+os.environ.setdefault('DB_POOL_MODE', 'pool')
+# WhiteNoise's middleware is sync-only and would make Django adapt the whole
+# stack, so static files are served in front of it instead.
+os.environ.setdefault('WHITENOISE_ENABLED', '0')
 
 application = get_asgi_application()
+
+if not settings.WHITENOISE_ENABLED:
+    application = ASGIStaticFilesHandler(application)
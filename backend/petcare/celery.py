@@ -1,7 +1,25 @@
 import os
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 from django.conf import settings
+from .db import discard_inherited_pools
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'petcare.settings')
 app = Celery('petcare')
 app.config_from_object('django.conf:settings', namespace='CELERY')
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+
+@worker_process_init.connect
+def reset_database_pools(**kwargs):
+    # Celery's Django fixup already drops the parent's plain connections.
+    discard_inherited_pools()
+
+
+@worker_init.connect
+def serve_worker_metrics(**kwargs):
+    # Task and LLM metrics of the worker; set PROMETHEUS_MULTIPROC_DIR too so
+    # the pool processes' metrics are aggregated.
+    port = os.getenv('CELERY_METRICS_PORT')
+    if port:
+        from .metrics import start_metrics_server
+        start_metrics_server(int(port))
@@ -0,0 +1,46 @@
+import threading
+from collections import Counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_opened = Counter()
+_opened_lock = threading.Lock()
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    with _opened_lock:
+        _opened[connection.alias] += 1
+
+
+def database_stats() -> dict:
+    """
+    Per-alias connection stats of this process: how many connections it has
+    opened and, in pool mode, psycopg's pool stats, where ``requests_wait_ms``
+    is the total time spent waiting for a checkout.
+    """
+
+    stats = {}
+    for alias in connections:
+        entry = {"connections_opened": _opened[alias]}
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is not None:
+            entry.update(pool.get_stats())
+        stats[alias] = entry
+    return stats
+
+
+def discard_inherited_pools():
+    """
+    Forgets the connection pools inherited from a parent process without
+    closing them: their sockets are still the parent's, so closing them from
+    the child would break the parent's connections. The child opens its own
+    pool on first use.
+    """
+
+    for alias in connections:
+        pools = getattr(type(connections[alias]), '_connection_pools', None)
+        if pools:
+            pools.pop(alias, None)
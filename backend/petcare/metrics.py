@@ -0,0 +1,117 @@
+"""
+Prometheus metrics of the web and worker processes, served at ``/metrics``.
+
+Metrics live in the process that records them. With several worker processes
+(Gunicorn, Uvicorn or Celery prefork) set PROMETHEUS_MULTIPROC_DIR to a
+directory shared by the processes and emptied at startup, so ``/metrics``
+aggregates all of them.
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, start_http_server,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from .db import database_stats
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32)
+TASK_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600, 1800)
+
+REQUEST_DURATION = Histogram(
+    "petcare_http_request_duration_seconds", "Time to build the response, by URL name.", ["view", "method"],
+)
+REQUESTS = Counter("petcare_http_requests", "Requests served, by URL name and status.", ["view", "method", "status"])
+REQUEST_QUERIES = Histogram(
+    "petcare_http_request_queries", "SQL queries run per request.", ["view"], buckets=QUERY_BUCKETS,
+)
+REQUEST_QUERY_DURATION = Histogram(
+    "petcare_http_request_query_duration_seconds", "Time spent in SQL queries per request.", ["view"],
+)
+N_PLUS_ONE_REQUESTS = Counter(
+    "petcare_http_n_plus_one_requests",
+    "Requests that ran the same SQL statement METRICS_N_PLUS_ONE_THRESHOLD times or more.",
+    ["view"],
+)
+
+LLM_REQUEST_DURATION = Histogram(
+    "petcare_llm_request_duration_seconds", "Duration of the Gemini calls.", ["operation"], buckets=LLM_BUCKETS,
+)
+LLM_REQUESTS = Counter(
+    "petcare_llm_requests",
+    "Gemini calls by outcome: the HTTP status, transport_error, error, circuit_open or rate_limited.",
+    ["operation", "status"],
+)
+LLM_RATE_LIMIT_WAIT = Histogram(
+    "petcare_llm_rate_limit_wait_seconds", "Time Gemini calls waited for the rate limiter.", buckets=LLM_BUCKETS,
+)
+LLM_BATCH_FALLBACKS = Counter(
+    "petcare_llm_batch_fallbacks", "Animals missing from a batched answer and asked for again one by one.",
+)
+
+TASK_DURATION = Histogram(
+    "petcare_task_duration_seconds", "Duration of the Celery tasks.", ["task"], buckets=TASK_BUCKETS,
+)
+TASKS = Counter("petcare_tasks", "Celery task runs by final state.", ["task", "state"])
+THOUGHTS = Counter(
+    "petcare_thoughts", "Thoughts handled by the background tasks: generated, failed or throttled.", ["result"],
+)
+
+
+class DatabaseStatsCollector:
+    """
+    Exposes ``petcare.db.database_stats()`` of the serving process at scrape
+    time: connections opened and, in pool mode, psycopg's pool stats.
+    """
+
+    def collect(self):
+        opened = CounterMetricFamily(
+            "petcare_db_connections_opened", "Database connections opened by the process.", labels=["alias"],
+        )
+        pool_stats = {}
+        for alias, stats in database_stats().items():
+            opened.add_metric([alias], stats.pop("connections_opened"))
+            for key, value in stats.items():
+                if key not in pool_stats:
+                    pool_stats[key] = GaugeMetricFamily(
+                        f"petcare_db_pool_{key}", f"psycopg pool stat {key}.", labels=["alias"],
+                    )
+                pool_stats[key].add_metric([alias], value)
+        yield opened
+        yield from pool_stats.values()
+
+
+class _DefaultRegistryCollector:
+    def collect(self):
+        return REGISTRY.collect()
+
+
+def _scrape_registry() -> CollectorRegistry:
+    registry = CollectorRegistry(auto_describe=True)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(_DefaultRegistryCollector())
+    registry.register(DatabaseStatsCollector())
+    return registry
+
+
+SCRAPE_REGISTRY = _scrape_registry()
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+def render_metrics() -> bytes:
+    return generate_latest(SCRAPE_REGISTRY)
+
+
+def start_metrics_server(port: int):
+    """
+    Serves the metrics on ``port`` from a background thread, for processes
+    without a web server such as the Celery workers.
+    """
+
+    start_http_server(port, registry=SCRAPE_REGISTRY)
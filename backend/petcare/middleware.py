@@ -0,0 +1,118 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """
+    Database execute wrapper that counts the queries of one request, the time
+    spent in them and how many times each SQL statement was run.
+    """
+
+    __slots__ = ('count', 'duration', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Records per URL name the latency, status and SQL queries of every request,
+    and flags the requests that repeat one statement
+    METRICS_N_PLUS_ONE_THRESHOLD times or more, the mark of an N+1 query.
+
+    The costs are a couple of histogram updates per request and a counter
+    update per query. For streaming responses, only the work done before the
+    first byte is measured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Labelled children by (view, method, status): the label lookups cost
+        # more than the updates themselves.
+        self.series = {}
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        counter, started = QueryCounter(), time.perf_counter()
+        with _wrap_connections(counter):
+            response = self.get_response(request)
+        self.record(request, response, counter, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        counter, started = QueryCounter(), time.perf_counter()
+        with _wrap_connections(counter):
+            response = await self.get_response(request)
+        self.record(request, response, counter, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, counter, duration):
+        view = _view_name(request)
+        key = (view, request.method, response.status_code)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = (
+                metrics.REQUEST_DURATION.labels(view, request.method),
+                metrics.REQUESTS.labels(view, request.method, str(response.status_code)),
+                metrics.REQUEST_QUERIES.labels(view),
+                metrics.REQUEST_QUERY_DURATION.labels(view),
+            )
+        request_duration, requests, queries, query_duration = series
+        request_duration.observe(duration)
+        requests.inc()
+        queries.observe(counter.count)
+        query_duration.observe(counter.duration)
+
+        if counter.statements:
+            sql, repeats = counter.statements.most_common(1)[0]
+            if repeats >= settings.METRICS_N_PLUS_ONE_THRESHOLD:
+                metrics.N_PLUS_ONE_REQUESTS.labels(view).inc()
+                logger.debug("Possible N+1 in %s: %s runs of %.200s", view, repeats, sql)
+
+
+@contextmanager
+def _wrap_connections(counter):
+    wrapped = [connections[alias] for alias in connections]
+    for connection in wrapped:
+        connection.execute_wrappers.append(counter)
+    try:
+        yield
+    finally:
+        for connection in wrapped:
+            connection.execute_wrappers.remove(counter)
+
+
+def _view_name(request) -> str:
+    # URL names keep the label set small; unmatched paths share one label.
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match.route or '<unnamed>'
@@ -32,7 +32,6 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -41,6 +40,22 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# WhiteNoise serves the static files under WSGI. Its middleware is sync-only,
+# which would put every ASGI request on a thread, so ``petcare.asgi`` turns it
+# off and serves them with Django's ASGIStaticFilesHandler instead.
+WHITENOISE_ENABLED = os.getenv('WHITENOISE_ENABLED', '1') == '1'
+if WHITENOISE_ENABLED:
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.middleware.security.SecurityMiddleware') + 1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+
+# Request latency, status and SQL query metrics, served with the LLM and task
+# metrics at /metrics. The endpoint is only served when METRICS_TOKEN is set,
+# and requires it as a Bearer token.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_N_PLUS_ONE_THRESHOLD = int(os.getenv('METRICS_N_PLUS_ONE_THRESHOLD', 10))
+if METRICS_ENABLED:
+    MIDDLEWARE.insert(0, 'petcare.middleware.RequestMetricsMiddleware')
+
 ROOT_URLCONF = 'petcare.urls'
 
 TEMPLATES = [
@@ -60,6 +75,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'petcare.wsgi.application'
 
+# Routes the hot read endpoints to the async views in front of the DRF ones.
+# ``petcare.asgi`` turns it on unless it is set explicitly.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '0') == '1'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -71,18 +90,70 @@ DATABASES = {
     }
 }
 
+# ``persistent`` keeps each process' connection open for DB_CONN_MAX_AGE
+# seconds, health-checked before reuse; ``pool`` uses psycopg 3's native pool;
+# ``none`` opens a connection per request.
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'persistent')
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+
+if DB_POOL_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+elif DB_POOL_MODE == 'pool':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        },
+    }
+
 if os.environ.get('DJANGO_TESTING'):
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': ':memory:',
+            'NAME': os.getenv('SQLITE_NAME', ':memory:'),
         }
     }
 
+CACHE_URL = os.getenv('CACHE_URL', os.getenv('REDIS_URL', 'redis://redis:6379/1'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    },
+    'thoughts': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+        'KEY_PREFIX': 'thoughts',
+    },
+}
+
+if os.environ.get('DJANGO_TESTING'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        'thoughts': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'thoughts',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        },
+    }
+
 AUTH_USER_MODEL = 'accounts.Tutor'
 
+JWT_STATELESS_AUTH = os.getenv('JWT_STATELESS_AUTH', '1') == '1'
+TUTOR_CACHE_TTL_SECONDS = int(os.getenv('TUTOR_CACHE_TTL_SECONDS', 60))
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
+        'accounts.authentication.TutorStatelessAuthentication'
+        if JWT_STATELESS_AUTH else
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -94,17 +165,73 @@ REST_FRAMEWORK = {
 
 }
 
+ANIMALS_MAX_PAGE_SIZE = int(os.getenv('ANIMALS_MAX_PAGE_SIZE', 100))
+ANIMAL_LIST_CACHE_TTL_SECONDS = int(os.getenv('ANIMAL_LIST_CACHE_TTL_SECONDS', 300))
+ANIMAL_IMPORT_BATCH_SIZE = int(os.getenv('ANIMAL_IMPORT_BATCH_SIZE', 500))
+ANIMAL_IMPORT_MAX_ERRORS = int(os.getenv('ANIMAL_IMPORT_MAX_ERRORS', 1000))
+ANIMAL_EXPORT_CHUNK_SIZE = int(os.getenv('ANIMAL_EXPORT_CHUNK_SIZE', 2000))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_USER_CLASS': 'accounts.authentication.TutorTokenUser',
 }
 
 
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'  
 
+MEDIA_URL = os.getenv('MEDIA_URL', '/media/')
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', BASE_DIR / 'media')
+
+# ``filesystem`` keeps uploads under MEDIA_ROOT; ``s3`` stores them in an
+# S3-compatible bucket (AWS, MinIO...), which lets clients upload photos
+# directly with presigned URLs and every web node see the same files.
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'filesystem')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+if STORAGE_BACKEND == 's3':
+    STORAGES['default'] = {'BACKEND': 'storages.backends.s3.S3Storage'}
+    AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME')
+    AWS_S3_ENDPOINT_URL = os.getenv('AWS_S3_ENDPOINT_URL') or None
+    AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME') or None
+    AWS_S3_CUSTOM_DOMAIN = os.getenv('AWS_S3_CUSTOM_DOMAIN') or None
+    AWS_QUERYSTRING_AUTH = os.getenv('AWS_QUERYSTRING_AUTH', '1') == '1'
+    AWS_QUERYSTRING_EXPIRE = int(os.getenv('AWS_QUERYSTRING_EXPIRE', 3600))
+    AWS_S3_FILE_OVERWRITE = False
+    AWS_DEFAULT_ACL = None
+
+# Local media is served by animals.media.protected_media. ``django`` streams
+# the files from Python; ``x-accel`` (nginx) and ``x-sendfile`` (Apache,
+# lighttpd) only check access and let the front proxy send the file. For
+# x-accel, MEDIA_ACCEL_REDIRECT_PREFIX is an ``internal`` nginx location
+# aliased to MEDIA_ROOT.
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE', 'django')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+# Signed media URLs change every MEDIA_URL_TTL_SECONDS and expire one period
+# later. Keep it above ANIMAL_LIST_CACHE_TTL_SECONDS, or cached listings could
+# hand out expired URLs.
+MEDIA_URL_TTL_SECONDS = max(int(os.getenv('MEDIA_URL_TTL_SECONDS', 60 * 60 * 24)), ANIMAL_LIST_CACHE_TTL_SECONDS)
+# Media names are content-hashed, so browsers can keep them for good.
+# ``private`` keeps shared caches (CDNs, proxies) from serving a photo once
+# its URL has expired or the animal changed tutor; use ``public`` to let a CDN
+# cache them anyway.
+MEDIA_CACHE_CONTROL = os.getenv('MEDIA_CACHE_CONTROL', 'private, max-age=31536000, immutable')
+if STORAGE_BACKEND == 's3':
+    AWS_S3_OBJECT_PARAMETERS = {'CacheControl': MEDIA_CACHE_CONTROL}
+
+PHOTO_UPLOAD_MAX_BYTES = int(os.getenv('PHOTO_UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+PHOTO_UPLOAD_URL_TTL_SECONDS = int(os.getenv('PHOTO_UPLOAD_URL_TTL_SECONDS', 600))
+
+PHOTO_VARIANT_WIDTHS = [int(width) for width in os.getenv('PHOTO_VARIANT_WIDTHS', '160,320,640').split(',')]
+PHOTO_VARIANT_QUALITY = int(os.getenv('PHOTO_VARIANT_QUALITY', 80))
+
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', os.getenv('REDIS_URL', 'redis://redis:6379/0'))
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', os.getenv('REDIS_URL', 'redis://redis:6379/0'))
+CELERY_TASK_ALWAYS_EAGER = bool(os.environ.get('DJANGO_TESTING'))
+CELERY_TASK_EAGER_PROPAGATES = True
 from celery.schedules import crontab
 
 
@@ -112,9 +239,27 @@ CELERY_BEAT_SCHEDULE = {
     'gerar-pensamentos-todos-os-dias-07': {
         'task': 'animals.tasks.generate_daily_thoughts',
         "schedule": crontab(hour=7, minute=0),
-    }
+    },
+    'manter-historico-de-pensamentos-06': {
+        'task': 'animals.tasks.maintain_thought_history',
+        "schedule": crontab(hour=6, minute=30),
+    },
 }
 
+THOUGHT_GENERATION_CONCURRENCY = int(os.getenv('THOUGHT_GENERATION_CONCURRENCY', 32))
+THOUGHT_GENERATION_BATCH_SIZE = int(os.getenv('THOUGHT_GENERATION_BATCH_SIZE', 500))
+THOUGHT_GENERATION_CHUNK_SIZE = int(os.getenv('THOUGHT_GENERATION_CHUNK_SIZE', 2000))
+THOUGHT_PROMPT_BATCH_SIZE = int(os.getenv('THOUGHT_PROMPT_BATCH_SIZE', 20))
+THOUGHT_GENERATION_MAX_RETRIES = int(os.getenv('THOUGHT_GENERATION_MAX_RETRIES', 5))
+THOUGHT_CACHE_TTL_SECONDS = int(os.getenv('THOUGHT_CACHE_TTL_SECONDS', 60 * 60 * 24))
+THOUGHT_JOB_PROGRESS_INTERVAL_SECONDS = float(os.getenv('THOUGHT_JOB_PROGRESS_INTERVAL_SECONDS', 1))
+# Longer than the backoff cap of a throttled retry, so waiting jobs are not failed.
+THOUGHT_JOB_TIMEOUT_SECONDS = int(os.getenv('THOUGHT_JOB_TIMEOUT_SECONDS', 15 * 60))
+THOUGHT_WRITE_FLUSH_SIZE = int(os.getenv('THOUGHT_WRITE_FLUSH_SIZE', 500))
+THOUGHT_HISTORY_RETENTION_MONTHS = int(os.getenv('THOUGHT_HISTORY_RETENTION_MONTHS', 24))
+THOUGHT_HISTORY_COMPACT_AFTER_MONTHS = int(os.getenv('THOUGHT_HISTORY_COMPACT_AFTER_MONTHS', 3))
+THOUGHT_HISTORY_PARTITIONS_AHEAD = int(os.getenv('THOUGHT_HISTORY_PARTITIONS_AHEAD', 2))
+
 TIME_ZONE = 'UTC'
 USE_I18N = True
 USE_TZ = True
@@ -18,15 +18,21 @@ from django.conf import settings
 from django.urls import path, include
 from django.contrib import admin
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from django.conf.urls.static import static
+from animals.media import protected_media
+from .views import metrics_view
 
 
 
 urlpatterns = [
     path('', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/auth/', include('accounts.urls')),
     path('api/', include('animals.urls')),
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/schema/swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+]
+
+if settings.MEDIA_URL.startswith('/'):
+    # Local uploads; see animals.media for the signed URLs and proxy offload.
+    urlpatterns.append(path(f"{settings.MEDIA_URL.lstrip('/')}<path:name>", protected_media, name='media'))
@@ -0,0 +1,17 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from .metrics import METRICS_CONTENT_TYPE, render_metrics
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint."""
+
+    if not settings.METRICS_ENABLED or not settings.METRICS_TOKEN:
+        raise Http404
+    expected = f"Bearer {settings.METRICS_TOKEN}".encode()
+    if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(render_metrics(), content_type=METRICS_CONTENT_TYPE)
@@ -4,7 +4,7 @@ import {
   type CreateAnimalData,
   type UpdateAnimalData,
 } from "@/lib/services/animals";
-import type { Animal } from "@/lib/types";
+import type { Animal, ThoughtJob } from "@/lib/types";
 import { useAuthStore } from "@/lib/stores/auth-store";
 import { authService } from "@/lib/services/auth";
 import { useEffect } from "react";
@@ -82,6 +82,18 @@ const MOCK_ANIMALS: Animal[] = [
 ];
 
 const ANIMALS_KEY = ["animals"];
+const THOUGHT_JOB_POLL_INTERVAL_MS = 1000;
+
+// Thoughts are generated by a background job: poll its status until it ends.
+async function waitForThoughtJob(jobId: string): Promise<ThoughtJob> {
+  for (;;) {
+    const job = await authService.getThoughtJob(jobId);
+    if (job.status === "done" || job.status === "failed") return job;
+    await new Promise((resolve) =>
+      setTimeout(resolve, THOUGHT_JOB_POLL_INTERVAL_MS)
+    );
+  }
+}
 
 export function useAnimalsQuery() {
   const { isDevMode } = useAuthStore();
@@ -165,11 +177,21 @@ export function useAnimalsQuery() {
   });
 
   const generateThoughtOfTheDay = useMutation({
-    mutationFn: async () => {
+    mutationFn: async (): Promise<ThoughtJob> => {
       if (isDevMode) {
-        return { message: "Pensamento do dia gerado com sucesso (modo dev)." };
+        const now = new Date().toISOString();
+        return {
+          id: "dev",
+          status: "done",
+          total: 0,
+          completed: 0,
+          results: [],
+          created_at: now,
+          finished_at: now,
+        };
       }
-      return authService.generateThoughts();
+      const { job_id } = await authService.generateThoughts();
+      return waitForThoughtJob(job_id);
     },
   });
 
@@ -14,7 +14,10 @@ export interface UpdateAnimalData extends Partial<CreateAnimalData> {}
 function toFormData(data: CreateAnimalData | UpdateAnimalData) {
   const formData = new FormData();
   Object.entries(data).forEach(([key, value]) => {
-    if (value !== undefined && value !== null) {
+    if (value === null) {
+      // An empty value clears the field, e.g. removes the photo.
+      formData.append(key, "");
+    } else if (value !== undefined) {
       formData.append(key, value instanceof File ? value : String(value));
     }
   });
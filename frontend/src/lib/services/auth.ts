@@ -5,6 +5,8 @@ import type {
   AuthTokens,
   LoginCredentials,
   RegisterData,
+  ThoughtJob,
+  ThoughtJobStarted,
 } from "@/lib/types";
 import { storage } from "../utils";
 
@@ -31,8 +33,12 @@ export const authService = {
     return api.get<User>("/api/auth/me/");
   },
 
-  async generateThoughts(): Promise<{ message: string; details: unknown[] }> {
-    return api.post("/api/auth/generate-thoughts/");
+  async generateThoughts(): Promise<ThoughtJobStarted> {
+    return api.post<ThoughtJobStarted>("/api/auth/generate-thoughts/");
+  },
+
+  async getThoughtJob(jobId: string): Promise<ThoughtJob> {
+    return api.get<ThoughtJob>(`/api/auth/generate-thoughts/${jobId}/`);
   },
 
   logout(): void {
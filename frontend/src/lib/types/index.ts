@@ -35,6 +35,31 @@ export type AnimalSpecies =
   | "horse"
   | "other";
 
+export type ThoughtJobStatus = "pending" | "running" | "done" | "failed";
+
+export interface ThoughtJobResult {
+  animal_id: string;
+  name: string;
+  thought?: string;
+  error?: string;
+}
+
+export interface ThoughtJob {
+  id: string;
+  status: ThoughtJobStatus;
+  total: number;
+  completed: number;
+  results: ThoughtJobResult[];
+  created_at: string;
+  finished_at: string | null;
+}
+
+export interface ThoughtJobStarted {
+  job_id: string;
+  status: ThoughtJobStatus;
+  status_url: string;
+}
+
 export interface AuthTokens {
   access: string;
   refresh: string;
@@ -101,9 +101,14 @@ export default function DashboardPage() {
         await new Promise((resolve) => setTimeout(resolve, 1500));
         toast(t("dashboardThoughtsGenerated"));
       } else {
-        await generateThoughtOfTheDay();
+        const job = await generateThoughtOfTheDay();
         await refetch();
-        toast(t("dashboardThoughtsGenerated"));
+        const generated = job.results.some((result) => result.thought);
+        if (job.status === "failed" || (job.total > 0 && !generated)) {
+          toast(t("dashboardCouldNotGenerateThoughts"), { type: "error" });
+        } else {
+          toast(t("dashboardThoughtsGenerated"));
+        }
       }
     } catch {
       toast(t("dashboardCouldNotGenerateThoughts"), { type: "error" });